@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import os
+import shutil
+import tempfile
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 from typing import List, Optional
 from uuid import UUID
 from app.services.chat_service import ChatService
+from app.services.snapshot_service import SnapshotService
+from app.core.deadlines import DeadlineExceeded
 from app.schemas.api import ChatCreate, ChatUpdate, MessageCreate, ChatDetailed
 from app.schemas.chat import Chat
 from app.schemas.message import Message as MessageSchema
@@ -14,6 +22,14 @@ def get_chat_service():
     return ChatService()
 
 
+def get_snapshot_service():
+    service = SnapshotService()
+    try:
+        yield service
+    finally:
+        service.close()
+
+
 @router.post("", response_model=Chat, status_code=status.HTTP_201_CREATED)
 async def create_chat(
     chat_data: ChatCreate, service: ChatService = Depends(get_chat_service)
@@ -65,4 +81,54 @@ async def send_message(
     service: ChatService = Depends(get_chat_service),
 ):
     # Note: message schema has chat_id, but we use the one from the URL
-    return await service.handle_user_message(chat_id=chat_id, content=message.content)
+    try:
+        return await service.handle_user_message(
+            chat_id=chat_id,
+            content=message.content,
+            mode=message.mode,
+            deadline_seconds=message.deadline_seconds,
+        )
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+
+@router.get("/{chat_id}/export")
+async def export_chat(
+    chat_id: UUID, service: SnapshotService = Depends(get_snapshot_service)
+):
+    fd, path = tempfile.mkstemp(suffix=".zip")
+    os.close(fd)
+    try:
+        await service.export_chat(chat_id, path)
+    except ValueError:
+        os.remove(path)
+        raise HTTPException(status_code=404, detail="Chat not found")
+    except Exception:
+        os.remove(path)
+        raise
+
+    return FileResponse(
+        path,
+        media_type="application/zip",
+        filename=f"chat_{chat_id}.zip",
+        background=BackgroundTask(os.remove, path),
+    )
+
+
+def _spool_upload(source, archive):
+    shutil.copyfileobj(source, archive)
+    archive.flush()
+
+
+@router.post("/import", response_model=Chat, status_code=status.HTTP_201_CREATED)
+async def import_chat(
+    file: UploadFile = File(...),
+    title: Optional[str] = Form(None),
+    service: SnapshotService = Depends(get_snapshot_service),
+):
+    with tempfile.NamedTemporaryFile(suffix=".zip") as archive:
+        await asyncio.to_thread(_spool_upload, file.file, archive)
+        try:
+            return await service.import_chat(archive.name, title=title)
+        except (ValueError, KeyError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid snapshot: {e}")
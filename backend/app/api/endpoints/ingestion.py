@@ -7,10 +7,23 @@ from fastapi import (
     BackgroundTasks,
 )
 from uuid import UUID, uuid4
+from typing import List
 from app.services.ingestion_service import IngestionService
+from app.schemas.ingestion import BatchDocument, BatchIngestionStatus
+from app.core import progress as batch_progress
+from app.core.admission import QueueFull, get_admission_controller
+from app.core.config import settings
+from app.core.uploads import (
+    SpooledUpload,
+    UploadTooLarge,
+    has_text,
+    remove_spool,
+    spool_stream,
+    spool_upload,
+)
 from pydantic import BaseModel
-import io
-from PyPDF2 import PdfReader
+import asyncio
+import zipfile
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,84 +42,113 @@ class IngestionResponse(BaseModel):
     file_size: int
     file_type: str
     status: str
+    # 0 when ingestion starts right away, else the place in the ingestion queue
+    queue_position: int = 0
+
+
+class RejectedFile(BaseModel):
+    file_name: str
+    reason: str
+
+
+class BatchIngestionResponse(BaseModel):
+    batch_id: UUID
+    chat_id: UUID
+    status: str
+    queue_position: int = 0
+    documents: List[IngestionResponse]
+    rejected: List[RejectedFile] = []
 
 
-def extract_text_from_pdf(content: bytes) -> str:
-    """Extract text from PDF bytes."""
+def admit_or_429(job_id) -> int:
+    """Reserve an ingestion slot or answer 429 with Retry-After."""
     try:
-        pdf_file = io.BytesIO(content)
-        reader = PdfReader(pdf_file)
+        return get_admission_controller().admit(job_id)
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
-        text_parts = []
-        for page_num, page in enumerate(reader.pages):
-            text = page.extract_text()
-            if text and text.strip():
-                text_parts.append(f"--- Page {page_num + 1} ---\n{text}")
 
-        return "\n\n".join(text_parts)
-    except Exception as e:
-        raise ValueError(f"Failed to extract text from PDF: {str(e)}")
-
-
-def extract_text_from_file(content: bytes, filename: str) -> str:
-    """Extract text from uploaded file based on file type."""
-    file_ext = filename.lower().split(".")[-1] if "." in filename else ""
-
-    if file_ext == "pdf":
-        return extract_text_from_pdf(content)
-    elif file_ext in ["txt", "md", "py", "js", "html", "css", "json", "xml"]:
-        try:
-            return content.decode("utf-8")
-        except UnicodeDecodeError:
-            return content.decode("latin-1")
-    else:
-        try:
-            return content.decode("utf-8")
-        except UnicodeDecodeError:
-            try:
-                return content.decode("latin-1")
-            except Exception:
-                raise ValueError(f"Unsupported file type: {file_ext}")
+def expand_upload(upload: SpooledUpload, budget: int) -> List[SpooledUpload]:
+    """The spooled file itself, or a spool file for every file inside a zip archive."""
+    if not upload.filename.lower().endswith(".zip"):
+        return [upload]
+    members = []
+    try:
+        with zipfile.ZipFile(upload.path) as archive:
+            infos = [
+                info
+                for info in archive.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and not info.filename.rsplit("/", 1)[-1].startswith(".")
+            ]
+            # Check declared sizes before inflating anything
+            if sum(info.file_size for info in infos) > budget:
+                raise ValueError(
+                    f"Archive {upload.filename} exceeds the batch size limit"
+                )
+            for info in infos:
+                with archive.open(info) as member:
+                    members.append(spool_stream(member, info.filename, budget))
+                budget -= members[-1].size
+        return members
+    except zipfile.BadZipFile:
+        for member in members:
+            member.remove()
+        raise ValueError(f"Not a valid zip archive: {upload.filename}")
+    except BaseException:
+        for member in members:
+            member.remove()
+        raise
+    finally:
+        upload.remove()
 
 
 async def process_file_background(
     chat_id: UUID,
     document_id: UUID,
-    text_content: str,
-    filename: str,
-    file_size: int,
+    upload: SpooledUpload,
 ):
     """Background task to process file ingestion."""
     print("=" * 80)
-    print(f"🚀 BACKGROUND TASK STARTED for {filename}")
+    print(f"🚀 BACKGROUND TASK STARTED for {upload.filename}")
     print(f"   Document ID: {document_id}")
     print(f"   Chat ID: {chat_id}")
-    print(f"   Text length: {len(text_content)} characters")
+    print(f"   File size: {upload.size} bytes")
     print("=" * 80)
 
     try:
-        service = get_ingestion_service()
-        print(
-            f"Starting background ingestion for document {document_id} in chat {chat_id}"
-        )
+        # Waits here while the ingestion queue is ahead of us; the timeout starts after
+        async with get_admission_controller().run(document_id):
+            service = get_ingestion_service()
+            print(
+                f"Starting background ingestion for document {document_id} in chat {chat_id}"
+            )
 
-        await service.ingest_text(
-            chat_id=chat_id,
-            document_id=document_id,
-            text=text_content,
-            file_name=filename,
-            file_size=file_size,
-            timeout_seconds=300.0,
-        )
+            await service.ingest_file(
+                chat_id=chat_id,
+                document_id=document_id,
+                path=upload.path,
+                file_name=upload.filename,
+                file_size=upload.size,
+                checksum=upload.sha256,
+                timeout_seconds=300.0,
+            )
 
-        print(f"✅ Background ingestion completed for document {document_id}")
-        service.close()
+            print(f"✅ Background ingestion completed for document {document_id}")
+            service.close()
 
     except Exception as e:
         import traceback
 
         print(f"❌ Background ingestion failed: {str(e)}")
         print(traceback.format_exc())
+    finally:
+        upload.remove()
 
 
 @router.post("/file", response_model=IngestionResponse)
@@ -116,51 +158,198 @@ async def ingest_file(
     file: UploadFile = File(...),
 ):
     try:
-        content = await file.read()
+        # Copied to disk in blocks; oversized uploads stop at the limit
+        upload = await spool_upload(file, settings.INGEST_MAX_UPLOAD_MB * 1024 * 1024)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-        filename = file.filename or "unknown"
-
-        if not content:
+    try:
+        if not upload.size:
             raise HTTPException(
                 status_code=400,
                 detail="Empty file received",
             )
 
-        text_content = extract_text_from_file(content, filename)
-
-        if not text_content or not text_content.strip():
+        # Only reads until the first text; PDF parsing is CPU bound
+        if not await asyncio.to_thread(has_text, upload.path, upload.filename):
             raise HTTPException(
                 status_code=400,
                 detail="No text content could be extracted from the file",
             )
 
         document_id = uuid4()
+        queue_position = admit_or_429(document_id)
 
-        # Add background task to process the file
+        # Add background task to process the file; it removes the spool file
         background_tasks.add_task(
             process_file_background,
             chat_id,
             document_id,
-            text_content,
-            filename,
-            len(content),
+            upload,
         )
 
         # Return immediately with document info
         return IngestionResponse(
             id=document_id,
             chat_id=chat_id,
-            file_name=filename,
-            file_size=len(content),
+            file_name=upload.filename,
+            file_size=upload.size,
             file_type="text",
-            status="processing",
+            status="queued" if queue_position else "processing",
+            queue_position=queue_position,
         )
 
     except HTTPException:
+        upload.remove()
         raise
     except Exception as e:
         import traceback
 
+        upload.remove()
         logger.error(f"Ingestion failed: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def process_batch_background(
+    chat_id: UUID, documents: List[BatchDocument], status: BatchIngestionStatus
+):
+    """Background task running a whole batch through one shared pipeline."""
+    try:
+        async with get_admission_controller().run(status.batch_id):
+            print(f"🚀 BATCH {status.batch_id} STARTED: {len(documents)} documents")
+            status.status = "processing"
+            service = IngestionService(max_workers=settings.INGEST_BATCH_WORKERS)
+            try:
+                await service.ingest_batch(chat_id, documents, status)
+            finally:
+                service.close()
+            print(
+                f"✅ Batch {status.batch_id} {status.status}: "
+                f"{status.documents_completed}/{status.documents_total} documents"
+            )
+    except Exception as e:
+        import traceback
+
+        print(f"❌ Batch ingestion failed: {str(e)}")
+        print(traceback.format_exc())
+    finally:
+        for document in documents:
+            remove_spool(document.path)
+
+
+@router.post("/batch", response_model=BatchIngestionResponse)
+async def ingest_batch(
+    background_tasks: BackgroundTasks,
+    chat_id: UUID = Form(...),
+    files: List[UploadFile] = File(...),
+):
+    """Ingest several files, or zip archives of files, as one batch."""
+    budget = settings.INGEST_BATCH_MAX_MB * 1024 * 1024
+    entries, rejected, documents = [], [], []
+    try:
+        for file in files:
+            try:
+                upload = await spool_upload(file, budget)
+            except UploadTooLarge:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Batch exceeds {settings.INGEST_BATCH_MAX_MB} MB",
+                )
+            try:
+                expanded = await asyncio.to_thread(expand_upload, upload, budget)
+            except ValueError as e:
+                rejected.append(RejectedFile(file_name=upload.filename, reason=str(e)))
+                continue
+            for entry in expanded:
+                budget -= entry.size
+                entries.append(entry)
+            if budget < 0:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Batch exceeds {settings.INGEST_BATCH_MAX_MB} MB",
+                )
+            if len(entries) > settings.INGEST_BATCH_MAX_FILES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Batch exceeds {settings.INGEST_BATCH_MAX_FILES} files",
+                )
+
+        for entry in entries:
+            reason = None
+            if not entry.size:
+                reason = "Empty file"
+            else:
+                try:
+                    # PDF parsing is CPU bound; keep the event loop responsive
+                    if not await asyncio.to_thread(
+                        has_text, entry.path, entry.filename
+                    ):
+                        reason = "No text content could be extracted"
+                except ValueError as e:
+                    reason = str(e)
+            if reason:
+                rejected.append(RejectedFile(file_name=entry.filename, reason=reason))
+                entry.remove()
+                continue
+            documents.append(
+                BatchDocument(
+                    document_id=uuid4(),
+                    file_name=entry.filename,
+                    file_size=entry.size,
+                    checksum=entry.sha256,
+                    path=entry.path,
+                )
+            )
+
+        if not documents:
+            raise HTTPException(
+                status_code=400,
+                detail="No text content could be extracted from the uploaded files",
+            )
+
+        batch_id = uuid4()
+        # A batch holds one admission slot; its documents share its own limits
+        queue_position = admit_or_429(batch_id)
+    except BaseException:
+        for entry in entries:
+            entry.remove()
+        raise
+
+    status = batch_progress.register(
+        BatchIngestionStatus(
+            batch_id=batch_id,
+            chat_id=chat_id,
+            status="queued" if queue_position else "processing",
+            documents_total=len(documents),
+        )
+    )
+    background_tasks.add_task(process_batch_background, chat_id, documents, status)
+
+    return BatchIngestionResponse(
+        batch_id=status.batch_id,
+        chat_id=chat_id,
+        status=status.status,
+        queue_position=queue_position,
+        documents=[
+            IngestionResponse(
+                id=d.document_id,
+                chat_id=chat_id,
+                file_name=d.file_name,
+                file_size=d.file_size,
+                file_type="text",
+                status=status.status,
+                queue_position=queue_position,
+            )
+            for d in documents
+        ],
+        rejected=rejected,
+    )
+
+
+@router.get("/batch/{batch_id}", response_model=BatchIngestionStatus)
+async def get_batch_status(batch_id: UUID):
+    status = batch_progress.get(batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return status
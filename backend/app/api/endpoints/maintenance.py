@@ -0,0 +1,26 @@
+from uuid import UUID
+from fastapi import APIRouter
+from app.services.compaction_service import CompactionService
+from app.services.community_service import CommunityService
+from app.schemas.compaction import CompactionReport
+from app.schemas.community import CommunityBuildReport
+
+router = APIRouter(prefix="/maintenance", tags=["maintenance"])
+
+
+@router.post("/compaction", response_model=CompactionReport)
+async def run_compaction():
+    service = CompactionService()
+    try:
+        return await service.run()
+    finally:
+        service.close()
+
+
+@router.post("/chats/{chat_id}/communities", response_model=CommunityBuildReport)
+async def build_communities(chat_id: UUID):
+    service = CommunityService()
+    try:
+        return await service.build(chat_id)
+    finally:
+        service.close()
@@ -0,0 +1,385 @@
+"""
+Chat query latency benchmark.
+
+Seeds a chat with synthetic documents through the offline ingestion path,
+then drives ChatService.handle_user_message from a fixed number of concurrent
+clients against stand-in backends with configurable latencies. Reports
+p50/p95/p99 for every retrieval stage and end to end, plus throughput.
+
+    python -m app.benchmarks.chat --requests 200 --concurrency 1 8 \\
+        --generate-latency 0.2 --qdrant-latency 0.01 --output chat.json
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import platform
+import random
+import sys
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+from datetime import datetime
+from functools import wraps
+from uuid import uuid4
+import app.services.retrieval_service as retrieval_module
+from app.benchmarks.fakes import (
+    FakeOpenAIClient,
+    InMemoryGraph,
+    InMemoryNeo4jClient,
+    LatencyModel,
+    memory_qdrant,
+)
+from app.benchmarks.ingestion import (
+    OfflineIngestionService,
+    make_document,
+    ENTITY_NAMES,
+)
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import settings
+from app.core.deadlines import DeadlineExceeded
+from app.core.constants import MessageRole
+from app.schemas.message import Message as MessageSchema
+from app.services.answer_service import AnswerService
+from app.services.chat_service import ChatService
+from app.services.graph_service import GraphService
+from app.services.llm_service import LLMService
+from app.services.retrieval_service import RetrievalService
+from app.services.vector_service import VectorService
+
+RESULT_SCHEMA_VERSION = 1
+PERCENTILES = (50, 95, 99)
+
+# Stage timings of the request currently running in this task
+_current_sample = contextvars.ContextVar("benchmark_sample", default=None)
+
+_QUESTION_TEMPLATES = [
+    "How is {a} connected to {b}?",
+    "What do the documents say about {a}?",
+    "Did {a} work with {b}?",
+    "Summarise the relationship between {a} and {b}.",
+]
+
+
+def percentile(values, p: float) -> float:
+    """Linear-interpolated percentile of an unsorted sequence."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarise(values) -> dict:
+    summary = {f"p{p}": round(percentile(values, p), 6) for p in PERCENTILES}
+    summary["mean"] = round(sum(values) / len(values), 6)
+    summary["max"] = round(max(values), 6)
+    summary["count"] = len(values)
+    return summary
+
+
+def _timed(fn, stage: str):
+    """Record fn's duration into the sample of the request that called it."""
+    if asyncio.iscoroutinefunction(fn):
+
+        @wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                sample = _current_sample.get()
+                if sample is not None:
+                    sample[stage] = sample.get(stage, 0.0) + time.perf_counter() - start
+
+        return async_wrapper
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sample = _current_sample.get()
+            if sample is not None:
+                sample[stage] = sample.get(stage, 0.0) + time.perf_counter() - start
+
+    return wrapper
+
+
+class OfflineChatService(ChatService):
+    """ChatService that keeps the conversation in memory instead of Postgres."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.saved_messages = 0
+
+    async def _document_version(self, chat_id):
+        return "seeded"
+
+    async def _save_exchange(
+        self,
+        chat_id,
+        content: str,
+        answer: str,
+        cached: bool = False,
+        skipped_stages=None,
+    ) -> MessageSchema:
+        self.saved_messages += 2
+        return MessageSchema(
+            chat_id=chat_id,
+            role=MessageRole.ASSISTANT,
+            content=answer,
+            cached=cached,
+            skipped_stages=skipped_stages or [],
+        )
+
+
+def make_questions(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        rng.choice(_QUESTION_TEMPLATES).format(
+            a=rng.choice(ENTITY_NAMES), b=rng.choice(ENTITY_NAMES)
+        )
+        for _ in range(count)
+    ]
+
+
+async def _seed_chat(config: dict, llm, qdrant, neo4j, chat_id):
+    ingestion = OfflineIngestionService(
+        max_workers=10,
+        vector=VectorService(client_wrapper=qdrant, llm_service=llm),
+        graph=GraphService(client=neo4j, llm_service=llm),
+    )
+    for i in range(config["documents"]):
+        text = make_document(config["document_chars"], seed=config["seed"] + i)
+        await ingestion.ingest_text(
+            chat_id=chat_id,
+            document_id=uuid4(),
+            text=text,
+            file_name=f"synthetic_{i}.txt",
+            file_size=len(text),
+        )
+
+
+async def run_load(config: dict, concurrency: int) -> dict:
+    """Seed a chat, then replay the question set at a fixed concurrency."""
+    openai_client = FakeOpenAIClient()
+    llm = LLMService(client=openai_client)
+    qdrant = memory_qdrant()
+    neo4j = InMemoryNeo4jClient(InMemoryGraph())
+    chat_id = uuid4()
+
+    await _seed_chat(config, llm, qdrant, neo4j, chat_id)
+
+    # Latencies apply to the query phase only
+    openai_client.embed_latency = LatencyModel(
+        config["embed_latency"], config["jitter"]
+    )
+    openai_client.generate_latency = LatencyModel(
+        config["generate_latency"], config["jitter"]
+    )
+    qdrant.client.latency = LatencyModel(config["qdrant_latency"], config["jitter"])
+    neo4j.graph.latency = LatencyModel(
+        config["neo4j_latency"],
+        config["jitter"],
+        stall_rate=config["neo4j_stall_rate"],
+        stall_seconds=config["neo4j_stall_seconds"],
+    )
+    if config["deadline"] is not None:
+        settings.CHAT_DEADLINE_SECONDS = config["deadline"]
+    if config["graph_budget"] is not None:
+        settings.CHAT_GRAPH_BUDGET_SECONDS = config["graph_budget"]
+    if config["answer_reserve"] is not None:
+        settings.CHAT_ANSWER_RESERVE_SECONDS = config["answer_reserve"]
+
+    vector = VectorService(client_wrapper=qdrant, llm_service=llm)
+    graph = GraphService(client=neo4j, llm_service=llm)
+    answer_service = AnswerService(llm=llm)
+    # Fresh breakers, so one concurrency level's failures don't carry over
+    retrieval = RetrievalService(
+        graph=graph,
+        vector=vector,
+        breakers={name: CircuitBreaker(name) for name in ("neo4j", "qdrant")},
+    )
+    answer_cache = (
+        SemanticAnswerCache(threshold=config["answer_cache_threshold"])
+        if config["answer_cache"]
+        else False
+    )
+    chat = OfflineChatService(
+        retrieval=retrieval, answer_service=answer_service, answer_cache=answer_cache
+    )
+
+    retrieval.embed_question = _timed(retrieval.embed_question, "embed_question")
+    vector.search_chunks = _timed(vector.search_chunks, "vector_search")
+    vector.fetch_chunks = _timed(vector.fetch_chunks, "chunk_fetch")
+    graph.parse = _timed(graph.parse, "graph_parse")
+    graph.retrieve = _timed(graph.retrieve, "graph_retrieve")
+    answer_service.generate_answer = _timed(answer_service.generate_answer, "answer")
+    chat._save_exchange = _timed(chat._save_exchange, "persist")
+
+    questions = make_questions(config["requests"] + config["warmup"], config["seed"])
+    queue = asyncio.Queue()
+    for i, question in enumerate(questions):
+        queue.put_nowait((i, question))
+
+    samples = []
+    completed = 0
+    errors = 0
+    deadline_exceeded = 0
+    cache_hits = 0
+    skipped_stages = Counter()
+
+    async def client():
+        nonlocal completed, errors, deadline_exceeded, cache_hits
+        while True:
+            try:
+                i, question = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            sample = {}
+            _current_sample.set(sample)
+            start = time.perf_counter()
+            try:
+                message = await chat.handle_user_message(
+                    chat_id=chat_id, content=question
+                )
+            except DeadlineExceeded:
+                deadline_exceeded += 1
+                continue
+            except Exception:
+                errors += 1
+                continue
+            sample["end_to_end"] = time.perf_counter() - start
+            completed += 1
+            cache_hits += message.cached
+            if i >= config["warmup"]:
+                samples.append(sample)
+                skipped_stages.update(message.skipped_stages)
+
+    original_build_context = retrieval_module.build_context
+    retrieval_module.build_context = _timed(original_build_context, "build_context")
+    try:
+        start = time.perf_counter()
+        # Each client runs in its own task, so its ContextVar sample is private
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    finally:
+        retrieval_module.build_context = original_build_context
+
+    stages = {}
+    for stage in sorted({s for sample in samples for s in sample}):
+        values = [sample[stage] for sample in samples if stage in sample]
+        stages[stage] = summarise(values)
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": errors,
+        "deadline_exceeded": deadline_exceeded,
+        "skipped_stages": dict(skipped_stages),
+        "breakers": {name: b.state for name, b in retrieval.breakers.items()},
+        "wall_seconds": round(wall, 6),
+        "throughput_rps": round(completed / wall, 3) if wall else None,
+        "answer_cache_hits": cache_hits,
+        "end_to_end": stages.pop("end_to_end", None),
+        "stages": stages,
+        "upstream_calls": dict(openai_client.calls),
+        "graph_queries": dict(neo4j.graph.queries),
+    }
+
+
+def run_benchmark(config: dict) -> dict:
+    results = []
+    for concurrency in config["concurrency"]:
+        with redirect_stdout(sys.stderr):
+            result = asyncio.run(run_load(config, concurrency))
+        results.append(result)
+        e2e = result["end_to_end"] or {}
+        print(
+            f"concurrency={concurrency:>3} rps={result['throughput_rps']} "
+            f"p50={e2e.get('p50')} p95={e2e.get('p95')} p99={e2e.get('p99')} "
+            f"errors={result['errors']} "
+            f"deadline_exceeded={result['deadline_exceeded']} "
+            f"skipped={result['skipped_stages']}",
+            file=sys.stderr,
+        )
+
+    return {
+        "benchmark": "chat",
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+
+
+def parse_args(argv=None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks.chat")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--document-chars", type=int, default=30_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--generate-latency", type=float, default=0.1)
+    parser.add_argument("--qdrant-latency", type=float, default=0.002)
+    parser.add_argument("--neo4j-latency", type=float, default=0.005)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--neo4j-stall-rate",
+        type=float,
+        default=0.0,
+        help="Share of Neo4j queries that stall for --neo4j-stall-seconds",
+    )
+    parser.add_argument("--neo4j-stall-seconds", type=float, default=2.0)
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="Override CHAT_DEADLINE_SECONDS (0 = no deadline)",
+    )
+    parser.add_argument(
+        "--graph-budget",
+        type=float,
+        default=None,
+        help="Override CHAT_GRAPH_BUDGET_SECONDS",
+    )
+    parser.add_argument(
+        "--answer-reserve",
+        type=float,
+        default=None,
+        help="Override CHAT_ANSWER_RESERVE_SECONDS",
+    )
+    parser.add_argument(
+        "--answer-cache",
+        action="store_true",
+        help="Enable the semantic answer cache (off so stages stay comparable)",
+    )
+    parser.add_argument("--answer-cache-threshold", type=float, default=0.95)
+    parser.add_argument("--output", default=None, help="Write JSON results here")
+    return vars(parser.parse_args(argv))
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    output = config.pop("output")
+    report = run_benchmark(config)
+    payload = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
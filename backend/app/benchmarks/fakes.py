@@ -0,0 +1,652 @@
+"""
+Deterministic, offline stand-ins for OpenAI, Qdrant and Neo4j.
+
+Every response is a pure function of its input, so benchmark runs are
+reproducible: embeddings are hashed bags of words (similar texts get similar
+vectors), extraction returns the capitalised names found in the chunk, and
+injected latency and failures are derived from a hash of the request.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+import numpy as np
+from qdrant_client import QdrantClient as LibQdrantClient
+from app.db.qdrant import QdrantDBClient
+from app.db.queries.llm import (
+    EXTRACT_ENTITIES_AND_RELATIONSHIPS_PROMPT,
+    EXTRACT_PACKED_PROMPT,
+    COMMUNITY_SUMMARY_PROMPT,
+    GLOBAL_MAP_PROMPT,
+    GLOBAL_REDUCE_PROMPT,
+)
+from app.db.queries.graph import EXTRACT_ENTITIES_PROMPT
+
+EMBED_DIM = 1536
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_NAME_RE = re.compile(r"\b[A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*\b")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+_PACKED_CHUNK_RE = re.compile(r"\n\n### Chunk (\d+)\n")
+_NOT_NAMES = {
+    "The",
+    "A",
+    "An",
+    "This",
+    "That",
+    "These",
+    "Those",
+    "It",
+    "In",
+    "On",
+    "At",
+    "For",
+    "With",
+    "And",
+    "But",
+    "Or",
+    "As",
+    "By",
+    "From",
+    "To",
+    "Of",
+    "Page",
+    "Return",
+    "Text",
+    "Question",
+    "What",
+    "Who",
+    "Where",
+    "When",
+    "How",
+    "Why",
+    "Which",
+    "Does",
+    "Do",
+    "Is",
+    "Are",
+    "Was",
+    "Were",
+    "Can",
+    "Tell",
+    "Summarise",
+}
+
+
+class FakeProviderError(Exception):
+    """Raised by the fakes to simulate an upstream failure."""
+
+
+def _hash_unit(key: str) -> float:
+    """Map a string to a stable float in [0, 1)."""
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64
+
+
+class LatencyModel:
+    """
+    Per-request latency and failure injection derived from the request key.
+    A `stall_rate` share of requests take `stall_seconds` longer, like calls
+    queued behind a lock or a long garbage-collection pause.
+    """
+
+    def __init__(
+        self,
+        mean: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        stall_rate: float = 0.0,
+        stall_seconds: float = 0.0,
+    ):
+        self.mean = mean
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+
+    def delay_for(self, key: str) -> float:
+        delay = self.mean
+        if self.jitter:
+            # Uniform in [mean - jitter, mean + jitter]
+            delay = max(
+                0.0, self.mean + (2 * _hash_unit("latency:" + key) - 1) * self.jitter
+            )
+        if self.stall_rate and _hash_unit("stall:" + key) < self.stall_rate:
+            delay += self.stall_seconds
+        return delay
+
+    def apply(self, key: str):
+        delay = self.delay_for(key)
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and _hash_unit("error:" + key) < self.error_rate:
+            raise FakeProviderError("Injected upstream failure")
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> list[float]:
+    """Feature-hashed bag of words, L2-normalised."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in _WORD_RE.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        for k in range(4):
+            bucket = (value >> (k * 12)) % dim
+            vector[bucket] += 1.0 if (value >> (48 + k)) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+    else:
+        vector /= norm
+    return vector.tolist()
+
+
+def _find_names(text: str) -> list[str]:
+    names = []
+    seen = set()
+    for match in _NAME_RE.finditer(text):
+        words = [w for w in match.group(0).split() if w not in _NOT_NAMES]
+        if not words:
+            continue
+        name = " ".join(words)
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def fake_extraction(text: str) -> dict:
+    """Entities are capitalised names; names sharing a sentence are related."""
+    entities = {}
+    relationships = []
+    for sentence in _SENTENCE_END_RE.split(text):
+        names = _find_names(sentence)
+        for name in names:
+            entities.setdefault(
+                name.lower(),
+                {
+                    "name": name,
+                    "type": "Organization" if len(name.split()) > 1 else "Concept",
+                    "confidence": round(0.5 + _hash_unit(name) / 2, 2),
+                },
+            )
+        for source, target in zip(names, names[1:]):
+            relationships.append(
+                {
+                    "source": source,
+                    "target": target,
+                    "type": "RELATED_TO",
+                    "confidence": round(0.5 + _hash_unit(source + target) / 2, 2),
+                }
+            )
+    return {"entities": list(entities.values()), "relationships": relationships}
+
+
+def fake_completion(prompt: str) -> str:
+    if prompt.startswith(EXTRACT_ENTITIES_AND_RELATIONSHIPS_PROMPT):
+        text = prompt.split("\n\nText:\n", 1)[-1]
+        return json.dumps(fake_extraction(text))
+    if prompt.startswith(EXTRACT_PACKED_PROMPT):
+        parts = _PACKED_CHUNK_RE.split(prompt[len(EXTRACT_PACKED_PROMPT) :])
+        return json.dumps(
+            {
+                "chunks": [
+                    {"chunk": int(number), **fake_extraction(text)}
+                    for number, text in zip(parts[1::2], parts[2::2])
+                ]
+            }
+        )
+    if prompt.startswith(EXTRACT_ENTITIES_PROMPT):
+        question = prompt.split("\n\nQuestion:\n", 1)[-1]
+        return json.dumps(
+            {
+                "entities": [
+                    {"name": n, "type": "Concept"} for n in _find_names(question)
+                ]
+            }
+        )
+    if prompt.startswith(COMMUNITY_SUMMARY_PROMPT):
+        members = re.findall(r"^- ([^(\n]+) \(", prompt, re.MULTILINE)
+        return json.dumps(
+            {
+                "title": " / ".join(members[:3]),
+                "summary": f"A group of {len(members)} related entities.",
+            }
+        )
+    if prompt.startswith(GLOBAL_MAP_PROMPT):
+        titles = re.findall(r"^## (.+)$", prompt, re.MULTILINE)
+        return json.dumps(
+            {
+                "points": [
+                    {"description": f"Theme: {t}", "score": round(_hash_unit(t) * 100)}
+                    for t in titles
+                ]
+            }
+        )
+    if prompt.startswith(GLOBAL_REDUCE_PROMPT):
+        return f"Based on {prompt.count(chr(10) + '- (')} key points, here is a deterministic overview."
+    context_lines = prompt.count("\n- ")
+    return (
+        f"Based on {context_lines} retrieved passages, here is a deterministic answer."
+    )
+
+
+class FakeOpenAIClient:
+    """Implements the slice of the OpenAI client used by LLMService."""
+
+    def __init__(
+        self,
+        embed_latency: LatencyModel = None,
+        generate_latency: LatencyModel = None,
+        dim: int = EMBED_DIM,
+        truncate_rate: float = 0.0,
+    ):
+        self.embed_latency = embed_latency or LatencyModel()
+        self.generate_latency = generate_latency or LatencyModel()
+        self.dim = dim
+        # Share of completions cut short, as if they hit the token limit
+        self.truncate_rate = truncate_rate
+        self.calls = Counter()
+        self.embedded_inputs = 0
+        self.truncated = 0
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+        self.embeddings = SimpleNamespace(create=self._create_embedding)
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(create=self._create_completion)
+        )
+
+    def _count(self, operation: str, inputs: int = 0):
+        with self._lock:
+            self.calls[operation] += 1
+            self.embedded_inputs += inputs
+
+    def _create_embedding(self, model, input, **kwargs):
+        inputs = input if isinstance(input, list) else [input]
+        self._count("embeddings", len(inputs))
+        try:
+            self.embed_latency.apply("\x00".join(inputs))
+        except FakeProviderError:
+            with self._lock:
+                self.errors["embeddings"] += 1
+            raise
+
+        tokens = sum(len(t) // 4 + 1 for t in inputs)
+        return SimpleNamespace(
+            model=model,
+            data=[
+                SimpleNamespace(index=i, embedding=fake_embedding(t, self.dim))
+                for i, t in enumerate(inputs)
+            ],
+            usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens),
+        )
+
+    def _create_completion(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        self._count("chat.completions")
+        try:
+            self.generate_latency.apply(prompt)
+        except FakeProviderError:
+            with self._lock:
+                self.errors["chat.completions"] += 1
+            raise
+
+        content = fake_completion(prompt)
+        finish_reason = "stop"
+        if self.truncate_rate and _hash_unit("truncate:" + prompt) < self.truncate_rate:
+            content = content[: int(len(content) * _hash_unit("cut:" + prompt))]
+            finish_reason = "length"
+            with self._lock:
+                self.truncated += 1
+        prompt_tokens = sum(len(m["content"]) // 4 + 1 for m in messages)
+        completion_tokens = len(content) // 4 + 1
+        return SimpleNamespace(
+            model=model,
+            choices=[
+                SimpleNamespace(
+                    index=0,
+                    finish_reason=finish_reason,
+                    message=SimpleNamespace(role="assistant", content=content),
+                )
+            ],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+
+class LatentQdrantClient:
+    """Proxies a QdrantClient, adding injected latency to every method call."""
+
+    def __init__(self, client: LibQdrantClient, latency: LatencyModel = None):
+        self._client = client
+        self.latency = latency or LatencyModel()
+        # Local mode isn't safe to read while another thread writes; a server is
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.latency.apply(name)
+            with self._lock:
+                return attr(*args, **kwargs)
+
+        return call
+
+
+def memory_qdrant(latency: LatencyModel = None) -> QdrantDBClient:
+    """A QdrantDBClient backed by qdrant_client's in-process ':memory:' mode."""
+    return QdrantDBClient(
+        client=LatentQdrantClient(LibQdrantClient(location=":memory:"), latency)
+    )
+
+
+class FakeRecord(dict):
+    """Dict-backed stand-in for neo4j.Record."""
+
+    def data(self):
+        return dict(self)
+
+    def value(self, key=0):
+        return list(self.values())[key] if isinstance(key, int) else self[key]
+
+
+class FakeResult:
+    def __init__(self, records=None, counters=None):
+        self._records = records or []
+        self._counters = SimpleNamespace(**(counters or {}))
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def data(self):
+        return [r.data() for r in self._records]
+
+    def consume(self):
+        return SimpleNamespace(counters=self._counters)
+
+
+class InMemoryGraph:
+    """
+    Interprets the handful of Cypher statements the services issue.
+
+    Unknown statements return an empty result and are counted in `unhandled`,
+    so a benchmark never silently measures a query it did not execute.
+    """
+
+    _REL_TYPE_RE = re.compile(r"\[r:`?([^`\s{\]]+)`?")
+
+    def __init__(self, latency: LatencyModel = None):
+        self.latency = latency or LatencyModel()
+        self.entities = {}  # (chat_id, name_normalized) -> props
+        self.by_id = {}  # (chat_id, entity_id) -> props
+        self.relationships = {}  # (chat_id, src_id, type, tgt_id) -> props
+        self.adjacency = defaultdict(list)  # (chat_id, src_id) -> [rel keys]
+        self.incoming = defaultdict(list)  # (chat_id, tgt_id) -> [rel keys]
+        self.queries = Counter()
+        self.unhandled = Counter()
+        self._lock = threading.Lock()
+
+    def run(self, query: str, **params) -> FakeResult:
+        self.latency.apply(query + json.dumps(params, sort_keys=True, default=str))
+        with self._lock:
+            if "MERGE (e:Entity" in query:
+                self.queries["upsert_entity"] += 1
+                return self._upsert_entity(params)
+            if "MERGE (a)-[r:" in query:
+                self.queries["upsert_relationship"] += 1
+                return self._upsert_relationship(query, params)
+            if "OPTIONAL MATCH (e)-[r]-(n:Entity)" in query:
+                self.queries["neighbourhood"] += 1
+                return self._neighbourhood(params)
+            if "SET e.neighbourhood" in query:
+                self.queries["set_neighbourhood"] += 1
+                return self._set_neighbourhood(params)
+            if "REMOVE e.neighbourhood" in query:
+                self.queries["clear_neighbourhoods"] += 1
+                return self._clear_neighbourhoods(params)
+            if "coalesce(e.aliases, []) AS aliases" in query:
+                self.queries["entity_names"] += 1
+                return FakeResult(
+                    [
+                        FakeRecord(
+                            name=node["name"],
+                            name_normalized=node["name_normalized"],
+                            type=node["type"],
+                            aliases=list(node["aliases"]),
+                        )
+                        for (chat_id, _), node in self.by_id.items()
+                        if chat_id == params["chat_id"]
+                    ]
+                )
+            if "e.name_normalized AS name_normalized" in query:
+                self.queries["adjacency_entities"] += 1
+                return FakeResult(
+                    [
+                        FakeRecord(
+                            entity_id=node["entity_id"],
+                            name=node["name"],
+                            type=node["type"],
+                            name_normalized=node["name_normalized"],
+                            chunk_ids=list(node["chunk_ids"]),
+                        )
+                        for (chat_id, _), node in self.by_id.items()
+                        if chat_id == params["chat_id"]
+                    ]
+                )
+            if "r.confidence AS confidence" in query:
+                self.queries["adjacency_edges"] += 1
+                return FakeResult(
+                    [
+                        FakeRecord(
+                            source_id=src,
+                            target_id=tgt,
+                            type=rel_type,
+                            confidence=rel["confidence"],
+                            chunk_ids=list(rel["chunk_ids"]),
+                        )
+                        for (
+                            chat_id,
+                            src,
+                            rel_type,
+                            tgt,
+                        ), rel in self.relationships.items()
+                        if chat_id == params["chat_id"]
+                    ]
+                )
+            if "e.neighbourhood AS neighbourhood" in query:
+                self.queries["digest_lookup"] += 1
+                return self._digest_lookup(params)
+            self.unhandled[query.strip().splitlines()[0]] += 1
+            return FakeResult()
+
+    def _upsert_entity(self, params):
+        key = (params["chat_id"], params["name_norm"])
+        node = self.entities.get(key)
+        if node is None:
+            node = {
+                "chat_id": params["chat_id"],
+                "name_normalized": params["name_norm"],
+                "entity_id": params["entity_id"],
+                "name": params["name"],
+                "type": params["type"],
+                "confidence": params["confidence"],
+                "created_from_chunk_id": params["chunk_id"],
+                "chunk_ids": list(params["chunk_ids"]),
+                "created_at": params["created_at"],
+                "aliases": list(params["aliases"]),
+            }
+            self.entities[key] = node
+            self.by_id[(params["chat_id"], params["entity_id"])] = node
+            return FakeResult(
+                [FakeRecord(entity_id=node["entity_id"])],
+                counters={"nodes_created": 1},
+            )
+        node["confidence"] = (node.get("confidence") or 0) + params["confidence"]
+        node["chunk_ids"] += [
+            c for c in params["chunk_ids"] if c not in node["chunk_ids"]
+        ]
+        node["aliases"] += [a for a in params["aliases"] if a not in node["aliases"]]
+        return FakeResult([FakeRecord(entity_id=node["entity_id"])])
+
+    def _upsert_relationship(self, query, params):
+        chat_id = params["chat_id"]
+        if (chat_id, params["src"]) not in self.by_id or (
+            chat_id,
+            params["tgt"],
+        ) not in self.by_id:
+            return FakeResult()
+        rel_type = self._REL_TYPE_RE.search(query).group(1)
+        key = (chat_id, params["src"], rel_type, params["tgt"])
+        rel = self.relationships.get(key)
+        if rel is None:
+            self.relationships[key] = {
+                "chat_id": chat_id,
+                "confidence": params["confidence"],
+                "created_from_chunk_id": params["chunk_id"],
+                "chunk_ids": list(params["chunk_ids"]),
+            }
+            self.adjacency[(chat_id, params["src"])].append(key)
+            self.incoming[(chat_id, params["tgt"])].append(key)
+            return FakeResult(counters={"relationships_created": 1})
+        rel["confidence"] = max(rel["confidence"], params["confidence"])
+        rel["chunk_ids"] += [
+            c for c in params["chunk_ids"] if c not in rel["chunk_ids"]
+        ]
+        return FakeResult()
+
+    def _neighbourhood(self, params):
+        chat_id = params["chat_id"]
+        records = []
+        for entity_id in params["entity_ids"]:
+            node = self.by_id.get((chat_id, entity_id))
+            if node is None:
+                continue
+            facts = []
+            for direction, keys, other in (
+                ("out", self.adjacency[(chat_id, entity_id)], 3),
+                ("in", self.incoming[(chat_id, entity_id)], 1),
+            ):
+                for key in keys:
+                    rel = self.relationships[key]
+                    neighbour = self.by_id[(chat_id, key[other])]
+                    facts.append(
+                        {
+                            "type": key[2],
+                            "direction": direction,
+                            "name": neighbour["name"],
+                            "entity_type": neighbour["type"],
+                            "confidence": rel["confidence"],
+                            "chunk_ids": list(rel["chunk_ids"]),
+                        }
+                    )
+            facts.sort(key=lambda f: f["confidence"], reverse=True)
+            records.append(
+                FakeRecord(
+                    entity_id=entity_id,
+                    name=node["name"],
+                    type=node["type"],
+                    chunk_ids=list(node["chunk_ids"]),
+                    facts=facts[: params["top_k"]],
+                )
+            )
+        return FakeResult(records)
+
+    def _set_neighbourhood(self, params):
+        for row in params["rows"]:
+            node = self.by_id.get((params["chat_id"], row["entity_id"]))
+            if node is not None:
+                node["neighbourhood"] = row["digest"]
+                node["neighbourhood_updated_at"] = params["updated_at"]
+        return FakeResult()
+
+    def _clear_neighbourhoods(self, params):
+        for (chat_id, _), node in self.by_id.items():
+            if chat_id == params["chat_id"]:
+                node.pop("neighbourhood", None)
+                node.pop("neighbourhood_updated_at", None)
+        return FakeResult()
+
+    def _digest_lookup(self, params):
+        records = []
+        for name in params["names"]:
+            node = self.entities.get((params["chat_id"], name))
+            if node is not None:
+                records.append(
+                    FakeRecord(
+                        entity_id=node["entity_id"],
+                        neighbourhood=node.get("neighbourhood"),
+                    )
+                )
+        return FakeResult(records)
+
+
+class _FakeTransaction:
+    def __init__(self, graph: InMemoryGraph):
+        self._graph = graph
+
+    def run(self, query, parameters=None, **params):
+        # neo4j.Query wraps the text with its timeout
+        query = getattr(query, "text", query)
+        return self._graph.run(query, **(parameters or {}), **params)
+
+
+class _FakeSession:
+    def __init__(self, graph: InMemoryGraph):
+        self._graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, parameters=None, **params):
+        # neo4j.Query wraps the text with its timeout
+        query = getattr(query, "text", query)
+        return self._graph.run(query, **(parameters or {}), **params)
+
+    def execute_write(self, fn, *args, **kwargs):
+        return fn(_FakeTransaction(self._graph), *args, **kwargs)
+
+    execute_read = execute_write
+
+    def close(self):
+        pass
+
+
+class _FakeDriver:
+    def __init__(self, graph: InMemoryGraph):
+        self._graph = graph
+
+    def session(self, **kwargs):
+        return _FakeSession(self._graph)
+
+    def close(self):
+        pass
+
+
+class InMemoryNeo4jClient:
+    """Drop-in replacement for Neo4jClient backed by InMemoryGraph."""
+
+    def __init__(self, graph: InMemoryGraph = None):
+        self.graph = graph or InMemoryGraph()
+        self.driver = _FakeDriver(self.graph)
+
+    def ensure_schema(self):
+        pass
+
+    def close(self):
+        pass
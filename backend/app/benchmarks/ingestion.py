@@ -0,0 +1,592 @@
+"""
+Offline ingestion throughput benchmark.
+
+Runs IngestionService.ingest_text against deterministic fakes (OpenAI, an
+in-memory Qdrant and an in-memory Neo4j stand-in) across document sizes and
+worker counts, and reports chunks/sec, upstream calls per chunk and per
+document, peak memory and a per-stage time breakdown. --extract-window-tokens
+overrides EXTRACT_WINDOW_TOKENS (0 extracts every chunk on its own) and
+--merged-windows turns off packed, chunk-tagged extraction requests.
+--truncate-rate cuts that share of completions short to exercise recovery
+of partial extraction replies. --technical mixes page breaks, tables of
+figures and code into the documents, and --gate-policy overrides
+EXTRACT_GATE_POLICY. --revision-rate makes the batch documents revisions of
+the first one, a versioned corpus whose near-duplicate chunks are stored as
+aliases; --near-duplicate-threshold 0 stores them all. With --batch-documents N each case instead
+ingests N documents of the given size through IngestionService.ingest_batch.
+
+    python -m app.benchmarks.ingestion --sizes 20000 100000 --workers 1 4 10 \\
+        --generate-latency 0.05 --output ingestion.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from functools import wraps
+from multiprocessing import get_context
+from uuid import uuid4
+import app.services.ingestion_service as ingestion_module
+from app.core.config import settings
+from app.benchmarks.fakes import (
+    FakeOpenAIClient,
+    InMemoryGraph,
+    InMemoryNeo4jClient,
+    LatencyModel,
+    memory_qdrant,
+)
+from app.services.ingestion_service import IngestionService
+from app.services.vector_service import VectorService
+from app.services.graph_service import GraphService
+from app.services.llm_service import LLMService
+from app.schemas.ingestion import BatchDocument, BatchIngestionStatus
+
+RESULT_SCHEMA_VERSION = 3
+
+ENTITY_NAMES = [
+    "Acme Corporation",
+    "Globex",
+    "Initech",
+    "Umbrella Labs",
+    "Stark Industries",
+    "Wayne Enterprises",
+    "Cyberdyne Systems",
+    "Soylent",
+    "Tyrell Corporation",
+    "Ada Lovelace",
+    "Alan Turing",
+    "Grace Hopper",
+    "Edsger Dijkstra",
+    "Barbara Liskov",
+    "Donald Knuth",
+    "Margaret Hamilton",
+    "Linus Torvalds",
+    "Guido Rossum",
+    "Berlin",
+    "Tokyo",
+    "Nairobi",
+    "Lisbon",
+    "Toronto",
+    "Melbourne",
+    "Santiago",
+    "Neo4j",
+    "Qdrant",
+    "Postgres",
+    "Kubernetes",
+    "Python",
+    "Rust",
+    "Kafka",
+]
+# Spellings extraction also produces for some names; entity resolution folds them back
+NAME_VARIANTS = {
+    "Acme Corporation": ["Acme Corp", "ACME Corporation"],
+    "Globex": ["Globex Inc"],
+    "Umbrella Labs": ["Umbrella Labs LLC"],
+    "Stark Industries": ["Stark Industries Inc"],
+    "Wayne Enterprises": ["Wayne Enterprises Ltd"],
+    "Tyrell Corporation": ["Tyrell Corp"],
+    "Edsger Dijkstra": ["Edsger Djikstra"],
+}
+_VERBS = [
+    "acquired",
+    "partnered with",
+    "hired",
+    "competes with",
+    "was founded in",
+    "relies on",
+    "invested in",
+    "published research with",
+    "migrated to",
+]
+_FILLER = (
+    "the quarterly report notes steady growth in regional markets while costs "
+    "remained within the projected range and several teams expanded their scope "
+    "after the review highlighted gaps in tooling documentation and onboarding"
+).split()
+
+
+def _technical_block(rng: random.Random, page: int) -> str:
+    """A page break with its footer, a table of figures or a code block."""
+    kind = rng.randrange(3)
+    if kind == 0:
+        return f"--- Page {page} ---\nInternal report - do not distribute - page {page}"
+    if kind == 1:
+        rows = "\n".join(
+            "| " + " | ".join(str(rng.randint(10, 9999)) for _ in range(4)) + " |"
+            for _ in range(rng.randint(4, 10))
+        )
+        return "| Quarter | Units | Revenue | Cost |\n|---|---|---|---|\n" + rows
+    return (
+        "```python\n"
+        + "\n".join(
+            f"total_{i} = sum(values[{i}:{i + rng.randint(2, 9)}]) / {rng.randint(2, 9)}"
+            for i in range(rng.randint(3, 8))
+        )
+        + "\n```"
+    )
+
+
+def make_document(
+    n_chars: int, seed: int = 0, technical: float = 0.0, variants: float = 0.0
+) -> str:
+    """
+    Deterministic synthetic prose with named entities, lists and headings.
+    `technical` is the chance a block starts a run of four to sixteen page
+    breaks, tables of figures or code blocks, like an appendix; `variants`
+    the chance a name is written as one of its NAME_VARIANTS.
+    """
+    rng = random.Random(seed)
+
+    def mention():
+        name = rng.choice(ENTITY_NAMES)
+        if variants and name in NAME_VARIANTS and rng.random() < variants:
+            return rng.choice(NAME_VARIANTS[name])
+        return name
+
+    paragraphs = []
+    size = 0
+    section = 0
+    run = 0
+    while size < n_chars:
+        if technical and not run and rng.random() < technical:
+            run = rng.randint(4, 16)
+        if run:
+            run -= 1
+            block = _technical_block(rng, len(paragraphs) + 1)
+        elif rng.random() < 0.1:
+            section += 1
+            block = f"## Section {section}"
+        elif rng.random() < 0.1:
+            block = "\n".join(
+                f"- {mention()} {rng.choice(_VERBS)} {mention()}"
+                for _ in range(rng.randint(3, 6))
+            )
+        else:
+            sentences = []
+            for _ in range(rng.randint(3, 7)):
+                filler = " ".join(rng.sample(_FILLER, rng.randint(6, 14)))
+                sentences.append(
+                    f"{mention()} {rng.choice(_VERBS)} {mention()} because {filler}."
+                )
+            block = " ".join(sentences)
+        paragraphs.append(block)
+        size += len(block) + 2
+    return "\n\n".join(paragraphs)[:n_chars]
+
+
+def revise(text: str, rate: float, seed: int) -> str:
+    """A revision of a document: each paragraph has one word changed with probability `rate`."""
+    rng = random.Random(seed)
+    paragraphs = text.split("\n\n")
+    for i, paragraph in enumerate(paragraphs):
+        words = paragraph.split(" ")
+        if len(words) > 1 and rng.random() < rate:
+            words[rng.randrange(len(words))] = rng.choice(_FILLER)
+            paragraphs[i] = " ".join(words)
+    return "\n\n".join(paragraphs)
+
+
+class StageTimer:
+    """Accumulates wall time spent inside wrapped callables, per stage."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def record(self, stage: str, elapsed: float):
+        # Called from worker threads; float/int += under the GIL is good enough here
+        self.seconds[stage] += elapsed
+        self.calls[stage] += 1
+
+    def _timed(self, fn, stage: str):
+        if asyncio.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    def wrap(self, obj, name: str, stage: str):
+        """Time a method on one instance only."""
+        setattr(obj, name, self._timed(getattr(obj, name), stage))
+
+    @contextmanager
+    def patch(self, module, name: str, stage: str):
+        """Time a module-level function for the duration of the block."""
+        original = getattr(module, name)
+        setattr(module, name, self._timed(original, stage))
+        try:
+            yield
+        finally:
+            setattr(module, name, original)
+
+    def report(self) -> dict:
+        total = sum(self.seconds.values()) or 1.0
+        return {
+            stage: {
+                "seconds": round(self.seconds[stage], 6),
+                "calls": self.calls[stage],
+                "share": round(self.seconds[stage] / total, 4),
+            }
+            for stage in sorted(self.seconds)
+        }
+
+
+class OfflineIngestionService(IngestionService):
+    """IngestionService with document bookkeeping kept in memory instead of Postgres."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.document_status = {}
+        self.chunks = 0
+        self.windows = 0
+        self.embed_only = defaultdict(int)
+        self.aliases = 0
+
+    def _windows(self, chunks, sizes):
+        for window in super()._windows(chunks, sizes):
+            self.chunks += len(window["chunks"])
+            self.windows += 1
+            for chunk in window["chunks"]:
+                reason = chunk["metadata"].get("embed_only")
+                if reason:
+                    self.embed_only[reason] += 1
+            yield window
+
+    async def _link_aliases(self, chat_id, dedup):
+        self.aliases += sum(len(entries) for entries in dedup.aliases.values())
+        await super()._link_aliases(chat_id, dedup)
+
+    async def _save_document_metadata(
+        self, document_id, chat_id, file_name, file_size, checksum=""
+    ):
+        self.document_status[document_id] = "processing"
+
+    async def _find_duplicate(self, chat_id, checksum, document_id):
+        return None
+
+    async def _update_status(self, document_id, status):
+        self.document_status[document_id] = status
+
+
+def build_offline_ingestion(config: dict, workers: int):
+    """Wire an IngestionService to fresh fakes; returns (service, fakes)."""
+    openai_client = FakeOpenAIClient(
+        embed_latency=LatencyModel(
+            config["embed_latency"], config["jitter"], config["error_rate"]
+        ),
+        generate_latency=LatencyModel(
+            config["generate_latency"], config["jitter"], config["error_rate"]
+        ),
+        truncate_rate=config["truncate_rate"],
+    )
+    llm = LLMService(client=openai_client)
+    neo4j = InMemoryNeo4jClient(
+        InMemoryGraph(latency=LatencyModel(config["neo4j_latency"]))
+    )
+    service = OfflineIngestionService(
+        max_workers=workers,
+        vector=VectorService(client_wrapper=memory_qdrant(), llm_service=llm),
+        graph=GraphService(client=neo4j, llm_service=llm),
+    )
+    return service, openai_client, neo4j
+
+
+def run_case(config: dict, size: int, workers: int) -> dict:
+    """Ingest one synthetic document and measure it. Runs in its own process."""
+    # Services print progress; keep stdout clean for the JSON report
+    with redirect_stdout(sys.stderr):
+        return _run_case(config, size, workers)
+
+
+def _run_case(config: dict, size: int, workers: int) -> dict:
+    batch = config["batch_documents"]
+    if config["extract_window_tokens"] is not None:
+        settings.EXTRACT_WINDOW_TOKENS = config["extract_window_tokens"]
+    if config["merged_windows"]:
+        settings.EXTRACT_PACKED = False
+    if config["gate_policy"]:
+        settings.EXTRACT_GATE_POLICY = config["gate_policy"]
+    if config["near_duplicate_threshold"] is not None:
+        settings.NEAR_DUPLICATE_THRESHOLD = config["near_duplicate_threshold"]
+    if config["entity_resolution"]:
+        settings.ENTITY_RESOLUTION_ENABLED = True
+    texts = [
+        make_document(
+            size,
+            seed=config["seed"] + i,
+            technical=config["technical"],
+            variants=config["name_variants"],
+        )
+        for i in range(batch or 1)
+    ]
+    if config["revision_rate"] is not None:
+        texts = [texts[0]] + [
+            revise(texts[0], config["revision_rate"], seed=config["seed"] + i)
+            for i in range(1, len(texts))
+        ]
+    service, openai_client, neo4j = build_offline_ingestion(config, workers)
+
+    timer = StageTimer()
+    timer.wrap(service.vector, "upsert_chunks", "embed_and_upsert")
+    timer.wrap(service.graph, "extract_entities_and_relationships", "extract")
+    timer.wrap(service.graph, "extract_packed", "extract")
+    timer.wrap(service, "_resolve_entities", "entity_resolution")
+    timer.wrap(service.graph, "add_entity", "graph_write")
+    timer.wrap(service.graph, "add_relationship", "graph_write")
+    timer.wrap(service.graph, "refresh_neighbourhoods", "graph_digest")
+    # The per-window pipeline overlaps the stages above, so it is timed separately
+    pipeline_timer = StageTimer()
+    pipeline_timer.wrap(service, "_run_in_worker", "window_pipeline")
+
+    if config["trace_memory"]:
+        tracemalloc.start()
+
+    chat_id = uuid4()
+    documents = [
+        BatchDocument(
+            document_id=uuid4(),
+            file_name=f"synthetic_{size}_{i}.txt",
+            file_size=len(text.encode("utf-8")),
+            text=text,
+        )
+        for i, text in enumerate(texts)
+    ]
+    with timer.patch(ingestion_module, "chunk_text_semantic", "chunking"):
+        start = time.perf_counter()
+        if batch:
+            progress = BatchIngestionStatus(
+                batch_id=uuid4(), chat_id=chat_id, documents_total=batch
+            )
+            asyncio.run(service.ingest_batch(chat_id, documents, progress))
+        else:
+            asyncio.run(
+                service.ingest_text(
+                    chat_id=chat_id,
+                    document_id=documents[0].document_id,
+                    text=documents[0].text,
+                    file_name=documents[0].file_name,
+                    file_size=documents[0].file_size,
+                    timeout_seconds=config["timeout"],
+                )
+            )
+        wall = time.perf_counter() - start
+
+    traced_peak = None
+    if config["trace_memory"]:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    chunks = service.chunks
+    calls = dict(openai_client.calls)
+    collection = service.vector._get_collection_name(str(chat_id))
+    stored_chunks = (
+        service.vector.client.count(collection).count
+        if service.vector.client.collection_exists(collection)
+        else 0
+    )
+
+    statuses = defaultdict(int)
+    for document in documents:
+        statuses[service.document_status.get(document.document_id)] += 1
+
+    return {
+        "document_chars": len(texts[0]),
+        "documents": len(documents),
+        "workers": workers,
+        "chunks": chunks,
+        "extraction_windows": service.windows,
+        "extract_window_tokens": settings.EXTRACT_WINDOW_TOKENS,
+        "extract_packed": settings.EXTRACT_PACKED,
+        "gate_policy": settings.EXTRACT_GATE_POLICY,
+        "embed_only_chunks": service.embed_only,
+        "near_duplicate_threshold": settings.NEAR_DUPLICATE_THRESHOLD,
+        "aliased_chunks": service.aliases,
+        "stored_chunks": stored_chunks,
+        "entity_resolution": settings.ENTITY_RESOLUTION_ENABLED,
+        "name_variants": config["name_variants"],
+        "wall_seconds": round(wall, 6),
+        "chunks_per_second": round(chunks / wall, 3) if wall else None,
+        "upstream_calls": calls,
+        "calls_per_chunk": {
+            op: round(n / chunks, 3) if chunks else None for op, n in calls.items()
+        },
+        "calls_per_document": {
+            op: round(n / len(documents), 3) for op, n in calls.items()
+        },
+        "embedded_inputs": openai_client.embedded_inputs,
+        "injected_errors": dict(openai_client.errors),
+        "truncated_replies": openai_client.truncated,
+        "graph": {
+            "entities": len(neo4j.graph.entities),
+            "relationships": len(neo4j.graph.relationships),
+            "queries": dict(neo4j.graph.queries),
+            "unhandled_queries": dict(neo4j.graph.unhandled),
+        },
+        "document_status": dict(statuses),
+        "stages": timer.report(),
+        "window_pipeline": pipeline_timer.report().get("window_pipeline"),
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        * (1 if sys.platform == "darwin" else 1024),
+        "peak_traced_bytes": traced_peak,
+    }
+
+
+def run_benchmark(config: dict) -> dict:
+    results = []
+    for size in config["sizes"]:
+        for workers in config["workers"]:
+            runs = []
+            for _ in range(config["repeat"]):
+                if config["isolate"]:
+                    # A fresh interpreter per run keeps peak RSS attributable
+                    with ProcessPoolExecutor(
+                        max_workers=1, mp_context=get_context("spawn")
+                    ) as pool:
+                        runs.append(
+                            pool.submit(run_case, config, size, workers).result()
+                        )
+                else:
+                    runs.append(run_case(config, size, workers))
+
+            median_wall = statistics.median(r["wall_seconds"] for r in runs)
+            result = min(runs, key=lambda r: abs(r["wall_seconds"] - median_wall))
+            result["repeat"] = len(runs)
+            result["wall_seconds_all"] = [r["wall_seconds"] for r in runs]
+            results.append(result)
+            print(
+                f"size={size:>8} workers={workers:>3} chunks={result['chunks']:>5} "
+                f"windows={result['extraction_windows']:>5} "
+                f"wall={result['wall_seconds']:.3f}s "
+                f"chunks/s={result['chunks_per_second']} "
+                f"calls/document={result['calls_per_document']}",
+                file=sys.stderr,
+            )
+
+    return {
+        "benchmark": "ingestion",
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+
+
+def parse_args(argv=None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks.ingestion")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 100_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 10])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--generate-latency", type=float, default=0.05)
+    parser.add_argument("--neo4j-latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--technical",
+        type=float,
+        default=0.0,
+        help="Chance a block starts a run of page breaks, tables or code",
+    )
+    parser.add_argument(
+        "--name-variants",
+        type=float,
+        default=0.0,
+        help="Chance a name is written as one of its variant spellings",
+    )
+    parser.add_argument(
+        "--entity-resolution",
+        action="store_true",
+        help="Resolve variant names into one entity (ENTITY_RESOLUTION_ENABLED)",
+    )
+    parser.add_argument(
+        "--revision-rate",
+        type=float,
+        default=None,
+        help="Make batch documents revisions of the first, with this share of paragraphs edited",
+    )
+    parser.add_argument(
+        "--near-duplicate-threshold",
+        type=float,
+        default=None,
+        help="Override NEAR_DUPLICATE_THRESHOLD (0 disables aliasing)",
+    )
+    parser.add_argument(
+        "--gate-policy",
+        choices=["off", "conservative", "aggressive"],
+        default=None,
+        help="Override EXTRACT_GATE_POLICY",
+    )
+    parser.add_argument("--timeout", type=float, default=3600.0)
+    parser.add_argument(
+        "--extract-window-tokens",
+        type=int,
+        default=None,
+        help="Override EXTRACT_WINDOW_TOKENS (0 = one extraction call per chunk)",
+    )
+    parser.add_argument(
+        "--merged-windows",
+        action="store_true",
+        help="Extract each window as one merged text instead of packed chunks",
+    )
+    parser.add_argument(
+        "--batch-documents",
+        type=int,
+        default=0,
+        help="Ingest this many documents per case through the batch pipeline",
+    )
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument(
+        "--no-isolate",
+        dest="isolate",
+        action="store_false",
+        help="Run every case in this process (peak RSS becomes cumulative)",
+    )
+    parser.add_argument("--output", default=None, help="Write JSON results here")
+    return vars(parser.parse_args(argv))
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    output = config.pop("output")
+    report = run_benchmark(config)
+    payload = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
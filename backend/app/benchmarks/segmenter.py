@@ -0,0 +1,189 @@
+"""
+Sentence segmenter benchmark.
+
+Runs every registered segmenter over the same corpus and reports throughput
+(chars/sec, sentences/sec) and how well its sentence boundaries agree with a
+Punkt reference (precision, recall and F1 over boundary offsets). The corpus
+is the ingestion benchmark's synthetic prose plus generated edge cases
+(abbreviations, decimals, initials, quotes); pass --files to add real
+documents, read the same way uploads are.
+
+The reference is NLTK's pretrained English Punkt model when its data is
+installed, otherwise a Punkt model trained on the corpus itself; the report
+says which.
+
+    python -m app.benchmarks.segmenter --chars 200000 --files docs/*.pdf \\
+        --output segmenter.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from app.benchmarks.ingestion import ENTITY_NAMES, make_document
+from app.core.segmenter import SEGMENTERS
+from app.core.uploads import iter_text
+from app.core.utils import iter_paragraphs
+
+RESULT_SCHEMA_VERSION = 1
+
+_EDGE_CASES = [
+    "{a} met Dr. Smith at 3 p.m. on Monday.",
+    "Revenue grew 4.5% to $12.75 million, i.e. ahead of plan.",
+    "J. R. R. Tolkien wrote it in the U.K. before {b} read it.",
+    '{a} said "we are done." Then {b} left.',
+    "Is {a} ready? {b} thinks so!",
+    "See Fig. 3 and Sec. 2.1 for details, e.g. the latency table.",
+    "Wait... {a} changed the plan (again.) Nobody objected.",
+    "{a} Inc. and {b} Ltd. signed on Jan. 5.",
+    "Version 2.0.1 shipped; {a} approved it.",
+]
+
+
+def make_edge_cases(n_paragraphs: int, seed: int = 0) -> str:
+    """Deterministic paragraphs dense in abbreviations, decimals, initials and quotes."""
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(n_paragraphs):
+        sentences = [
+            rng.choice(_EDGE_CASES).format(
+                a=rng.choice(ENTITY_NAMES), b=rng.choice(ENTITY_NAMES)
+            )
+            for _ in range(rng.randint(3, 6))
+        ]
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def load_corpus(config: dict) -> dict:
+    """Named corpora, each a list of the paragraphs the chunker would segment."""
+    corpora = {
+        "synthetic": make_document(config["chars"], seed=config["seed"]),
+        "edge_cases": make_edge_cases(config["edge_paragraphs"], seed=config["seed"]),
+    }
+    for path in config["files"]:
+        corpora[os.path.basename(path)] = "".join(
+            iter_text(path, os.path.basename(path))
+        )
+    return {
+        name: [p for p in iter_paragraphs([text]) if p.strip()]
+        for name, text in corpora.items()
+    }
+
+
+def load_reference(paragraphs):
+    """(label, tokenizer): pretrained Punkt, or Punkt trained on the corpus."""
+    from nltk.tokenize.punkt import PunktSentenceTokenizer, PunktTokenizer
+
+    try:
+        return "punkt-pretrained", PunktTokenizer("english")
+    except LookupError:
+        return "punkt-trained-on-corpus", PunktSentenceTokenizer(
+            train_text="\n\n".join(paragraphs)
+        )
+
+
+def boundaries(spans) -> set:
+    """Sentence end offsets, except the paragraph's own end."""
+    return {end for _, end in spans[:-1]}
+
+
+def agreement(predicted: list, reference: list) -> dict:
+    hits = sum(len(p & r) for p, r in zip(predicted, reference))
+    n_predicted = sum(len(p) for p in predicted)
+    n_reference = sum(len(r) for r in reference)
+    precision = hits / n_predicted if n_predicted else 1.0
+    recall = hits / n_reference if n_reference else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+    }
+
+
+def run_case(segmenter, paragraphs, reference, repeat: int) -> dict:
+    spans = [segmenter.spans(p) for p in paragraphs]  # also loads lazy models
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for paragraph in paragraphs:
+            segmenter.spans(paragraph)
+        timings.append(time.perf_counter() - start)
+    seconds = min(timings)
+    chars = sum(len(p) for p in paragraphs)
+    sentences = sum(len(s) for s in spans)
+    return {
+        # Punkt without its data runs the rule-based segmenter instead
+        "fell_back": getattr(segmenter, "_fallback", None) is not None,
+        "chars": chars,
+        "sentences": sentences,
+        "seconds": round(seconds, 6),
+        "chars_per_sec": round(chars / seconds, 1) if seconds else None,
+        "sentences_per_sec": round(sentences / seconds, 1) if seconds else None,
+        **agreement([boundaries(s) for s in spans], reference),
+    }
+
+
+def run_benchmark(config: dict) -> dict:
+    corpora = load_corpus(config)
+    label, tokenizer = load_reference([p for ps in corpora.values() for p in ps])
+    results = []
+    for corpus, paragraphs in corpora.items():
+        reference = [boundaries(list(tokenizer.span_tokenize(p))) for p in paragraphs]
+        for name in config["segmenters"]:
+            result = {
+                "corpus": corpus,
+                "segmenter": name,
+                "reference": label,
+                **run_case(SEGMENTERS[name](), paragraphs, reference, config["repeat"]),
+            }
+            print(
+                f"{corpus:>14} {name:>6}: {result['chars_per_sec'] or 0:,.0f} chars/s "
+                f"F1={result['f1']:.3f} vs {label}",
+                file=sys.stderr,
+            )
+            results.append(result)
+    return {
+        "benchmark": "segmenter",
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+
+
+def parse_args(argv=None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks.segmenter")
+    parser.add_argument("--chars", type=int, default=200000)
+    parser.add_argument("--edge-paragraphs", type=int, default=200)
+    parser.add_argument("--files", nargs="*", default=[])
+    parser.add_argument(
+        "--segmenters", nargs="+", default=list(SEGMENTERS), choices=list(SEGMENTERS)
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write JSON results here")
+    return vars(parser.parse_args(argv))
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    output = config.pop("output")
+    report = run_benchmark(config)
+    payload = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
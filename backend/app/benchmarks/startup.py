@@ -0,0 +1,148 @@
+"""
+Worker start-up profile.
+
+Imports the app in fresh interpreters and reports how long `import app.main`
+takes, which modules dominate it (from `python -X importtime`), and the time
+from interpreter start until `/health/live` answers. Also times `warm_up()`,
+the deferred imports a worker loads in the background once it serves.
+
+    python -m app.benchmarks.startup --repeat 5 --top 15 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+RESULT_SCHEMA_VERSION = 1
+
+_SERVE_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    status = client.get("/health/live").status_code
+    live = time.perf_counter()
+    ready = client.get("/health/ready").status_code
+from app.core.health import warm_up
+warm = time.perf_counter()
+timings = warm_up()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "live_seconds": live - start,
+    "live_status": status,
+    "ready_status": ready,
+    "warm_up_seconds": time.perf_counter() - warm,
+    "warm_up": timings,
+}))
+"""
+
+
+def _run(args) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    # Settings need a key to load; nothing is sent upstream
+    env.setdefault("OPENAI_API_KEY", "startup-benchmark")
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, env=env, check=True
+    )
+
+
+def import_profile(top: int) -> dict:
+    """Self and cumulative import time per module, from -X importtime."""
+    result = _run(["-X", "importtime", "-c", "import app.main"])
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules.append(
+            {
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+                "self_seconds": int(self_us) / 1e6,
+                "cumulative_seconds": int(cumulative_us) / 1e6,
+            }
+        )
+    total = next(m for m in modules if m["module"] == "app.main")
+    # Packages imported directly by app code are the ones worth deferring
+    roots = {}
+    for m in modules:
+        root = m["module"].split(".")[0]
+        if root != "app" and m["cumulative_seconds"] > roots.get(root, 0.0):
+            roots[root] = m["cumulative_seconds"]
+    return {
+        "import_seconds": total["cumulative_seconds"],
+        "top_packages": [
+            {"package": name, "seconds": round(seconds, 4)}
+            for name, seconds in sorted(roots.items(), key=lambda kv: -kv[1])[:top]
+        ],
+        "top_modules": sorted(modules, key=lambda m: -m["self_seconds"])[:top],
+    }
+
+
+def serve_profile() -> dict:
+    result = _run(["-c", _SERVE_SCRIPT])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(config: dict) -> dict:
+    runs = [serve_profile() for _ in range(config["repeat"])]
+    profile = import_profile(config["top"])
+
+    def median(key):
+        return round(statistics.median(r[key] for r in runs), 4)
+
+    result = {
+        "import_seconds": median("import_seconds"),
+        "live_seconds": median("live_seconds"),
+        "warm_up_seconds": median("warm_up_seconds"),
+        "live_status": runs[-1]["live_status"],
+        "ready_status": runs[-1]["ready_status"],
+        "warm_up": runs[-1]["warm_up"],
+        "import_profile": profile,
+        "repeat": len(runs),
+    }
+    print(
+        f"import={result['import_seconds']:.3f}s live={result['live_seconds']:.3f}s "
+        f"warm_up={result['warm_up_seconds']:.3f}s",
+        file=sys.stderr,
+    )
+    return {
+        "benchmark": "startup",
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": [result],
+    }
+
+
+def parse_args(argv=None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks.startup")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", default=None, help="Write JSON results here")
+    return vars(parser.parse_args(argv))
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    output = config.pop("output")
+    report = run_benchmark(config)
+    payload = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
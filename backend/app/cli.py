@@ -0,0 +1,84 @@
+"""
+Command line entry point for maintenance tasks.
+
+    python -m app.cli export <chat_id> <archive.zip>
+    python -m app.cli import <archive.zip> [--title TITLE]
+    python -m app.cli compact
+    python -m app.cli communities <chat_id>
+"""
+
+import argparse
+import asyncio
+from uuid import UUID
+from app.services.snapshot_service import SnapshotService
+from app.services.compaction_service import CompactionService
+from app.services.community_service import CommunityService
+
+
+async def export_command(args):
+    service = SnapshotService()
+    try:
+        manifest = await service.export_chat(UUID(args.chat_id), args.path)
+        print(f"Exported chat {args.chat_id} to {args.path}: {manifest['counts']}")
+    finally:
+        service.close()
+
+
+async def import_command(args):
+    service = SnapshotService()
+    try:
+        chat = await service.import_chat(args.path, title=args.title)
+        print(f"Imported {args.path} as chat {chat.id}")
+    finally:
+        service.close()
+
+
+async def compact_command(args):
+    service = CompactionService()
+    try:
+        report = await service.run()
+        print(report.model_dump_json(indent=2))
+    finally:
+        service.close()
+
+
+async def communities_command(args):
+    service = CommunityService()
+    try:
+        report = await service.build(UUID(args.chat_id))
+        print(report.model_dump_json(indent=2))
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export a chat snapshot")
+    export_parser.add_argument("chat_id")
+    export_parser.add_argument("path")
+    export_parser.set_defaults(handler=export_command)
+
+    import_parser = subparsers.add_parser("import", help="Import a chat snapshot")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--title", default=None)
+    import_parser.set_defaults(handler=import_command)
+
+    compact_parser = subparsers.add_parser(
+        "compact", help="Purge data of deleted chats and failed documents"
+    )
+    compact_parser.set_defaults(handler=compact_command)
+
+    communities_parser = subparsers.add_parser(
+        "communities", help="Rebuild a chat's community summaries"
+    )
+    communities_parser.add_argument("chat_id")
+    communities_parser.set_defaults(handler=communities_command)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
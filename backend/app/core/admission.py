@@ -0,0 +1,139 @@
+"""
+Global admission control for ingestion jobs.
+
+At most `max_active` jobs (single uploads or whole batches) run at once;
+up to `max_pending` more wait in FIFO order. Beyond that new jobs are
+rejected with an estimated Retry-After instead of piling up LLM calls and
+timing out together. Jobs reserve their place when the request is accepted
+and run when a slot frees up; the ingestion timeout only starts then.
+
+The controller lives in the API process's event loop, like the background
+tasks that use it.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+from app.core.config import settings
+from app.core.metrics import (
+    INGESTION_ADMISSIONS,
+    INGESTION_JOBS_ACTIVE,
+    INGESTION_JOBS_PENDING,
+)
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Ingestion queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_active: int = 4,
+        max_pending: int = 50,
+        default_job_seconds: float = 60.0,
+    ):
+        self.max_active = max_active
+        self.max_pending = max_pending
+        self._active = set()
+        self._pending = OrderedDict()  # job id -> Event set when promoted
+        # Moving average of job duration, for Retry-After estimates
+        self._job_seconds = default_job_seconds
+
+    def admit(self, job_id) -> int:
+        """Reserve a place for the job; returns its queue position (0 = runs now)."""
+        key = str(job_id)
+        if len(self._active) < self.max_active and not self._pending:
+            self._active.add(key)
+            INGESTION_ADMISSIONS.labels(result="admitted").inc()
+            self._report()
+            return 0
+        if len(self._pending) >= self.max_pending:
+            INGESTION_ADMISSIONS.labels(result="rejected").inc()
+            raise QueueFull(self.retry_after())
+        self._pending[key] = asyncio.Event()
+        INGESTION_ADMISSIONS.labels(result="queued").inc()
+        self._report()
+        return len(self._pending)
+
+    def position(self, job_id) -> Optional[int]:
+        """0 while running, 1.. while waiting, None when unknown or finished."""
+        key = str(job_id)
+        if key in self._active:
+            return 0
+        for i, pending in enumerate(self._pending, start=1):
+            if pending == key:
+                return i
+        return None
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up."""
+        waves = (len(self._pending) + 1) / max(self.max_active, 1)
+        return max(1, min(3600, math.ceil(self._job_seconds * waves)))
+
+    @asynccontextmanager
+    async def run(self, job_id):
+        """Wait for the admitted job's turn, then hold its slot until done."""
+        key = str(job_id)
+        event = self._pending.get(key)
+        try:
+            if event is not None:
+                await event.wait()
+        except BaseException:
+            # Cancelled while waiting; a promotion may have raced the cancel
+            if self._pending.pop(key, None) is None:
+                self._release(key)
+            self._report()
+            raise
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._job_seconds = 0.8 * self._job_seconds + 0.2 * elapsed
+            self._release(key)
+
+    def _release(self, key: str):
+        self._active.discard(key)
+        while self._pending and len(self._active) < self.max_active:
+            promoted, event = self._pending.popitem(last=False)
+            self._active.add(promoted)
+            event.set()
+        self._report()
+
+    def _report(self):
+        INGESTION_JOBS_ACTIVE.set(len(self._active))
+        INGESTION_JOBS_PENDING.set(len(self._pending))
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+_controller_lock = threading.Lock()
+_shared_controller = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Process-wide controller configured from settings."""
+    global _shared_controller
+    if _shared_controller is None:
+        with _controller_lock:
+            if _shared_controller is None:
+                _shared_controller = AdmissionController(
+                    max_active=settings.INGEST_MAX_CONCURRENT,
+                    max_pending=settings.INGEST_MAX_PENDING,
+                    default_job_seconds=settings.INGEST_RETRY_AFTER_SECONDS,
+                )
+    return _shared_controller
@@ -0,0 +1,146 @@
+"""
+Per-chat semantic answer cache.
+
+Stores the embeddings of recently answered questions together with their
+answers. A new question whose embedding is close enough (cosine similarity at
+or above the threshold) to a cached one gets the stored answer back.
+
+Each chat's entries carry the document-set version they were answered under;
+a lookup with a different version drops the chat's entries, so a completed
+ingestion invalidates the cache without any explicit signal. Entries older
+than the TTL are evicted before a lookup scores anything, so an expired
+near-match never hides a fresh one.
+"""
+
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from app.core import events
+from app.core.config import settings
+
+
+class _ChatEntries:
+    __slots__ = ("version", "vectors", "answers", "questions", "created_at")
+
+    def __init__(self, version, dim: int):
+        self.version = version
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.answers = []
+        self.questions = []
+        self.created_at = []
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries_per_chat: int = 256,
+        max_chats: int = 1024,
+        ttl_seconds: Optional[float] = None,
+    ):
+        self.threshold = threshold
+        self.max_entries_per_chat = max_entries_per_chat
+        self.max_chats = max_chats
+        self.ttl_seconds = ttl_seconds
+        self._chats = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def lookup(self, chat_id, vector, version) -> Optional[dict]:
+        """Best cached answer for this chat and version, or None below threshold."""
+        key = str(chat_id)
+        query = self._normalize(vector)
+        with self._lock:
+            entries = self._chats.get(key)
+            if entries is None:
+                return None
+            if entries.version != version:
+                del self._chats[key]
+                return None
+            self._chats.move_to_end(key)
+            self._expire(entries)
+            if not entries.answers:
+                return None
+
+            scores = entries.vectors @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            return {
+                "answer": entries.answers[best],
+                "question": entries.questions[best],
+                "similarity": float(scores[best]),
+            }
+
+    def _expire(self, entries: _ChatEntries):
+        if not self.ttl_seconds:
+            return
+        # Entries are appended in time order, so the expired ones are a prefix
+        expired = bisect.bisect_left(entries.created_at, time.time() - self.ttl_seconds)
+        if expired:
+            self._drop_oldest(entries, expired)
+
+    @staticmethod
+    def _drop_oldest(entries: _ChatEntries, count: int):
+        entries.vectors = entries.vectors[count:]
+        del entries.answers[:count]
+        del entries.questions[:count]
+        del entries.created_at[:count]
+
+    def store(self, chat_id, vector, version, question: str, answer: str):
+        key = str(chat_id)
+        row = self._normalize(vector)[None, :]
+        with self._lock:
+            entries = self._chats.get(key)
+            if entries is None or entries.version != version:
+                entries = _ChatEntries(version, row.shape[1])
+                self._chats[key] = entries
+            self._chats.move_to_end(key)
+
+            entries.vectors = np.vstack([entries.vectors, row])
+            entries.answers.append(answer)
+            entries.questions.append(question)
+            entries.created_at.append(time.time())
+
+            overflow = len(entries.answers) - self.max_entries_per_chat
+            if overflow > 0:
+                self._drop_oldest(entries, overflow)
+
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+
+    def invalidate(self, chat_id, **_):
+        with self._lock:
+            self._chats.pop(str(chat_id), None)
+
+
+_cache_lock = threading.Lock()
+_shared_cache = None
+_cache_initialized = False
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Process-wide answer cache configured from settings, or None when disabled."""
+    global _shared_cache, _cache_initialized
+    if not _cache_initialized:
+        with _cache_lock:
+            if not _cache_initialized:
+                if settings.ANSWER_CACHE_ENABLED:
+                    _shared_cache = SemanticAnswerCache(
+                        threshold=settings.ANSWER_CACHE_THRESHOLD,
+                        max_entries_per_chat=settings.ANSWER_CACHE_MAX_ENTRIES_PER_CHAT,
+                        ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS or None,
+                    )
+                    # Answers are also versioned; this just frees stale entries early
+                    events.subscribe(events.DOCUMENT_INGESTED, _shared_cache.invalidate)
+                    events.subscribe(events.GRAPH_CHANGED, _shared_cache.invalidate)
+                _cache_initialized = True
+    return _shared_cache
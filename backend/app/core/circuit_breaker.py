@@ -0,0 +1,103 @@
+"""
+Circuit breakers for backing stores.
+
+After CIRCUIT_FAILURE_THRESHOLD consecutive failures or timeouts, a breaker
+opens and calls fail at once with CircuitOpen instead of queueing behind a
+dependency that is down. Once CIRCUIT_RESET_SECONDS have passed, one trial
+call is let through (half-open): success closes the breaker, failure opens it
+for another period. A trial whose caller stops waiting for it is released
+without a verdict, so the next call makes the trial instead; one that never
+reports back at all is replaced after the same wait.
+"""
+
+import threading
+import time
+from app.core.config import settings
+from app.core.metrics import CIRCUIT_BREAKER_STATE
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open; retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(
+        self, name: str, failure_threshold: int = None, reset_seconds: float = None
+    ):
+        self.name = name
+        self.failure_threshold = (
+            settings.CIRCUIT_FAILURE_THRESHOLD
+            if failure_threshold is None
+            else failure_threshold
+        )
+        self.reset_seconds = (
+            settings.CIRCUIT_RESET_SECONDS if reset_seconds is None else reset_seconds
+        )
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_pending = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go through now."""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.reset_seconds or (
+                self.state == HALF_OPEN and not self._trial_pending
+            ):
+                # This caller makes the trial call; the rest keep failing fast
+                self._opened_at = time.monotonic()
+                self._trial_pending = True
+                self._set_state(HALF_OPEN)
+                return
+            raise CircuitOpen(self.name, max(self.reset_seconds - waited, 0.0))
+
+    def release_trial(self):
+        """Give up a call without a verdict on the dependency, freeing a half-open trial."""
+        with self._lock:
+            self._trial_pending = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_pending = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_pending = False
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_BREAKER_STATE.labels(dependency=self.name).set(_STATE_VALUES[state])
+
+
+_breakers_lock = threading.Lock()
+_breakers = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for a dependency ("neo4j", "qdrant")."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
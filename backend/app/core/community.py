@@ -0,0 +1,127 @@
+"""
+Louvain community detection on a weighted, undirected graph.
+
+Runs locally on an adjacency exported from Neo4j, so no graph-algorithm
+plugin is needed on the server. `louvain` returns one partition per level of
+the hierarchy, finest first; each partition maps every original node to a
+community id at that level.
+"""
+
+import random
+from collections import defaultdict
+
+
+def _build_adjacency(n: int, edges) -> list[dict]:
+    adjacency = [defaultdict(float) for _ in range(n)]
+    for u, v, w in edges:
+        if w <= 0:
+            continue
+        adjacency[u][v] += w
+        if u != v:
+            adjacency[v][u] += w
+    return adjacency
+
+
+def _degree(adjacency, node: int) -> float:
+    # A self-loop counts twice towards the degree
+    return sum(adjacency[node].values()) + adjacency[node].get(node, 0.0)
+
+
+def _local_moving(adjacency, resolution: float, rng) -> tuple[list[int], bool]:
+    """Move nodes between neighbouring communities while modularity improves."""
+    n = len(adjacency)
+    degrees = [_degree(adjacency, i) for i in range(n)]
+    m2 = sum(degrees)
+    community = list(range(n))
+    totals = list(degrees)
+    if m2 == 0:
+        return community, False
+
+    order = list(range(n))
+    moved_any = False
+    improved = True
+    while improved:
+        improved = False
+        rng.shuffle(order)
+        for node in order:
+            current = community[node]
+            k_i = degrees[node]
+            links = defaultdict(float)
+            for neighbour, w in adjacency[node].items():
+                if neighbour != node:
+                    links[community[neighbour]] += w
+
+            totals[current] -= k_i
+            best = current
+            best_gain = (
+                links.get(current, 0.0) - resolution * totals[current] * k_i / m2
+            )
+            for candidate, k_i_in in links.items():
+                gain = k_i_in - resolution * totals[candidate] * k_i / m2
+                if gain > best_gain + 1e-12:
+                    best, best_gain = candidate, gain
+            totals[best] += k_i
+
+            if best != current:
+                community[node] = best
+                improved = True
+                moved_any = True
+    return community, moved_any
+
+
+def _aggregate(adjacency, community: list[int]) -> tuple[list[dict], list[int]]:
+    """Collapse each community into one node; returns (adjacency, node -> new id)."""
+    ids = {}
+    mapping = [ids.setdefault(c, len(ids)) for c in community]
+    aggregated = [defaultdict(float) for _ in range(len(ids))]
+    for u, neighbours in enumerate(adjacency):
+        for v, w in neighbours.items():
+            cu, cv = mapping[u], mapping[v]
+            if u == v:
+                aggregated[cu][cu] += w
+            elif cu == cv:
+                # Internal edges are seen from both ends but become one self-loop
+                aggregated[cu][cu] += w / 2
+            else:
+                aggregated[cu][cv] += w
+    return aggregated, mapping
+
+
+def louvain(
+    n: int,
+    edges,
+    resolution: float = 1.0,
+    max_levels: int = 10,
+    seed: int = 0,
+) -> list[list[int]]:
+    """Hierarchical Louvain over nodes 0..n-1 and (u, v, weight) edges."""
+    rng = random.Random(seed)
+    adjacency = _build_adjacency(n, edges)
+    membership = list(range(n))
+    levels = []
+    for _ in range(max_levels):
+        community, moved = _local_moving(adjacency, resolution, rng)
+        if not moved:
+            break
+        adjacency, mapping = _aggregate(adjacency, community)
+        membership = [mapping[c] for c in membership]
+        levels.append(list(membership))
+    if not levels:
+        levels.append(membership)
+    return levels
+
+
+def modularity(n: int, edges, partition: list[int], resolution: float = 1.0):
+    adjacency = _build_adjacency(n, edges)
+    degrees = [_degree(adjacency, i) for i in range(n)]
+    m2 = sum(degrees)
+    if m2 == 0:
+        return 0.0
+    internal = defaultdict(float)
+    totals = defaultdict(float)
+    for u in range(n):
+        totals[partition[u]] += degrees[u]
+        for v, w in adjacency[u].items():
+            if partition[u] == partition[v]:
+                internal[partition[u]] += w if u != v else 2 * w
+    return sum(internal[c] / m2 - resolution * (totals[c] / m2) ** 2 for c in totals)
@@ -11,15 +11,21 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_LLM_MODEL: str = "gpt-4o-mini"
     OPENAI_EMBED_MODEL: str = "text-embedding-3-small"
+    LLM_STRUCTURED_OUTPUT: bool = (
+        True  # JSON-schema replies where the model supports it
+    )
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
 
     # Neo4j Settings
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USER: str = "neo4j"
     NEO4J_PASSWORD: str = "password"
+    NEO4J_TIMEOUT_SECONDS: float = 10.0
 
     # Qdrant Settings
     QDRANT_HOST: str = "localhost"
     QDRANT_PORT: int = 6333
+    QDRANT_TIMEOUT_SECONDS: int = 10
 
     @property
     def QDRANT_URL(self) -> str:
@@ -43,6 +49,116 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> str:
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    # Startup Settings
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+    SENTENCE_SEGMENTER: str = "rules"  # rules or punkt
+    NLTK_DATA_DIR: Optional[str] = None  # pre-provisioned punkt data
+    NLTK_DOWNLOAD_MISSING: bool = False  # network download on first use
+
+    # Coordination Settings
+    COORDINATION_BACKEND: str = "local"  # local or postgres
+    COORDINATION_POLL_SECONDS: float = 0.2
+    COORDINATION_LOCK_CONNECTIONS: int = 20  # postgres: connections for held locks
+    LLM_REQUESTS_PER_MINUTE: int = 0  # 0 disables the shared request budget
+    LLM_REQUEST_BURST: int = 50
+
+    # Chunking Settings
+    CHUNK_TARGET_TOKENS: int = 250  # embedding chunk size
+    CHUNK_MAX_TOKENS: int = 375
+    CHUNK_OVERLAP_TOKENS: int = 40
+    EXTRACT_WINDOW_TOKENS: int = 2000  # text per extraction call; 0 = one chunk
+    EXTRACT_PACKED: bool = True  # chunk-tagged requests; False merges the window
+    EXTRACT_GATE_POLICY: str = "conservative"  # off, conservative or aggressive
+    EXTRACT_GATE_MIN_CHARS: int = 40
+    EXTRACT_GATE_MIN_PROPER_NOUN_DENSITY: float = 0.02  # per word
+    EXTRACT_GATE_BOILERPLATE_REPEATS: int = 3
+    NEAR_DUPLICATE_THRESHOLD: float = 0.85  # estimated Jaccard; 0 = off
+
+    # Upload Settings
+    INGEST_MAX_UPLOAD_MB: int = 100
+    UPLOAD_SPOOL_DIR: Optional[str] = None  # defaults to the system temp dir
+
+    # Ingestion Admission Settings
+    INGEST_MAX_CONCURRENT: int = 4
+    INGEST_MAX_PENDING: int = 50
+    INGEST_RETRY_AFTER_SECONDS: int = 60
+
+    # Batch Ingestion Settings
+    INGEST_BATCH_MAX_FILES: int = 500
+    INGEST_BATCH_MAX_MB: int = 512
+    INGEST_BATCH_WORKERS: int = 16
+    INGEST_BATCH_CONCURRENT_DOCUMENTS: int = 4
+    INGEST_EMBED_BATCH_SIZE: int = 64
+    INGEST_EMBED_WORKERS: int = 2
+
+    # Graph Settings
+    GRAPH_DIGEST_TOP_K: int = 20
+    GRAPH_DIGEST_BATCH_SIZE: int = 500
+    GRAPH_DIGEST_MAX_CHUNKS: int = 20
+    GRAPH_CHUNK_FETCH_LIMIT: int = 3
+    GRAPH_RETRIEVE_HOPS: int = 1
+    GRAPH_RETRIEVE_MAX_DIGESTS: int = 20
+    GRAPH_CACHE_ENABLED: bool = False
+    GRAPH_CACHE_MAX_MB: int = 256
+    GRAPH_CACHE_MIN_HITS: int = 2
+    GRAPH_CACHE_TTL_SECONDS: int = 300
+
+    # Entity Resolution Settings
+    ENTITY_RESOLUTION_ENABLED: bool = False
+    ENTITY_RESOLUTION_THRESHOLD: float = 0.92
+    ENTITY_RESOLUTION_EMBEDDINGS: bool = False  # also compare name embeddings
+    ENTITY_ALIAS_CACHE_TTL_SECONDS: int = 300
+
+    # Community Summary Settings
+    COMMUNITY_RESOLUTION: float = 1.0
+    COMMUNITY_MAX_LEVELS: int = 3
+    COMMUNITY_MIN_SIZE: int = 3
+    COMMUNITY_MAX_PER_LEVEL: int = 50
+    COMMUNITY_REPORT_MAX_TOKENS: int = 2000
+    COMMUNITY_SUMMARY_WORKERS: int = 4
+
+    # Global Search Settings
+    GLOBAL_MAP_CALLS: int = 4
+    GLOBAL_MAP_BATCH_TOKENS: int = 6000
+    GLOBAL_REDUCE_TOKENS: int = 4000
+
+    # LLM Cache Settings
+    LLM_CACHE_BACKEND: str = "none"  # none, memory or sqlite
+    LLM_CACHE_PATH: str = "cache/llm_cache.sqlite3"
+    LLM_CACHE_TTL_SECONDS: int = 0  # 0 keeps entries until evicted
+    LLM_CACHE_MAX_ENTRIES: int = 100_000
+    LLM_CACHE_CALL_SITES: str = "parse,extract,answer"
+    LLM_SINGLE_FLIGHT_ENABLED: bool = True
+
+    # Answer Cache Settings
+    ANSWER_CACHE_ENABLED: bool = False
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+    ANSWER_CACHE_MAX_ENTRIES_PER_CHAT: int = 256
+    ANSWER_CACHE_TTL_SECONDS: int = 0  # 0 keeps answers until the documents change
+
+    # Deadline Settings
+    CHAT_DEADLINE_SECONDS: float = 20.0  # 0 = no deadline
+    CHAT_GLOBAL_DEADLINE_SECONDS: float = 60.0
+    CHAT_VECTOR_BUDGET_SECONDS: float = 3.0
+    CHAT_GRAPH_BUDGET_SECONDS: float = 5.0  # parse, graph lookup and chunk fetch
+    CHAT_ANSWER_RESERVE_SECONDS: float = 8.0
+    CHAT_STAGE_WORKERS: int = 64
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # 0 disables circuit breakers
+    CIRCUIT_RESET_SECONDS: float = 30.0
+
+    # Observability Settings
+    SQL_ECHO: bool = False
+    METRICS_ENABLED: bool = True
+    TRACING_ENABLED: bool = False
+    TRACE_FILE: str = "traces/spans.jsonl"
+
+    # Compaction Settings
+    COMPACTION_ENABLED: bool = False
+    COMPACTION_INTERVAL_SECONDS: int = 3600
+    COMPACTION_GRACE_SECONDS: int = 600
+    COMPACTION_BATCH_SIZE: int = 1000
+    COMPACTION_BATCH_PAUSE_SECONDS: float = 0.5
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -5,6 +5,7 @@ class ChatStatus(str, Enum):
     ACTIVE = "active"
     ARCHIVED = "archived"
     DELETED = "deleted"
+    PURGED = "purged"
 
 
 class MessageRole(str, Enum):
@@ -19,6 +20,8 @@ class DocumentStatus(str, Enum):
     PROCESSED = "processed"
     COMPLETED = "completed"
     FAILED = "failed"
+    DUPLICATE = "duplicate"
+    PURGED = "purged"
 
 
 class DocumentType(str, Enum):
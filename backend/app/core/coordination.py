@@ -0,0 +1,278 @@
+"""
+Cross-process coordination.
+
+API workers and replicas share Qdrant, Neo4j, Postgres and one OpenAI
+account, but threading locks and in-memory budgets only cover their own
+process. The coordinator provides named locks and token-bucket rate limits
+with two backends:
+
+- "local" (default): threading locks and in-memory buckets, enough for a
+  single process.
+- "postgres": advisory locks and the shared `rate_buckets` table, so every
+  process waits on the same locks and spends one budget. A held lock keeps
+  its connection, so locks use their own engine of
+  COORDINATION_LOCK_CONNECTIONS connections and never drain the pool that
+  request handlers and ingestion need to finish the work done under them.
+
+Async code uses `lock()` and `acquire()`. Code running in worker threads
+uses `lock_sync()` and `acquire_sync()`; with Postgres these run on the
+event loop that called `start()`.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core.config import settings
+from app.core.metrics import COORDINATION_WAIT_SECONDS
+from app.db.queries.coordination import (
+    ADVISORY_UNLOCK_QUERY,
+    ENSURE_RATE_BUCKET_QUERY,
+    LOCK_RATE_BUCKET_QUERY,
+    TRY_ADVISORY_LOCK_QUERY,
+    UPDATE_RATE_BUCKET_QUERY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def lock_key(name: str) -> int:
+    """Signed 64-bit advisory lock key for a lock name."""
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def refill(tokens, elapsed, rate_per_minute, capacity, cost) -> tuple:
+    """One token-bucket step: (tokens left, seconds to wait, 0 when cost was taken)."""
+    rate = rate_per_minute / 60.0
+    tokens = min(capacity, tokens + max(elapsed, 0.0) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class LocalCoordinator:
+    def __init__(self, poll_seconds: float = 0.2):
+        self.poll_seconds = poll_seconds
+        self._locks = {}
+        self._buckets = {}  # name -> (tokens, monotonic time)
+        self._lock = threading.Lock()
+
+    async def start(self):
+        pass
+
+    def _named_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    @asynccontextmanager
+    async def lock(self, name: str):
+        lock = self._named_lock(name)
+        # Never block the event loop on a lock held by a worker thread
+        with COORDINATION_WAIT_SECONDS.labels(kind="lock").time():
+            while not lock.acquire(blocking=False):
+                await asyncio.sleep(self.poll_seconds)
+        try:
+            yield
+        finally:
+            lock.release()
+
+    @contextmanager
+    def lock_sync(self, name: str):
+        lock = self._named_lock(name)
+        with COORDINATION_WAIT_SECONDS.labels(kind="lock").time():
+            lock.acquire()
+        try:
+            yield
+        finally:
+            lock.release()
+
+    async def acquire(self, bucket: str, rate_per_minute, capacity, cost=1.0):
+        """Wait until `cost` tokens can be taken from the bucket."""
+        cost = min(cost, capacity)
+        with COORDINATION_WAIT_SECONDS.labels(kind="rate").time():
+            while wait := await self._take_async(
+                bucket, rate_per_minute, capacity, cost
+            ):
+                await asyncio.sleep(wait)
+
+    def acquire_sync(self, bucket: str, rate_per_minute, capacity, cost=1.0):
+        """acquire() for worker threads."""
+        cost = min(cost, capacity)
+        with COORDINATION_WAIT_SECONDS.labels(kind="rate").time():
+            while wait := self._take_sync(bucket, rate_per_minute, capacity, cost):
+                time.sleep(wait)
+
+    async def _take_async(self, bucket, rate_per_minute, capacity, cost) -> float:
+        return self._take(bucket, rate_per_minute, capacity, cost)
+
+    def _take_sync(self, bucket, rate_per_minute, capacity, cost) -> float:
+        return self._take(bucket, rate_per_minute, capacity, cost)
+
+    def _take(self, bucket, rate_per_minute, capacity, cost) -> float:
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(bucket, (capacity, now))
+            tokens, wait = refill(
+                tokens, now - updated, rate_per_minute, capacity, cost
+            )
+            self._buckets[bucket] = (tokens, now)
+        return wait
+
+
+class PostgresCoordinator(LocalCoordinator):
+    """
+    Advisory locks and shared token buckets in Postgres.
+
+    Sync callers that cannot reach the event loop (before `start()`, or on
+    the loop's own thread) fall back to the process-local primitives.
+    """
+
+    def __init__(self, engine=None, poll_seconds: float = 0.2, lock_engine=None):
+        super().__init__(poll_seconds)
+        self.engine = engine
+        self.lock_engine = lock_engine
+        self._loop = None
+        self._warned = False
+
+    async def start(self):
+        if self.engine is None:
+            from app.db.session import engine
+
+            self.engine = engine
+        if self.lock_engine is None:
+            self.lock_engine = create_async_engine(
+                self.engine.url,
+                pool_size=settings.COORDINATION_LOCK_CONNECTIONS,
+                max_overflow=0,
+            )
+        self._loop = asyncio.get_running_loop()
+
+    @asynccontextmanager
+    async def lock(self, name: str):
+        if self.lock_engine is None:
+            await self.start()
+        key = lock_key(name)
+        conn = await self._lock_connection(key)
+        try:
+            yield
+        finally:
+            await self._unlock_connection(conn, key)
+
+    @contextmanager
+    def lock_sync(self, name: str):
+        if not self._bridged():
+            with super().lock_sync(name):
+                yield
+            return
+        key = lock_key(name)
+        conn = self._call(self._lock_connection(key))
+        try:
+            yield
+        finally:
+            self._call(self._unlock_connection(conn, key))
+
+    async def _lock_connection(self, key: int):
+        """A connection holding the advisory lock; polls so waiting can be cancelled."""
+        conn = await self.lock_engine.connect()
+        try:
+            with COORDINATION_WAIT_SECONDS.labels(kind="lock").time():
+                while True:
+                    acquired = (
+                        await conn.execute(text(TRY_ADVISORY_LOCK_QUERY), {"key": key})
+                    ).scalar()
+                    # The lock outlives the transaction; don't sit idle in one
+                    await conn.commit()
+                    if acquired:
+                        return conn
+                    await asyncio.sleep(self.poll_seconds)
+        except BaseException:
+            # The last attempt may have taken the lock; dropping the session frees it
+            await conn.invalidate()
+            await conn.close()
+            raise
+
+    async def _unlock_connection(self, conn, key: int):
+        try:
+            await conn.execute(text(ADVISORY_UNLOCK_QUERY), {"key": key})
+            await conn.commit()
+        except BaseException:
+            # Never return a connection that may still hold the lock to the pool
+            await conn.invalidate()
+            raise
+        finally:
+            await conn.close()
+
+    async def _take_async(self, bucket, rate_per_minute, capacity, cost) -> float:
+        if self.engine is None:
+            await self.start()
+        try:
+            return await self._take_shared(bucket, rate_per_minute, capacity, cost)
+        except Exception as e:
+            # A rate budget is no reason to stop serving while Postgres is away
+            logger.warning(f"⚠️ Shared rate bucket {bucket} unavailable: {e}")
+            return self._take(bucket, rate_per_minute, capacity, cost)
+
+    def _take_sync(self, bucket, rate_per_minute, capacity, cost) -> float:
+        if not self._bridged():
+            return self._take(bucket, rate_per_minute, capacity, cost)
+        return self._call(self._take_async(bucket, rate_per_minute, capacity, cost))
+
+    async def _take_shared(self, bucket, rate_per_minute, capacity, cost) -> float:
+        params = {"name": bucket, "capacity": capacity}
+        async with self.engine.begin() as conn:
+            await conn.execute(text(ENSURE_RATE_BUCKET_QUERY), params)
+            row = (await conn.execute(text(LOCK_RATE_BUCKET_QUERY), params)).one()
+            tokens, wait = refill(
+                float(row.tokens), float(row.elapsed), rate_per_minute, capacity, cost
+            )
+            await conn.execute(
+                text(UPDATE_RATE_BUCKET_QUERY), {"name": bucket, "tokens": tokens}
+            )
+        return wait
+
+    def _bridged(self) -> bool:
+        """Whether this thread can block on a call into the coordinator's loop."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            reachable = False
+        else:
+            try:
+                reachable = asyncio.get_running_loop() is not loop
+            except RuntimeError:
+                reachable = True
+        if not reachable and not self._warned:
+            self._warned = True
+            logger.warning(
+                "⚠️ Coordinator loop not reachable from this thread; "
+                "falling back to process-local locks and budgets"
+            )
+        return reachable
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+
+_coordinator_lock = threading.Lock()
+_shared_coordinator = None
+
+
+def get_coordinator():
+    """Process-wide coordinator for COORDINATION_BACKEND."""
+    global _shared_coordinator
+    if _shared_coordinator is None:
+        with _coordinator_lock:
+            if _shared_coordinator is None:
+                if settings.COORDINATION_BACKEND == "postgres":
+                    _shared_coordinator = PostgresCoordinator(
+                        poll_seconds=settings.COORDINATION_POLL_SECONDS
+                    )
+                else:
+                    _shared_coordinator = LocalCoordinator(
+                        poll_seconds=settings.COORDINATION_POLL_SECONDS
+                    )
+    return _shared_coordinator
@@ -0,0 +1,142 @@
+"""
+Request deadlines and stage budgets.
+
+A chat request gets a Deadline when it arrives. Each retrieval stage group
+(vector recall, graph) gets a child deadline: its own budget, capped by what
+the request deadline leaves once CHAT_ANSWER_RESERVE_SECONDS, or half the
+time left if that is less, are set aside for the answer. Blocking calls run
+in worker threads through `run_stage`, so the request stops waiting when
+time runs out. A thread that is given up on keeps running until its call
+ends: OpenAI and Qdrant calls fail after OPENAI_TIMEOUT_SECONDS and
+QDRANT_TIMEOUT_SECONDS, and the server aborts Neo4j read queries after
+NEO4J_TIMEOUT_SECONDS (see read_query). Its outcome still reaches the
+circuit breaker then. Stages use their own pool of CHAT_STAGE_WORKERS
+threads, so such stragglers never hold up the threads ingestion and other
+`asyncio.to_thread` callers share.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import settings
+
+_executor_lock = threading.Lock()
+_executor = None
+
+
+def _stage_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.CHAT_STAGE_WORKERS,
+                    thread_name_prefix="chat-stage",
+                )
+    return _executor
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time before it could be answered."""
+
+
+class Deadline:
+    def __init__(self, seconds: Optional[float] = None, expires_at: float = None):
+        if expires_at is None and seconds:
+            expires_at = time.monotonic() + seconds
+        self.expires_at = expires_at
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, never negative; None without a deadline."""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def child(self, budget: Optional[float], reserve: float = 0.0) -> "Deadline":
+        """
+        A stage deadline: `budget` seconds from now, ending `reserve` seconds
+        before this one. The reserve takes at most half the time left, so a
+        short deadline still leaves the stage some.
+        """
+        now = time.monotonic()
+        ends = []
+        if budget:
+            ends.append(now + budget)
+        if self.expires_at is not None:
+            left = max(self.expires_at - now, 0.0)
+            ends.append(self.expires_at - min(reserve, left / 2))
+        return Deadline(expires_at=min(ends) if ends else None)
+
+
+async def run_stage(
+    deadline: Deadline, fn, *args, breaker: CircuitBreaker = None, **kwargs
+):
+    """
+    Run the blocking fn in a worker thread within the deadline. Raises
+    TimeoutError when time runs out, and CircuitOpen without calling fn when
+    the breaker is open. Only fn's own errors (including the store client's
+    timeouts) count as breaker failures: running out of time or being
+    cancelled says nothing about the store, so the call is abandoned and its
+    outcome recorded whenever it arrives.
+    """
+    if deadline.expired:
+        raise TimeoutError("No time left for this stage")
+    if breaker is not None:
+        breaker.before_call()
+    # Like asyncio.to_thread, the call sees the caller's context variables
+    call = functools.partial(
+        contextvars.copy_context().run, functools.partial(fn, *args, **kwargs)
+    )
+    future = _stage_executor().submit(call)
+    waiter = asyncio.wrap_future(future)
+    try:
+        done, _ = await asyncio.wait({waiter}, timeout=deadline.remaining())
+    except asyncio.CancelledError:
+        _abandon(future, waiter, breaker)
+        raise
+    if not done:
+        _abandon(future, waiter, breaker)
+        raise TimeoutError("Stage ran out of time")
+    try:
+        result = waiter.result()
+    except Exception:
+        if breaker is not None:
+            breaker.record_failure()
+        raise
+    if breaker is not None:
+        breaker.record_success()
+    return result
+
+
+def _abandon(future, waiter, breaker: Optional[CircuitBreaker]):
+    # A call still queued never runs; a running one reports when it ends
+    future.cancel()
+    waiter.add_done_callback(_retrieve)
+    if breaker is None:
+        return
+    breaker.release_trial()
+    future.add_done_callback(functools.partial(_record_late, breaker))
+
+
+def _retrieve(waiter):
+    # Keeps asyncio from logging an exception nobody is waiting for
+    if not waiter.cancelled():
+        waiter.exception()
+
+
+def _record_late(breaker: CircuitBreaker, future):
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
@@ -0,0 +1,339 @@
+"""
+Entity resolution.
+
+Extraction names one thing in several ways ("OpenAI", "OpenAI Inc.", "Open
+AI"), while the graph merges only identical normalised names. Before a graph
+write, names are paired up by blocking keys (their tokens, a prefix of their
+compact form, their initials), each pair is scored, and pairs scoring at
+least ENTITY_RESOLUTION_THRESHOLD are clustered with union-find. A cluster is
+written as one entity under a canonical name; its other names become aliases.
+
+Pair scores:
+- 1.0 when the names have the same words once case, punctuation, spacing,
+  word order and legal suffixes (Inc., Ltd., ...) are ignored;
+- 0.95 for an upper-case acronym and the name it abbreviates;
+- otherwise the difflib ratio of the compact forms, averaged with the cosine
+  similarity of the names' embeddings when ENTITY_RESOLUTION_EMBEDDINGS is on.
+  Only names with the same numbers and the same number of words get a ratio,
+  and the words they differ in must be long and more than plurals of each
+  other: "Windows Server 2016" and "Windows Server 2019", "Carl Smith" and
+  "Carol Smith", "Android" and "Androids" are different things.
+Matches below 1.0 also need compatible entity types, and people's names
+need the embeddings to agree: a string alone can't tell two people apart.
+
+At query time an AliasIndex maps the names a question uses to canonical ones.
+"""
+
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from difflib import SequenceMatcher
+from typing import Callable, Optional
+import numpy as np
+from app.core import events
+from app.core.config import settings
+from app.core.metrics import ENTITY_MERGES
+from app.core.utils import normalize_name
+
+ACRONYM_SCORE = 0.95
+# Shorter words differing by an edit or two are usually different words
+MIN_FUZZY_TOKEN_LENGTH = 8
+# Blocks this large come from common words and would pair everything with everything
+MAX_BLOCK_SIZE = 100
+
+_SUFFIXES = frozenset(
+    "inc incorporated ltd limited llc llp plc corp corporation co company gmbh ag"
+    " sa the".split()
+)
+_GENERIC_TYPES = frozenset({"", "entity"})
+_PERSON_TYPES = frozenset({"person", "people", "individual", "human"})
+_TOKEN = re.compile(r"[^\W_]+")
+_DIGITS = re.compile(r"\d+")
+
+
+def name_tokens(name: str) -> list:
+    """Lower-case word tokens of a name, without legal suffixes unless that leaves none."""
+    tokens = _TOKEN.findall(name.lower())
+    return [t for t in tokens if t not in _SUFFIXES] or tokens
+
+
+def resolution_key(name: str) -> str:
+    """The name with case, punctuation, spacing and legal suffixes ignored."""
+    return "".join(name_tokens(name))
+
+
+def _acronym(name: str) -> Optional[str]:
+    letters = name.strip().replace(".", "")
+    if 3 <= len(letters) <= 6 and letters.isalpha() and letters.isupper():
+        return letters.lower()
+    return None
+
+
+def _initials(name: str) -> Optional[str]:
+    tokens = name_tokens(name)
+    return "".join(t[0] for t in tokens) if len(tokens) >= 3 else None
+
+
+def blocking_keys(name: str) -> set:
+    tokens = name_tokens(name)
+    keys = {f"token:{t}" for t in tokens if len(t) >= 3}
+    compact = "".join(tokens)
+    if compact:
+        keys.add(f"prefix:{compact[:4]}")
+    initials = _acronym(name) or _initials(name)
+    if initials:
+        keys.add(f"initials:{initials}")
+    return keys
+
+
+def _comparable(tokens_a: list, tokens_b: list) -> bool:
+    """Whether two names may be spellings of one: same numbers, same words but for long ones."""
+    if len(tokens_a) != len(tokens_b):
+        return False
+    if _DIGITS.findall(" ".join(tokens_a)) != _DIGITS.findall(" ".join(tokens_b)):
+        return False
+    for a, b in zip(tokens_a, tokens_b):
+        if a == b:
+            continue
+        if min(len(a), len(b)) < MIN_FUZZY_TOKEN_LENGTH:
+            return False
+        if a.rstrip("s") == b.rstrip("s"):
+            return False
+    return True
+
+
+def pair_score(a: str, b: str) -> float:
+    """String similarity of two entity names, 0 to 1."""
+    tokens_a, tokens_b = name_tokens(a), name_tokens(b)
+    key_a, key_b = "".join(tokens_a), "".join(tokens_b)
+    if not key_a or not key_b:
+        return 0.0
+    if key_a == key_b or sorted(tokens_a) == sorted(tokens_b):
+        return 1.0
+    acronym_a, acronym_b = _acronym(a), _acronym(b)
+    if (acronym_a and acronym_a == _initials(b)) or (
+        acronym_b and acronym_b == _initials(a)
+    ):
+        return ACRONYM_SCORE
+    if not _comparable(tokens_a, tokens_b):
+        return 0.0
+    return SequenceMatcher(None, key_a, key_b).ratio()
+
+
+def _compatible_types(a: Optional[str], b: Optional[str]) -> bool:
+    a, b = (a or "").lower(), (b or "").lower()
+    return a == b or a in _GENERIC_TYPES or b in _GENERIC_TYPES
+
+
+def _is_person(entity_type: Optional[str]) -> bool:
+    return (entity_type or "").lower() in _PERSON_TYPES
+
+
+def _cosine(a, b) -> float:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / norm if norm else 0.0
+
+
+class EntityResolver:
+    """
+    Clusters the entity names of one graph write, together with the chat's
+    existing entities. `embed` (texts -> vectors) enables the embedding
+    component of the pair score.
+    """
+
+    def __init__(self, threshold: float = None, embed: Callable = None):
+        self.threshold = (
+            settings.ENTITY_RESOLUTION_THRESHOLD if threshold is None else threshold
+        )
+        self.embed = embed
+
+    def resolve(self, entities: dict, known: list) -> dict:
+        """
+        Canonical name of each key of `entities` (key -> entity data with
+        "name", "type" and "chunk_ids"), given the chat's `known` entities
+        (see GraphService.entity_names). A key clustered with a known entity
+        maps to its name; other clusters take the name of their most
+        mentioned member.
+        """
+        keys = list(entities)
+        items = [
+            {"names": [entities[k]["name"]], "type": entities[k].get("type")}
+            for k in keys
+        ] + [
+            {"names": [e["name"], *(e.get("aliases") or [])], "type": e.get("type")}
+            for e in known
+        ]
+        roots = self.cluster(items, known_from=len(keys))
+
+        canonical = {}
+        for i, root in enumerate(roots[: len(keys)]):
+            if root >= len(keys):
+                canonical[keys[i]] = known[root - len(keys)]["name"]
+                ENTITY_MERGES.labels(target="known").inc()
+                continue
+            members = [keys[j] for j, r in enumerate(roots[: len(keys)]) if r == root]
+            best = max(
+                members,
+                key=lambda k: (len(entities[k].get("chunk_ids") or ()), -len(k)),
+            )
+            canonical[keys[i]] = entities[best]["name"]
+            if keys[i] != best:
+                ENTITY_MERGES.labels(target="new").inc()
+        return canonical
+
+    def cluster(self, items: list, known_from: int) -> list:
+        """
+        Root index of each item ({"names", "type"}). Items from `known_from`
+        on are stored entities: a cluster holds at most one of them, since
+        merging stored nodes would mean rewiring their relationships, and it
+        is always the cluster's root.
+        """
+        parent = list(range(len(items)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        scores = self._scores(items, self._candidates(items, known_from))
+        for score, i, j in sorted(
+            ((s, i, j) for (i, j), s in scores.items() if s >= self.threshold),
+            reverse=True,
+        ):
+            a, b = find(i), find(j)
+            if a == b or (a >= known_from and b >= known_from):
+                continue
+            if b >= known_from:
+                a, b = b, a
+            parent[b] = a
+        return [find(i) for i in range(len(items))]
+
+    @staticmethod
+    def _candidates(items: list, known_from: int) -> set:
+        blocks = defaultdict(set)
+        for i, item in enumerate(items):
+            for name in item["names"]:
+                for key in blocking_keys(name):
+                    blocks[key].add(i)
+        pairs = set()
+        for members in blocks.values():
+            if len(members) > MAX_BLOCK_SIZE:
+                continue
+            for i, j in itertools.combinations(sorted(members), 2):
+                if i < known_from:
+                    pairs.add((i, j))
+        return pairs
+
+    def _scores(self, items: list, pairs: set) -> dict:
+        scores = {}
+        # Without embeddings a pair needs the threshold from its string score
+        # alone; averaging with a cosine of at most 1 lowers the bar to this
+        floor = 2 * self.threshold - 1 if self.embed else self.threshold
+        fuzzy = []
+        for i, j in pairs:
+            score = max(
+                pair_score(a, b) for a in items[i]["names"] for b in items[j]["names"]
+            )
+            types = items[i]["type"], items[j]["type"]
+            if score >= 1.0:
+                scores[(i, j)] = score
+            elif (
+                score >= floor
+                and _compatible_types(*types)
+                and (self.embed or not any(_is_person(t) for t in types))
+            ):
+                scores[(i, j)] = score
+                fuzzy.append((i, j))
+        if self.embed and fuzzy:
+            needed = sorted({k for pair in fuzzy for k in pair})
+            vectors = dict(
+                zip(needed, self.embed([items[k]["names"][0] for k in needed]))
+            )
+            for i, j in fuzzy:
+                scores[(i, j)] = (scores[(i, j)] + _cosine(vectors[i], vectors[j])) / 2
+        return scores
+
+
+class AliasIndex:
+    """Maps the names a chat's entities go by to their normalised canonical names."""
+
+    def __init__(self, known: list):
+        self._names = {}
+        self._keys = {}
+        # Canonical names win over another entity's alias of the same spelling
+        for entity in known:
+            self._names[normalize_name(entity["name"])] = entity["name_normalized"]
+            self._keys.setdefault(
+                resolution_key(entity["name"]), entity["name_normalized"]
+            )
+        for entity in known:
+            for alias in entity.get("aliases") or ():
+                self._names.setdefault(normalize_name(alias), entity["name_normalized"])
+                self._keys.setdefault(resolution_key(alias), entity["name_normalized"])
+        self.loaded_at = time.monotonic()
+
+    def canonical(self, name: str) -> str:
+        """Normalised canonical name for a name, or the name normalised."""
+        normalized = normalize_name(name)
+        return (
+            self._names.get(normalized)
+            or self._keys.get(resolution_key(normalized))
+            or normalized
+        )
+
+
+class AliasIndexCache:
+    """Per-chat AliasIndex, dropped when the chat's graph changes or after ttl_seconds."""
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_chats: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_chats = max_chats
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id, loader) -> AliasIndex:
+        key = str(chat_id)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None and (
+                self.ttl_seconds is None
+                or time.monotonic() - index.loaded_at < self.ttl_seconds
+            ):
+                self._indexes.move_to_end(key)
+                return index
+        index = loader()
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_chats:
+                self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, chat_id, **_):
+        with self._lock:
+            self._indexes.pop(str(chat_id), None)
+
+
+_cache_lock = threading.Lock()
+_shared_cache = None
+_cache_initialized = False
+
+
+def get_alias_cache() -> Optional[AliasIndexCache]:
+    """Process-wide alias index cache, or None when entity resolution is off."""
+    global _shared_cache, _cache_initialized
+    if not _cache_initialized:
+        with _cache_lock:
+            if not _cache_initialized:
+                if settings.ENTITY_RESOLUTION_ENABLED:
+                    _shared_cache = AliasIndexCache(
+                        ttl_seconds=settings.ENTITY_ALIAS_CACHE_TTL_SECONDS or None
+                    )
+                    events.subscribe(events.DOCUMENT_INGESTED, _shared_cache.invalidate)
+                    events.subscribe(events.GRAPH_CHANGED, _shared_cache.invalidate)
+                _cache_initialized = True
+    return _shared_cache
@@ -0,0 +1,44 @@
+"""
+In-process publish/subscribe for data-change events.
+
+Services publish after they change a chat's data; caches subscribe to drop
+what became stale. Handlers run synchronously in the publisher's thread and
+their failures are logged, never raised to the publisher. Events do not cross
+process boundaries, so caches still need their own staleness bound.
+"""
+
+import threading
+from collections import defaultdict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A document finished ingesting: chat_id, document_id
+DOCUMENT_INGESTED = "document.ingested"
+# Graph data was removed or rewritten outside ingestion: chat_id
+GRAPH_CHANGED = "graph.changed"
+
+_subscribers = defaultdict(list)
+_lock = threading.Lock()
+
+
+def subscribe(event: str, handler):
+    with _lock:
+        if handler not in _subscribers[event]:
+            _subscribers[event].append(handler)
+
+
+def unsubscribe(event: str, handler):
+    with _lock:
+        if handler in _subscribers[event]:
+            _subscribers[event].remove(handler)
+
+
+def publish(event: str, **payload):
+    with _lock:
+        handlers = list(_subscribers[event])
+    for handler in handlers:
+        try:
+            handler(**payload)
+        except Exception as e:
+            logger.warning(f"Handler {handler!r} failed for {event}: {e}")
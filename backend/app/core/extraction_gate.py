@@ -0,0 +1,127 @@
+"""
+Extraction gate.
+
+Decides from cheap local signals whether a chunk is worth an extraction
+call. Chunks the gate turns away are still embedded and searchable ("embed
+only"); they just never reach the extraction LLM.
+
+Policies (EXTRACT_GATE_POLICY):
+- "off": extract every chunk.
+- "conservative" (default): skip chunks left with almost no text once page
+  markers and boilerplate lines are removed, mostly-numeric chunks, and code
+  or tables without proper nouns.
+- "aggressive": also skip narrative and list chunks without proper nouns.
+
+Boilerplate is learned per document: a line (case-folded, with digits and
+whitespace normalised) seen EXTRACT_GATE_BOILERPLATE_REPEATS times, such as
+a running header or a page footer, is ignored from then on.
+"""
+
+import re
+from collections import Counter
+from typing import Optional
+from app.core.config import settings
+from app.core.metrics import EXTRACTION_GATE_DECISIONS
+
+POLICIES = ("off", "conservative", "aggressive")
+
+_PAGE_MARKER = re.compile(r"^\s*--- Page \d+ ---\s*$", re.MULTILINE)
+_CAPITALISED = re.compile(r"\b[A-Z][A-Za-z]+\b")
+_WORD = re.compile(r"\w+")
+_DIGITS = re.compile(r"\d+")
+# A capitalised word after one of these starts a sentence, line or item
+_STARTERS = frozenset(".!?:\n\"'“‘(-*•#")
+_COMMON = frozenset("""
+    The A An This That These Those It Its In On At For With And But Or As By
+    From To Of If When Then There Here We They He She You I Our Their His Her
+    """.split())
+
+
+def proper_nouns(text: str) -> int:
+    """Capitalised words that don't just start a sentence, line or list item."""
+    count = 0
+    for match in _CAPITALISED.finditer(text):
+        if match.group(0) in _COMMON:
+            continue
+        i = match.start() - 1
+        while i >= 0 and text[i] in " \t":
+            i -= 1
+        if i >= 0 and text[i] not in _STARTERS:
+            count += 1
+    return count
+
+
+def _has_names(text: str) -> bool:
+    return any(m.group(0) not in _COMMON for m in _CAPITALISED.finditer(text))
+
+
+class ExtractionGate:
+    """Per-document gate; call it with each chunk's new text in order."""
+
+    def __init__(
+        self,
+        policy: str = None,
+        min_chars: int = None,
+        min_proper_noun_density: float = None,
+        boilerplate_repeats: int = None,
+    ):
+        self.policy = policy or settings.EXTRACT_GATE_POLICY
+        if self.policy not in POLICIES:
+            raise ValueError(
+                f"Unknown extraction gate policy {self.policy!r}; expected one of {POLICIES}"
+            )
+        self.min_chars = (
+            settings.EXTRACT_GATE_MIN_CHARS if min_chars is None else min_chars
+        )
+        self.min_proper_noun_density = (
+            settings.EXTRACT_GATE_MIN_PROPER_NOUN_DENSITY
+            if min_proper_noun_density is None
+            else min_proper_noun_density
+        )
+        self.boilerplate_repeats = (
+            settings.EXTRACT_GATE_BOILERPLATE_REPEATS
+            if boilerplate_repeats is None
+            else boilerplate_repeats
+        )
+        self._line_counts = Counter()
+
+    def __call__(self, text: str, content_type: str) -> Optional[str]:
+        """Why the chunk needs no extraction, or None to extract it."""
+        reason = self._reason(text, content_type)
+        EXTRACTION_GATE_DECISIONS.labels(decision=reason or "extract").inc()
+        return reason
+
+    def _reason(self, text: str, content_type: str) -> Optional[str]:
+        if self.policy == "off":
+            return None
+        lines = [
+            line for line in _PAGE_MARKER.sub("", text).splitlines() if line.strip()
+        ]
+        body = "\n".join(lines)
+        if len(body) < self.min_chars and not _has_names(body):
+            return "too_short"
+
+        kept = [line for line in lines if not self._boilerplate(line)]
+        body = "\n".join(kept)
+        if len(body) < self.min_chars and not _has_names(body):
+            return "boilerplate"
+
+        # A table's first row names its columns, not things
+        nouns = proper_nouns("\n".join(kept[1:]) if content_type == "table" else body)
+        words = len(_WORD.findall(body))
+        if nouns >= self.min_proper_noun_density * words:
+            return None
+        digits = sum(len(d) for d in _DIGITS.findall(body))
+        letters = sum(c.isalpha() for c in body)
+        if digits > letters:
+            return "numeric"
+        if content_type in ("code", "table"):
+            return content_type
+        if self.policy == "aggressive":
+            return "no_proper_nouns"
+        return None
+
+    def _boilerplate(self, line: str) -> bool:
+        key = hash(_DIGITS.sub("0", " ".join(line.lower().split())))
+        self._line_counts[key] += 1
+        return self._line_counts[key] > self.boilerplate_repeats
@@ -0,0 +1,347 @@
+"""
+In-process CSR graph cache for hot chats.
+
+A chat's entity graph is held as compressed sparse row adjacency in NumPy
+arrays (int32 node ids, float32 confidences, interned relationship types),
+once for outgoing and once for incoming edges, with every entity's and
+relationship's chunk provenance as interned ragged arrays. Neighbourhood
+digests are then computed from array slices without a Neo4j round trip.
+
+Chats are loaded after GRAPH_CACHE_MIN_HITS lookups, evicted least recently
+used once the cache exceeds its byte budget, and dropped on ingestion events
+or after GRAPH_CACHE_TTL_SECONDS (events only reach this process). A graph
+whose chat changed while it was loading is served once but not cached.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from app.core import events
+from app.core.config import settings
+from app.core.metrics import GRAPH_CACHE_BYTES, GRAPH_CACHE_REQUESTS
+from app.db.utils.graph import digest_chunk_ids
+
+
+def _csr(keys: np.ndarray, n: int):
+    """Row pointers and a stable edge order grouping edges by key."""
+    order = np.argsort(keys, kind="stable").astype(np.int32)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=indptr[1:])
+    return indptr, order
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray):
+    """The values of every range(start, end), concatenated, and the range each came from."""
+    lengths = ends - starts
+    owner = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    return np.repeat(starts, lengths) + offsets, owner
+
+
+def _ragged(lists, intern: dict):
+    """Interned id lists as (indptr, data) arrays."""
+    lengths = np.array([len(ids) for ids in lists], dtype=np.int64)
+    indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    data = np.array(
+        [intern.setdefault(c, len(intern)) for ids in lists for c in ids],
+        dtype=np.int32,
+    )
+    return indptr, data
+
+
+class CSRGraph:
+    def __init__(self, entities: list[dict], edges: list[dict]):
+        n = len(entities)
+        node_of = {e["entity_id"]: i for i, e in enumerate(entities)}
+        self.entity_ids = [e["entity_id"] for e in entities]
+        self.names = [e["name"] for e in entities]
+        self.types = [e["type"] for e in entities]
+        self.name_index = {e["name_normalized"]: i for i, e in enumerate(entities)}
+
+        chunk_ids = {}
+        self.entity_chunk_indptr, self.entity_chunks = _ragged(
+            [[c for c in e["chunk_ids"] or [] if c] for e in entities], chunk_ids
+        )
+
+        edges = [
+            e for e in edges if e["source_id"] in node_of and e["target_id"] in node_of
+        ]
+        rel_types = {}
+        type_ids = [rel_types.setdefault(e["type"], len(rel_types)) for e in edges]
+        src = np.array([node_of[e["source_id"]] for e in edges], dtype=np.int32)
+        tgt = np.array([node_of[e["target_id"]] for e in edges], dtype=np.int32)
+        self.confidence = np.array(
+            [e["confidence"] or 0.0 for e in edges], dtype=np.float32
+        )
+        self.rel_type = np.array(
+            type_ids, dtype=np.int16 if len(rel_types) < 2**15 else np.int32
+        )
+        self.rel_chunk_indptr, self.rel_chunks = _ragged(
+            [[c for c in e["chunk_ids"] or [] if c] for e in edges], chunk_ids
+        )
+        self.rel_types = list(rel_types)
+        self.chunk_ids = list(chunk_ids)
+
+        self.out_indptr, out_order = _csr(src, n)
+        self.out_neighbours = tgt[out_order]
+        self.out_edges = out_order
+        self.in_indptr, in_order = _csr(tgt, n)
+        self.in_neighbours = src[in_order]
+        self.in_edges = in_order
+
+        self.node_count = n
+        self.edge_count = len(edges)
+        self.loaded_at = time.monotonic()
+        self.nbytes = self._measure()
+
+    def _measure(self) -> int:
+        arrays = (
+            self.entity_chunk_indptr,
+            self.entity_chunks,
+            self.rel_chunk_indptr,
+            self.rel_chunks,
+            self.out_indptr,
+            self.out_neighbours,
+            self.out_edges,
+            self.in_indptr,
+            self.in_neighbours,
+            self.in_edges,
+            self.confidence,
+            self.rel_type,
+        )
+        strings = self.entity_ids + self.names + self.types + self.chunk_ids
+        return sum(a.nbytes for a in arrays) + sum(sys.getsizeof(s) for s in strings)
+
+    def _chunks(self, indptr, data, row: int) -> list[str]:
+        return [self.chunk_ids[c] for c in data[indptr[row] : indptr[row + 1]]]
+
+    def _top_facts(self, nodes: np.ndarray, top_k: int):
+        """
+        The top_k edges of each node by confidence, as (owner, edge, neighbour,
+        outgoing) arrays grouped by the owner's position in `nodes`. Ties keep
+        outgoing edges before incoming ones, each in CSR order.
+        """
+        out_pos, out_owner = _ranges(self.out_indptr[nodes], self.out_indptr[nodes + 1])
+        in_pos, in_owner = _ranges(self.in_indptr[nodes], self.in_indptr[nodes + 1])
+        owner = np.concatenate([out_owner, in_owner])
+        edges = np.concatenate([self.out_edges[out_pos], self.in_edges[in_pos]])
+        neighbours = np.concatenate(
+            [self.out_neighbours[out_pos], self.in_neighbours[in_pos]]
+        )
+        outgoing = np.arange(len(owner)) < len(out_owner)
+        order = np.lexsort(
+            (
+                np.concatenate([out_pos, in_pos]),
+                ~outgoing,
+                -self.confidence[edges],
+                owner,
+            )
+        )
+        owner = owner[order]
+        rank = np.arange(len(owner)) - np.searchsorted(owner, owner)
+        keep = order[rank < top_k]
+        return owner[rank < top_k], edges[keep], neighbours[keep], outgoing[keep]
+
+    def _digests(self, nodes: np.ndarray, top_k: int, max_chunks: int):
+        """Digests of the nodes (same shape as those stored on Neo4j nodes), and the neighbours they name."""
+        owner, edges, neighbours, outgoing = self._top_facts(nodes, top_k)
+        bounds = np.searchsorted(owner, np.arange(len(nodes) + 1))
+        digests = []
+        for i, node in enumerate(nodes):
+            facts, fact_chunks = [], []
+            for k in range(bounds[i], bounds[i + 1]):
+                edge, neighbour = edges[k], neighbours[k]
+                facts.append(
+                    {
+                        "type": self.rel_types[self.rel_type[edge]],
+                        "direction": "out" if outgoing[k] else "in",
+                        "name": self.names[neighbour],
+                        "entity_type": self.types[neighbour],
+                        "confidence": round(float(self.confidence[edge]), 4),
+                    }
+                )
+                fact_chunks.append(
+                    self._chunks(self.rel_chunk_indptr, self.rel_chunks, edge)
+                )
+            digests.append(
+                {
+                    "entity_id": self.entity_ids[node],
+                    "name": self.names[node],
+                    "type": self.types[node],
+                    "facts": facts,
+                    "chunk_ids": digest_chunk_ids(
+                        fact_chunks,
+                        self._chunks(
+                            self.entity_chunk_indptr, self.entity_chunks, node
+                        ),
+                        max_chunks,
+                    ),
+                }
+            )
+        return digests, neighbours
+
+    def digest(self, node: int, top_k: int, max_chunks: int) -> dict:
+        """Same shape as the digest stored on Neo4j nodes."""
+        return self._digests(np.array([node]), top_k, max_chunks)[0][0]
+
+    def digests(self, names_normalized, top_k: int, max_chunks: int) -> list[dict]:
+        nodes = [self.name_index[n] for n in names_normalized if n in self.name_index]
+        return self._digests(np.array(nodes, dtype=np.int64), top_k, max_chunks)[0]
+
+    def expand(
+        self, names_normalized, hops: int, top_k: int, max_chunks: int, limit: int
+    ) -> list[dict]:
+        """
+        Digests of the named entities, then of the neighbours their facts name,
+        breadth first for `hops` hops and at most `limit` digests. Each hop's
+        frontier is expanded over the CSR arrays at once.
+        """
+        frontier = np.array(
+            [self.name_index[n] for n in names_normalized if n in self.name_index],
+            dtype=np.int64,
+        )
+        seen = np.zeros(self.node_count, dtype=bool)
+        digests = []
+        for _ in range(hops):
+            # First appearance order, without nodes already digested
+            _, first = np.unique(frontier, return_index=True)
+            frontier = frontier[np.sort(first)]
+            frontier = frontier[~seen[frontier]][: limit - len(digests)]
+            if not len(frontier):
+                break
+            seen[frontier] = True
+            found, frontier = self._digests(frontier, top_k, max_chunks)
+            digests.extend(found)
+        return digests
+
+
+class GraphCache:
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        min_hits: int = 2,
+        ttl_seconds: Optional[float] = 300,
+        max_tracked_chats: int = 4096,
+    ):
+        self.max_bytes = max_bytes
+        self.min_hits = min_hits
+        self.ttl_seconds = ttl_seconds
+        self.max_tracked_chats = max_tracked_chats
+        self._graphs = OrderedDict()
+        # chat -> [lookups, generation]; least recently looked up first
+        self._chats = OrderedDict()
+        self._loading = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, chat_id, loader) -> Optional[CSRGraph]:
+        """Cached graph for the chat, loading it once the chat is hot; else None."""
+        key = str(chat_id)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                if (
+                    self.ttl_seconds is None
+                    or time.monotonic() - graph.loaded_at < self.ttl_seconds
+                ):
+                    self._graphs.move_to_end(key)
+                    GRAPH_CACHE_REQUESTS.labels(result="hit").inc()
+                    return graph
+                self._remove(key)
+
+            state = self._track(key)
+            state[0] += 1
+            if state[0] < self.min_hits or key in self._loading:
+                GRAPH_CACHE_REQUESTS.labels(result="miss").inc()
+                return None
+            self._loading.add(key)
+            generation = state[1]
+
+        GRAPH_CACHE_REQUESTS.labels(result="load").inc()
+        try:
+            graph = loader()
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+        self.put(chat_id, graph, generation)
+        return graph
+
+    def put(self, chat_id, graph: CSRGraph, generation: Optional[int] = None):
+        """Cache the graph, unless the chat changed since `generation` was read."""
+        key = str(chat_id)
+        with self._lock:
+            if generation is not None:
+                state = self._chats.get(key)
+                if state is None or state[1] != generation:
+                    return
+            self._remove(key)
+            if graph.nbytes > self.max_bytes:
+                return
+            self._graphs[key] = graph
+            self._bytes += graph.nbytes
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._graphs))
+                self._remove(oldest)
+            GRAPH_CACHE_BYTES.set(self._bytes)
+
+    def _track(self, key: str) -> list:
+        state = self._chats.get(key)
+        if state is None:
+            state = self._chats[key] = [0, 0]
+            while len(self._chats) > self.max_tracked_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(key)
+        return state
+
+    def _remove(self, key: str):
+        graph = self._graphs.pop(key, None)
+        if graph is not None:
+            self._bytes -= graph.nbytes
+            GRAPH_CACHE_BYTES.set(self._bytes)
+
+    def invalidate(self, chat_id, **_):
+        # The chat stays hot, so its next lookup reloads it; a load under way
+        # read the graph before this change and is not cached
+        key = str(chat_id)
+        with self._lock:
+            self._remove(key)
+            state = self._chats.get(key)
+            if state is not None:
+                state[1] += 1
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __contains__(self, chat_id) -> bool:
+        return str(chat_id) in self._graphs
+
+
+_cache_lock = threading.Lock()
+_shared_cache = None
+_cache_initialized = False
+
+
+def get_graph_cache() -> Optional[GraphCache]:
+    """Process-wide graph cache configured from settings, or None when disabled."""
+    global _shared_cache, _cache_initialized
+    if not _cache_initialized:
+        with _cache_lock:
+            if not _cache_initialized:
+                if settings.GRAPH_CACHE_ENABLED:
+                    _shared_cache = GraphCache(
+                        max_bytes=settings.GRAPH_CACHE_MAX_MB * 1024 * 1024,
+                        min_hits=settings.GRAPH_CACHE_MIN_HITS,
+                        ttl_seconds=settings.GRAPH_CACHE_TTL_SECONDS or None,
+                    )
+                    events.subscribe(events.DOCUMENT_INGESTED, _shared_cache.invalidate)
+                    events.subscribe(events.GRAPH_CHANGED, _shared_cache.invalidate)
+                _cache_initialized = True
+    return _shared_cache
@@ -0,0 +1,88 @@
+"""
+Start-up warm-up and readiness checks.
+
+Heavy third-party packages are imported on first use so a worker starts
+serving quickly; `warm_up()` imports them in the background afterwards so
+the first real request doesn't pay for it. `check_dependencies()` backs the
+readiness probe.
+"""
+
+import asyncio
+import importlib
+import threading
+import time
+from sqlalchemy import text
+from app.core.utils import sent_tokenize
+
+# Deferred at import time, loaded by warm_up()
+HEAVY_MODULES = (
+    "qdrant_client",
+    "qdrant_client.models",
+    "openai",
+    "neo4j",
+    "PyPDF2",
+)
+
+_clients_lock = threading.Lock()
+_clients = {}
+
+
+def warm_up(modules=HEAVY_MODULES) -> dict:
+    """Import the deferred modules and load the sentence segmenter; returns seconds per step."""
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = round(time.perf_counter() - start, 4)
+    start = time.perf_counter()
+    sent_tokenize("Warm up.")
+    timings["sentence_segmenter"] = round(time.perf_counter() - start, 4)
+    return timings
+
+
+def _client(name: str, factory):
+    # One client per dependency for the life of the process, not one per probe
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+async def _check_postgres():
+    from app.db.session import engine
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+def _check_qdrant():
+    from app.db.qdrant import QdrantDBClient
+
+    _client("qdrant", QdrantDBClient).client.get_collections()
+
+
+def _check_neo4j():
+    from app.db.neo4j import Neo4jClient
+
+    _client("neo4j", Neo4jClient).driver.verify_connectivity()
+
+
+async def check_dependencies(timeout: float) -> dict:
+    """Check Postgres, Qdrant and Neo4j concurrently; "ok" or the error for each."""
+    checks = {
+        "postgres": _check_postgres(),
+        "qdrant": asyncio.to_thread(_check_qdrant),
+        "neo4j": asyncio.to_thread(_check_neo4j),
+    }
+    results = await asyncio.gather(
+        *(asyncio.wait_for(check, timeout) for check in checks.values()),
+        return_exceptions=True,
+    )
+    return {name: _describe(result) for name, result in zip(checks, results)}
+
+
+def _describe(result) -> str:
+    if not isinstance(result, BaseException):
+        return "ok"
+    message = str(result)
+    return f"{type(result).__name__}: {message}" if message else type(result).__name__
@@ -0,0 +1,74 @@
+"""
+Tolerant JSON parsing for LLM replies.
+
+Models wrap JSON in prose, stop mid-object when they hit the token limit, or
+add a stray brace. Rather than discarding the whole reply, `parse_json_object`
+falls back to recovering every complete item of the arrays the caller cares
+about, decoding them one at a time until the first one that is cut off.
+"""
+
+import json
+import re
+from typing import Iterator, Optional, Sequence, Tuple
+
+_decoder = json.JSONDecoder()
+_SEPARATORS = " \t\r\n,"
+
+
+def json_span(text: str) -> str:
+    """From the first { or [ to the last matching closer, or text unchanged."""
+    start_brace = text.find("{")
+    start_bracket = text.find("[")
+
+    start = -1
+    if start_brace != -1 and (start_bracket == -1 or start_brace < start_bracket):
+        start = start_brace
+        end = text.rfind("}")
+    elif start_bracket != -1:
+        start = start_bracket
+        end = text.rfind("]")
+
+    if start != -1 and end != -1:
+        return text[start : end + 1]
+    return text
+
+
+def iter_array_items(text: str, key: str) -> Iterator:
+    """Complete items of the first `"key": [...]` array, stopping at a cut-off item."""
+    match = re.search(r'"%s"\s*:\s*\[' % re.escape(key), text)
+    if match is None:
+        return
+    i = match.end()
+    while True:
+        while i < len(text) and text[i] in _SEPARATORS:
+            i += 1
+        if i >= len(text) or text[i] == "]":
+            return
+        try:
+            item, i = _decoder.raw_decode(text, i)
+        except json.JSONDecodeError:
+            return
+        yield item
+
+
+def parse_json_object(
+    text: Optional[str], array_keys: Sequence[str]
+) -> Tuple[Optional[dict], str]:
+    """
+    (data, result) for a reply expected to be a JSON object. result is "ok"
+    when the reply or the JSON span in it parses, "recovered" when only
+    complete items of `array_keys` could be salvaged, and "failed" otherwise.
+    """
+    if not text:
+        return None, "failed"
+    for candidate in (text, json_span(text)):
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data, "ok"
+    recovered = {key: list(iter_array_items(text, key)) for key in array_keys}
+    if any(recovered.values()):
+        return recovered, "recovered"
+    return None, "failed"
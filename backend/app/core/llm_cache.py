@@ -0,0 +1,232 @@
+"""
+Response cache for LLMService.generate.
+
+Entries are keyed by a hash of the model, the messages and the sampling
+parameters, so only byte-identical requests share a response. Two backends
+are available: an in-process LRU and a SQLite file that survives restarts
+(and makes benchmark reruns and test replays deterministic).
+"""
+
+import abc
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from app.core.config import settings
+
+
+def cache_key(model: str, messages: list, **params) -> str:
+    """Stable hash of everything that determines a completion."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache(abc.ABC):
+    """Interface shared by the cache backends."""
+
+    def __init__(self, ttl_seconds: Optional[float] = None, call_sites=None):
+        self.ttl_seconds = ttl_seconds
+        # None means every call site is cached
+        self.call_sites = set(call_sites) if call_sites is not None else None
+
+    def enabled_for(self, call_site: str) -> bool:
+        return self.call_sites is None or call_site in self.call_sites
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl_seconds if self.ttl_seconds else None
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[str]: ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: str): ...
+
+    @abc.abstractmethod
+    def clear(self): ...
+
+    def close(self):
+        pass
+
+
+class MemoryLLMCache(LLMCache):
+    """Thread-safe LRU with optional TTL, bounded by entry count."""
+
+    def __init__(self, max_entries: int = 10_000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (value, self._expires_at())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteLLMCache(LLMCache):
+    """
+    Persistent cache in a local SQLite file.
+
+    Eviction is least-recently-used and runs every `EVICT_EVERY` writes rather
+    than on each one, so the table may briefly exceed `max_entries`.
+    """
+
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = 100_000, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                (key, value, self._expires_at(), time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),),
+        )
+        self._conn.execute(
+            """
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM llm_cache").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache_lock = threading.Lock()
+_shared_cache = None
+_cache_initialized = False
+
+
+def build_llm_cache(
+    backend: str,
+    path: str = None,
+    ttl_seconds: float = None,
+    max_entries: int = None,
+    call_sites=None,
+) -> Optional[LLMCache]:
+    kwargs = {"ttl_seconds": ttl_seconds, "call_sites": call_sites}
+    if max_entries:
+        kwargs["max_entries"] = max_entries
+    if backend == "memory":
+        return MemoryLLMCache(**kwargs)
+    if backend == "sqlite":
+        return SQLiteLLMCache(path, **kwargs)
+    if backend in ("", "none"):
+        return None
+    raise ValueError(f"Unknown LLM cache backend: {backend}")
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Process-wide cache configured from settings, or None when disabled."""
+    global _shared_cache, _cache_initialized
+    if not _cache_initialized:
+        with _cache_lock:
+            if not _cache_initialized:
+                call_sites = [
+                    s.strip()
+                    for s in settings.LLM_CACHE_CALL_SITES.split(",")
+                    if s.strip()
+                ]
+                _shared_cache = build_llm_cache(
+                    settings.LLM_CACHE_BACKEND,
+                    path=settings.LLM_CACHE_PATH,
+                    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS or None,
+                    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                    call_sites=call_sites or None,
+                )
+                _cache_initialized = True
+    return _shared_cache
@@ -0,0 +1,366 @@
+"""
+Minimal Prometheus instrumentation.
+
+Counters, gauges and histograms with labels, rendered in the Prometheus text
+exposition format by `REGISTRY.render()`. Updates take one lock per metric,
+so they are cheap enough for the hot path.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from app.core.config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        # Metrics without labels act as their own single child
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for name, labels, extra, value in self.samples():
+            lines.append(
+                f"{name}{_format_labels(self.labelnames, labels, extra)} {_format_value(value)}"
+            )
+        return "\n".join(lines)
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        if not settings.METRICS_ENABLED:
+            return
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def samples(self):
+        for labels, child in list(self._children.items()):
+            yield f"{self.name}_total", labels, None, child.value
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def track_inprogress(self):
+        return self._default().track_inprogress()
+
+    def samples(self):
+        for labels, child in list(self._children.items()):
+            yield self.name, labels, None, child.value
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        if not settings.METRICS_ENABLED:
+            return
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def samples(self):
+        for labels, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels, (
+                    "le",
+                    _format_value(bound),
+                ), cumulative
+            yield f"{self.name}_bucket", labels, ("le", "+Inf"), child.count
+            yield f"{self.name}_sum", labels, None, child.sum
+            yield f"{self.name}_count", labels, None, child.count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# LLM
+LLM_REQUEST_SECONDS = Histogram(
+    "fusionchat_llm_request_seconds",
+    "Latency of upstream LLM and embedding calls.",
+    ["operation", "model"],
+)
+LLM_TOKENS = Histogram(
+    "fusionchat_llm_tokens",
+    "Tokens per upstream call, from response.usage.",
+    ["operation", "kind"],
+    buckets=TOKEN_BUCKETS,
+)
+LLM_ERRORS = Counter(
+    "fusionchat_llm_errors",
+    "Upstream LLM and embedding calls that raised.",
+    ["operation"],
+)
+LLM_CACHE_REQUESTS = Counter(
+    "fusionchat_llm_cache_requests",
+    "LLM response cache lookups by call site and result (hit or miss).",
+    ["call_site", "result"],
+)
+LLM_COALESCED_CALLS = Counter(
+    "fusionchat_llm_coalesced_calls",
+    "Calls that shared an identical in-flight upstream request instead of sending their own.",
+    ["operation"],
+)
+LLM_CHARS_PER_TOKEN = Gauge(
+    "fusionchat_llm_chars_per_token",
+    "Calibrated characters per token used for local token estimates.",
+    ["model"],
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "fusionchat_embedding_batch_size",
+    "Number of inputs per embedding request.",
+    buckets=SIZE_BUCKETS,
+)
+
+# Stores
+QDRANT_QUERY_SECONDS = Histogram(
+    "fusionchat_qdrant_query_seconds",
+    "Latency of Qdrant calls.",
+    ["operation"],
+)
+NEO4J_QUERY_SECONDS = Histogram(
+    "fusionchat_neo4j_query_seconds",
+    "Latency of Neo4j queries.",
+    ["operation"],
+)
+
+COORDINATION_WAIT_SECONDS = Histogram(
+    "fusionchat_coordination_wait_seconds",
+    "Time spent waiting for a coordination lock or rate budget.",
+    ["kind"],
+)
+
+GRAPH_CACHE_REQUESTS = Counter(
+    "fusionchat_graph_cache_requests",
+    "CSR graph cache lookups by result (hit, miss or load).",
+    ["result"],
+)
+GRAPH_CACHE_BYTES = Gauge(
+    "fusionchat_graph_cache_bytes",
+    "Estimated memory held by the CSR graph cache.",
+)
+
+# Ingestion
+INGESTION_QUEUE_DEPTH = Gauge(
+    "fusionchat_ingestion_queue_depth",
+    "Extraction windows waiting for an ingestion worker slot.",
+)
+INGESTION_DOCUMENTS_IN_PROGRESS = Gauge(
+    "fusionchat_ingestion_documents_in_progress",
+    "Documents currently being ingested.",
+)
+INGESTION_JOBS_ACTIVE = Gauge(
+    "fusionchat_ingestion_jobs_active",
+    "Ingestion jobs (uploads or batches) holding an admission slot.",
+)
+INGESTION_JOBS_PENDING = Gauge(
+    "fusionchat_ingestion_jobs_pending",
+    "Admitted ingestion jobs waiting for a slot.",
+)
+INGESTION_ADMISSIONS = Counter(
+    "fusionchat_ingestion_admissions",
+    "Ingestion admission decisions (admitted, queued or rejected).",
+    ["result"],
+)
+INGESTION_CHUNKS = Counter(
+    "fusionchat_ingestion_chunks",
+    "Chunks processed by ingestion; rate() gives chunk throughput.",
+    ["status"],
+)
+EXTRACTION_REQUESTS = Counter(
+    "fusionchat_extraction_requests",
+    "Entity extraction requests by mode (single, merged, packed or fallback).",
+    ["mode"],
+)
+EXTRACTION_PARSES = Counter(
+    "fusionchat_extraction_parses",
+    "Extraction replies by prompt (single or packed) and parse result (ok, recovered or failed).",
+    ["prompt", "result"],
+)
+EXTRACTION_GATE_DECISIONS = Counter(
+    "fusionchat_extraction_gate_decisions",
+    "Chunks by extraction gate decision: extract, or why the chunk was only embedded.",
+    ["decision"],
+)
+NEAR_DUPLICATE_CHUNKS = Counter(
+    "fusionchat_near_duplicate_chunks",
+    "Chunks stored as aliases of a near-duplicate, by where the original was found (stored or run).",
+    ["source"],
+)
+ENTITY_MERGES = Counter(
+    "fusionchat_entity_merges",
+    "Extracted entity names merged into another entity, by whether that entity was already stored (known) or new.",
+    ["target"],
+)
+INGESTION_CHUNK_SECONDS = Histogram(
+    "fusionchat_ingestion_chunk_seconds",
+    "Time to embed, store and extract one extraction window of chunks.",
+)
+
+# Chat
+ANSWER_CACHE_REQUESTS = Counter(
+    "fusionchat_answer_cache_requests",
+    "Semantic answer cache lookups by result (hit or miss).",
+    ["result"],
+)
+CHAT_STAGE_SECONDS = Histogram(
+    "fusionchat_chat_stage_seconds",
+    "Time spent in each stage of answering a chat message.",
+    ["stage"],
+)
+CHAT_SKIPPED_STAGES = Counter(
+    "fusionchat_chat_skipped_stages",
+    "Retrieval stages left out of an answer, by reason (timeout, circuit_open or error).",
+    ["stage", "reason"],
+)
+CHAT_DEADLINE_EXCEEDED = Counter(
+    "fusionchat_chat_deadline_exceeded",
+    "Chat messages that ran out of time before an answer, by mode.",
+    ["mode"],
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "fusionchat_circuit_breaker_state",
+    "Circuit breaker state per dependency: 0 closed, 1 half-open, 2 open.",
+    ["dependency"],
+)
@@ -0,0 +1,157 @@
+"""
+Near-duplicate chunk detection.
+
+A MinHash signature of a chunk's word shingles estimates the Jaccard
+similarity of two chunks as the share of signature positions they agree on.
+For locality-sensitive lookup the signature is cut into bands, and only chunks
+sharing a band hash are compared. Band hashes are stored in the chunk's Qdrant
+payload, so the chat's collection doubles as its index.
+
+A chunk at least NEAR_DUPLICATE_THRESHOLD similar to one already stored
+becomes an alias of it: the stored point records the alias, and the chunk is
+neither embedded nor extracted again.
+"""
+
+import hashlib
+import random
+import re
+from collections import defaultdict
+from typing import Optional
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import NEAR_DUPLICATE_CHUNKS
+
+NUM_PERMUTATIONS = 64
+BANDS = 16  # of 4 rows: ~0.5 similar chunks share a band 64% of the time, ~0.85 always
+SHINGLE_WORDS = 3
+
+_PRIME = 4294967291  # largest prime below 2**32
+_rng = random.Random(0)
+# Below 2**32 each, so a * h + b stays within uint64
+_A = np.array(
+    [_rng.randrange(1, _PRIME) for _ in range(NUM_PERMUTATIONS)], dtype=np.uint64
+)
+_B = np.array(
+    [_rng.randrange(_PRIME) for _ in range(NUM_PERMUTATIONS)], dtype=np.uint64
+)
+_WORD = re.compile(r"\w+")
+
+
+def _hash32(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=4).digest(), "big")
+
+
+def signature(text: str) -> Optional[list]:
+    """MinHash signature of the text's word shingles; None with too few words."""
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return None
+    hashes = np.fromiter(
+        {
+            _hash32(" ".join(words[i : i + SHINGLE_WORDS]))
+            for i in range(len(words) - SHINGLE_WORDS + 1)
+        },
+        dtype=np.uint64,
+    )
+    permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) % np.uint64(_PRIME)
+    return permuted.min(axis=1).tolist()
+
+
+def bands(sig: list) -> list:
+    """One "band:hash" key per band of the signature."""
+    rows = len(sig) // BANDS
+    return [
+        f"{band}:"
+        + hashlib.blake2b(
+            repr(sig[band * rows : (band + 1) * rows]).encode(), digest_size=8
+        ).hexdigest()
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a, b) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def closest(sig, candidates, threshold: float) -> Optional[str]:
+    """Id of the most similar (id, signature) candidate at or above threshold."""
+    best_id, best = None, threshold
+    for candidate_id, other in candidates:
+        score = similarity(sig, other)
+        if score >= best:
+            best_id, best = candidate_id, score
+    return best_id
+
+
+def collapse(points, threshold: float = None) -> list:
+    """Search hits with near-duplicates of a higher-ranked hit dropped."""
+    threshold = settings.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+    if threshold <= 0:
+        return list(points)
+    kept = []
+    for point in points:
+        sig = (point.payload or {}).get("minhash")
+        if sig and closest(
+            sig, ((p.id, (p.payload or {}).get("minhash")) for p in kept), threshold
+        ):
+            continue
+        kept.append(point)
+    return kept
+
+
+class NearDuplicateIndex:
+    """
+    Chunks stored during one ingestion run, bucketed by band, plus the aliases
+    found for them or for the chat's stored chunks. `aliases` maps an original
+    chunk id to alias entries for VectorService.link_aliases.
+    """
+
+    def __init__(self, threshold: float = None):
+        self.threshold = (
+            settings.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        )
+        self._buckets = defaultdict(list)
+        self.aliases = defaultdict(list)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def resolve(self, chunks, stored: dict) -> set:
+        """
+        Ids of the chunks that are aliases, either of the stored point given
+        for them in `stored` or of a chunk seen earlier in this run. The other
+        chunks join the index.
+        """
+        aliased = set()
+        for chunk in chunks:
+            sig = (chunk.metadata or {}).get("minhash")
+            if not sig:
+                continue
+            original, source = stored.get(chunk.id), "stored"
+            if original is None:
+                original, source = self._match(sig), "run"
+            if original is None:
+                for band in bands(sig):
+                    self._buckets[band].append((str(chunk.id), sig))
+                continue
+            self.aliases[original].append(
+                {
+                    "document_id": str(chunk.document_id),
+                    "chunk_id": str(chunk.id),
+                    "index": chunk.index,
+                }
+            )
+            NEAR_DUPLICATE_CHUNKS.labels(source=source).inc()
+            aliased.add(chunk.id)
+        return aliased
+
+    def _match(self, sig) -> Optional[str]:
+        return closest(
+            sig,
+            (entry for band in bands(sig) for entry in self._buckets.get(band, ())),
+            self.threshold,
+        )
@@ -0,0 +1,35 @@
+"""
+In-process registry of batch ingestion progress.
+
+Batches run as background tasks in the API process, so their status lives
+here rather than in Postgres; per-document status is still persisted on the
+document rows. The oldest finished batches are dropped past MAX_BATCHES.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+from app.schemas.ingestion import BatchIngestionStatus
+
+MAX_BATCHES = 1000
+
+_batches = OrderedDict()
+_lock = threading.Lock()
+
+
+def register(status: BatchIngestionStatus) -> BatchIngestionStatus:
+    with _lock:
+        _batches[str(status.batch_id)] = status
+        while len(_batches) > MAX_BATCHES:
+            oldest = next(
+                (k for k, s in _batches.items() if s.finished_at is not None), None
+            )
+            if oldest is None:
+                break
+            del _batches[oldest]
+    return status
+
+
+def get(batch_id) -> Optional[BatchIngestionStatus]:
+    with _lock:
+        return _batches.get(str(batch_id))
@@ -0,0 +1,161 @@
+"""
+Sentence segmentation.
+
+Chunking splits narrative paragraphs into sentences. Segmenters return
+(start, end) character spans into the text they were given, so sentences are
+exact slices and callers can map them back to document offsets.
+
+- "rules" (default): a dependency-free rule-based segmenter. It splits after
+  . ! ? (and closing quotes or brackets) that are followed by whitespace,
+  except after known abbreviations, single-letter initials, or when the next
+  word starts in lowercase. Decimals such as 3.50 never match because the
+  period is not followed by whitespace.
+- "punkt": NLTK's Punkt model, loaded on first use. It falls back to the
+  rule-based segmenter when the punkt data is not installed.
+"""
+
+import logging
+import re
+import threading
+from typing import List, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lowercased, without the trailing period
+ABBREVIATIONS = frozenset("""
+    mr mrs ms dr prof sr jr st mt ft vs etc e.g i.e cf al approx dept est
+    inc ltd co corp llc plc bros no nos vol vols fig figs eq eqs ch sec
+    p pp ed eds rev gen col lt sgt capt cmdr adm gov sen rep pres
+    jan feb mar apr jun jul aug sep sept oct nov dec
+    mon tue tues wed thu thur thurs fri sat sun
+    u.s u.k u.n e.u a.m p.m ph.d m.sc b.sc
+    """.split())
+
+# Sentence-final punctuation, optional closing quotes or brackets, then whitespace
+_BOUNDARY = re.compile(r"[.!?]+[\"'”’)\]]*(?=\s|$)")
+_NEXT_WORD = re.compile(r"\s*[\"'“‘(\[]*(\S)")
+
+
+class Segmenter:
+    name = ""
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) of each sentence, without surrounding whitespace."""
+        raise NotImplementedError
+
+    def split(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.spans(text)]
+
+
+class RuleSegmenter(Segmenter):
+    name = "rules"
+
+    def __init__(self, abbreviations=ABBREVIATIONS):
+        self.abbreviations = abbreviations
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        spans = []
+        start = _skip_space(text, 0)
+        for match in _BOUNDARY.finditer(text):
+            end = match.end()
+            if end <= start or not self._is_boundary(text, start, match):
+                continue
+            spans.append((start, end))
+            start = _skip_space(text, end)
+        end = len(text.rstrip())
+        if start < end:
+            spans.append((start, end))
+        return spans
+
+    def _is_boundary(self, text: str, start: int, match) -> bool:
+        following = _NEXT_WORD.match(text, match.end())
+        if following is None:
+            return True
+        if following.group(1).islower():
+            # "e.g. coffee", "... and then": the sentence carries on
+            return False
+        if match.end() - match.start() > 1 or text[match.start()] != ".":
+            # ! and ?, ellipses and quoted or bracketed endings
+            return True
+        # The word the period belongs to, without leading quotes or brackets
+        i = match.start()
+        while i > start and not text[i - 1].isspace():
+            i -= 1
+        token = text[i : match.start()].lstrip("\"'“‘([")
+        if len(token) == 1 and token.isalpha():
+            # Initials: "J. R. R. Tolkien"
+            return False
+        return token.lower() not in self.abbreviations
+
+
+class PunktSegmenter(Segmenter):
+    name = "punkt"
+
+    def __init__(self, tokenizer=None):
+        self._tokenizer = tokenizer
+        self._fallback = None
+        self._lock = threading.Lock()
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        tokenizer = self._load()
+        if tokenizer is None:
+            return self._fallback.spans(text)
+        return list(tokenizer.span_tokenize(text))
+
+    def _load(self):
+        if self._tokenizer is None and self._fallback is None:
+            with self._lock:
+                if self._tokenizer is None and self._fallback is None:
+                    self._tokenizer = _load_punkt()
+                    if self._tokenizer is None:
+                        self._fallback = RuleSegmenter()
+        return self._tokenizer
+
+
+def _skip_space(text: str, i: int) -> int:
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return i
+
+
+def _load_punkt():
+    """NLTK's pretrained English Punkt tokenizer, or None when its data is missing."""
+    import nltk
+    from nltk.tokenize.punkt import PunktTokenizer
+
+    if settings.NLTK_DATA_DIR and settings.NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, settings.NLTK_DATA_DIR)
+    for attempt in range(2):
+        try:
+            return PunktTokenizer("english")
+        except LookupError:
+            if attempt or not settings.NLTK_DOWNLOAD_MISSING:
+                break
+            # Opt-in only: a network call that fails in air-gapped deployments
+            nltk.download("punkt_tab", quiet=True)
+    logger.warning("⚠️ NLTK punkt data not found; using the rule-based segmenter")
+    return None
+
+
+SEGMENTERS = {
+    RuleSegmenter.name: RuleSegmenter,
+    PunktSegmenter.name: PunktSegmenter,
+}
+
+_segmenters_lock = threading.Lock()
+_segmenters = {}
+
+
+def get_segmenter(name: str = None) -> Segmenter:
+    """Shared segmenter by name; SENTENCE_SEGMENTER when no name is given."""
+    name = name or settings.SENTENCE_SEGMENTER
+    segmenter = _segmenters.get(name)
+    if segmenter is None:
+        if name not in SEGMENTERS:
+            raise ValueError(
+                f"Unknown sentence segmenter {name!r}; expected one of {sorted(SEGMENTERS)}"
+            )
+        with _segmenters_lock:
+            segmenter = _segmenters.setdefault(name, SEGMENTERS[name]())
+    return segmenter
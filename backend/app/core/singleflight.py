@@ -0,0 +1,45 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight call: the first
+caller runs it, the rest block on its future and receive the same result (or
+exception). Nothing is kept once the call finishes, so unlike a cache this
+never serves stale data.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Run fn once per key among concurrent callers; returns (result, shared)."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
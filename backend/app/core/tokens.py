@@ -0,0 +1,76 @@
+"""
+Token estimates.
+
+Chunk sizes and prompt budgets are set in tokens, but running the model's
+tokenizer on every piece of text is slow and adds a dependency. Estimates
+divide character counts by a per-model chars-per-token ratio instead, which
+LLMService calibrates against the prompt token counts in `response.usage`.
+"""
+
+import threading
+from app.core.config import settings
+from app.core.metrics import LLM_CHARS_PER_TOKEN
+
+DEFAULT_CHARS_PER_TOKEN = 4.0
+# Per-request overhead dominates the ratio of very short prompts
+MIN_CALIBRATION_TOKENS = 32
+
+
+class TokenEstimator:
+    def __init__(
+        self,
+        model: str = "",
+        chars_per_token: float = DEFAULT_CHARS_PER_TOKEN,
+        smoothing: float = 0.05,
+        bounds: tuple = (1.5, 8.0),
+    ):
+        self.model = model
+        self.chars_per_token = chars_per_token
+        self.smoothing = smoothing
+        self.bounds = bounds
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """Estimated tokens in text, rounded up to at least one."""
+        return int(len(text) / self.chars_per_token) + 1
+
+    def chars(self, tokens: int) -> int:
+        """Characters that fit in a budget of `tokens`."""
+        return int(tokens * self.chars_per_token)
+
+    def calibrate(self, chars: int, tokens: int):
+        """Move the ratio towards one observed (characters, prompt tokens) pair."""
+        if tokens < MIN_CALIBRATION_TOKENS:
+            return
+        low, high = self.bounds
+        with self._lock:
+            ratio = self.chars_per_token + self.smoothing * (
+                chars / tokens - self.chars_per_token
+            )
+            self.chars_per_token = min(high, max(low, ratio))
+        LLM_CHARS_PER_TOKEN.labels(model=self.model).set(self.chars_per_token)
+
+
+_estimators_lock = threading.Lock()
+_estimators = {}
+
+
+def get_token_estimator(model: str = None) -> TokenEstimator:
+    """Shared estimator for a model; OPENAI_LLM_MODEL when none is given."""
+    model = model or settings.OPENAI_LLM_MODEL
+    estimator = _estimators.get(model)
+    if estimator is None:
+        with _estimators_lock:
+            estimator = _estimators.setdefault(model, TokenEstimator(model))
+    return estimator
+
+
+def chunk_sizes() -> dict:
+    """chunk_text_semantic size arguments for the embedding token budget."""
+    estimator = get_token_estimator(settings.OPENAI_EMBED_MODEL)
+    return {
+        "target_chunk_size": estimator.chars(settings.CHUNK_TARGET_TOKENS),
+        "min_chunk_size": estimator.chars(settings.CHUNK_TARGET_TOKENS // 2),
+        "max_chunk_size": estimator.chars(settings.CHUNK_MAX_TOKENS),
+        "overlap": estimator.chars(settings.CHUNK_OVERLAP_TOKENS),
+    }
@@ -0,0 +1,147 @@
+"""
+Lightweight OpenTelemetry-style tracing.
+
+Spans carry trace/span/parent ids and attributes, nest through a ContextVar
+(so they follow asyncio tasks and asyncio.to_thread), and are exported as
+JSON lines to TRACE_FILE. With TRACING_ENABLED off, `instrument` leaves
+classes untouched and `span` is a no-op.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from app.core.config import settings
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status",
+    )
+
+    def __init__(self, name: str, parent: "Span" = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "context": {"trace_id": self.trace_id, "span_id": self.span_id},
+            "parent_id": self.parent_id,
+            "start_time_ns": self.start_ns,
+            "end_time_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class FileSpanExporter:
+    """Appends finished spans to a JSON lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", buffering=1)
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+_exporter = FileSpanExporter(settings.TRACE_FILE)
+
+
+def get_current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a span around the block when tracing is enabled."""
+    if not settings.TRACING_ENABLED:
+        yield None
+        return
+
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "ERROR"
+        current.set_attribute("exception", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        _exporter.export(current)
+
+
+def traced(name: str = None):
+    """Decorator that wraps a sync or async function in a span."""
+
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+        if asyncio.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument(cls):
+    """Class decorator: trace every public method defined on the class."""
+    if not settings.TRACING_ENABLED:
+        return cls
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith("_") or not callable(value):
+            continue
+        setattr(cls, attr, traced(f"{cls.__name__}.{attr}")(value))
+    return cls
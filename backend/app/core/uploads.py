@@ -0,0 +1,156 @@
+"""
+Disk-spooled uploads.
+
+Uploads are copied to a temporary file in fixed-size blocks, hashing as they
+go and stopping as soon as the size limit is exceeded, so a request never
+holds the whole file in memory. Text is then read back from the spool file
+a page or block at a time for incremental chunking.
+"""
+
+import asyncio
+import codecs
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Iterator, Optional
+from app.core.config import settings
+
+SPOOL_BLOCK_SIZE = 1024 * 1024
+TEXT_BLOCK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, filename: str, max_bytes: int):
+        super().__init__(
+            f"{filename} exceeds the upload limit of {max_bytes // (1024 * 1024)} MB"
+        )
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    filename: str
+    size: int
+    sha256: str
+
+    def remove(self):
+        remove_spool(self.path)
+
+
+def remove_spool(path: Optional[str]):
+    if path:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _spool_file(suffix: str = ""):
+    return tempfile.NamedTemporaryFile(
+        prefix="upload_", suffix=suffix, dir=settings.UPLOAD_SPOOL_DIR, delete=False
+    )
+
+
+async def spool_upload(upload, max_bytes: int) -> SpooledUpload:
+    """Copy an UploadFile to a spool file, hashing it and enforcing max_bytes."""
+    filename = upload.filename or "unknown"
+    digest = hashlib.sha256()
+    size = 0
+    with _spool_file() as spool:
+        try:
+            while True:
+                block = await upload.read(SPOOL_BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadTooLarge(filename, max_bytes)
+                # Hashing and writing a block blocks; keep it off the event loop
+                await asyncio.to_thread(_write_block, spool, digest, block)
+        except BaseException:
+            spool.close()
+            remove_spool(spool.name)
+            raise
+    return SpooledUpload(spool.name, filename, size, digest.hexdigest())
+
+
+def _write_block(spool, digest, block: bytes):
+    digest.update(block)
+    spool.write(block)
+
+
+def spool_stream(stream, filename: str, max_bytes: int) -> SpooledUpload:
+    """spool_upload for a synchronous binary stream, such as a zip member."""
+    digest = hashlib.sha256()
+    size = 0
+    with _spool_file() as spool:
+        try:
+            while block := stream.read(SPOOL_BLOCK_SIZE):
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadTooLarge(filename, max_bytes)
+                _write_block(spool, digest, block)
+        except BaseException:
+            spool.close()
+            remove_spool(spool.name)
+            raise
+    return SpooledUpload(spool.name, filename, size, digest.hexdigest())
+
+
+def iter_text(path: str, filename: str) -> Iterator[str]:
+    """Text of a spooled file, one PDF page or text block at a time."""
+    file_ext = filename.lower().split(".")[-1] if "." in filename else ""
+    if file_ext == "pdf":
+        yield from _iter_pdf_text(path)
+    else:
+        yield from _iter_plain_text(path)
+
+
+def _iter_pdf_text(path: str) -> Iterator[str]:
+    # Imported on first use to keep worker start-up fast
+    from PyPDF2 import PdfReader
+
+    try:
+        reader = PdfReader(path)
+        pages = reader.pages
+    except Exception as e:
+        raise ValueError(f"Failed to extract text from PDF: {str(e)}")
+    first = True
+    for page_num, page in enumerate(pages):
+        try:
+            text = page.extract_text()
+        except Exception as e:
+            raise ValueError(f"Failed to extract text from PDF: {str(e)}")
+        if text and text.strip():
+            # One "--- Page N ---" block per page, separated by a blank line
+            yield ("" if first else "\n\n") + f"--- Page {page_num + 1} ---\n{text}"
+            first = False
+
+
+def _iter_plain_text(path: str) -> Iterator[str]:
+    # Decode as utf-8 when the whole file is valid utf-8, otherwise as latin-1
+    encoding = "utf-8"
+    with open(path, "rb") as f:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            while block := f.read(TEXT_BLOCK_SIZE):
+                decoder.decode(block)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            encoding = "latin-1"
+        f.seek(0)
+        decoder = codecs.getincrementaldecoder(encoding)()
+        while block := f.read(TEXT_BLOCK_SIZE):
+            text = decoder.decode(block)
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+
+def has_text(path: str, filename: str) -> bool:
+    """Whether any non-whitespace text can be extracted, reading no further."""
+    return any(piece.strip() for piece in iter_text(path, filename))
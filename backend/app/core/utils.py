@@ -1,13 +1,14 @@
 import re
-from typing import List, Dict, Any
-import nltk
-from nltk.tokenize import sent_tokenize
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from app.core.segmenter import get_segmenter
+from app.core.tokens import get_token_estimator
 
-# Download required NLTK data (run once)
-try:
-    nltk.data.find("tokenizers/punkt")
-except LookupError:
-    nltk.download("punkt", quiet=True)
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def sent_tokenize(text: str) -> List[str]:
+    """Sentences of a paragraph, using the SENTENCE_SEGMENTER segmenter."""
+    return get_segmenter().split(text)
 
 
 def normalize_name(name: str) -> str:
@@ -41,6 +42,70 @@ def extract_headings(text: str) -> List[str]:
     return headings
 
 
+def _chunk_record(content: str, chunk_index: int, start: int, end: int, total_chars):
+    if total_chars:
+        # Streaming callers only have an estimate of the total length
+        position_ratio = min(start / total_chars, 1.0)
+    else:
+        position_ratio = 0
+    return {
+        "content": content,
+        "metadata": {
+            "chunk_index": chunk_index,
+            "char_start": start,
+            "char_end": end,
+            "position_ratio": position_ratio,
+            "content_type": detect_content_type(content),
+            "headings": extract_headings(content),
+        },
+    }
+
+
+def iter_paragraphs(pieces: Iterable[str], max_paragraph_chars: int = 20000):
+    """
+    Paragraphs from a stream of text pieces, splitting where the whole text
+    would be split. A paragraph longer than max_paragraph_chars is cut at its
+    last line or sentence break so the buffer stays bounded.
+    """
+    for _, paragraph in iter_paragraph_spans(pieces, max_paragraph_chars):
+        yield paragraph
+
+
+def iter_paragraph_spans(pieces: Iterable[str], max_paragraph_chars: int = 20000):
+    """iter_paragraphs as (offset in the whole text, paragraph) pairs."""
+    buffer = ""
+    offset = 0
+    for piece in pieces:
+        buffer += piece
+        start = 0
+        for separator in _PARAGRAPH_BREAK.finditer(buffer):
+            yield offset + start, buffer[start : separator.start()]
+            start = separator.end()
+        # The last part may continue in the next piece
+        buffer = buffer[start:]
+        offset += start
+        while len(buffer) > max_paragraph_chars:
+            cut = max(
+                buffer.rfind("\n", 0, max_paragraph_chars),
+                buffer.rfind(". ", 0, max_paragraph_chars) + 1,
+            )
+            if cut <= 0:
+                cut = max_paragraph_chars
+            yield offset, buffer[:cut]
+            buffer = buffer[cut:]
+            offset += cut
+    if buffer:
+        yield offset, buffer
+
+
+def _paragraph_spans(text: str) -> Iterator[tuple]:
+    start = 0
+    for separator in _PARAGRAPH_BREAK.finditer(text):
+        yield start, text[start : separator.start()]
+        start = separator.end()
+    yield start, text[start:]
+
+
 def chunk_text_semantic(
     text: str,
     target_chunk_size: int = 1000,
@@ -53,17 +118,67 @@ def chunk_text_semantic(
 
     Returns list of dicts with 'content' and 'metadata' keys.
     """
-    # Split into paragraphs
-    paragraphs = re.split(r"\n\s*\n", text)
+    return list(
+        iter_chunks_semantic(
+            _paragraph_spans(text),
+            total_chars=len(text),
+            target_chunk_size=target_chunk_size,
+            min_chunk_size=min_chunk_size,
+            max_chunk_size=max_chunk_size,
+            overlap=overlap,
+        )
+    )
+
+
+def _add_part(parts: list, separator: str, text: str, start: int):
+    if separator:
+        parts.append((separator, None))
+    parts.append((text, start))
+
+
+def _tail_parts(parts: list, size: int) -> list:
+    """The parts making up the last `size` characters of their joined text."""
+    tail = []
+    for text, start in reversed(parts):
+        if size <= 0:
+            break
+        if len(text) > size:
+            cut = len(text) - size
+            text, start = text[cut:], None if start is None else start + cut
+        tail.append((text, start))
+        size -= len(text)
+    return tail[::-1]
+
+
+def _source_span(parts: list) -> tuple:
+    """(start, end) in the source text of the characters the parts came from."""
+    mapped = [(start, start + len(text)) for text, start in parts if start is not None]
+    return mapped[0][0], mapped[-1][1]
 
-    chunks = []
+
+def iter_chunks_semantic(
+    paragraphs: Iterable[tuple],
+    total_chars: Optional[int] = None,
+    target_chunk_size: int = 1000,
+    min_chunk_size: int = 500,
+    max_chunk_size: int = 1500,
+    overlap: int = 150,
+) -> Iterator[Dict[str, Any]]:
+    """
+    chunk_text_semantic over a stream of (offset, paragraph) pairs (see
+    iter_paragraph_spans), yielding chunks as they close. char_start and
+    char_end are exact offsets into the source text: each piece of a chunk,
+    overlap included, remembers where in the source it was cut from.
+    """
     current_chunk = []
+    # Pieces of the chunk's content as (text, source offset); None for separators
+    parts = []
     current_size = 0
     chunk_index = 0
-    total_chars = len(text)
-    char_position = 0
+    segmenter = get_segmenter()
 
-    for para_idx, paragraph in enumerate(paragraphs):
+    for offset, paragraph in paragraphs:
+        offset += len(paragraph) - len(paragraph.lstrip())
         paragraph = paragraph.strip()
         if not paragraph:
             continue
@@ -78,56 +193,34 @@ def chunk_text_semantic(
         ):
             # If current chunk + this structure is too big, flush current chunk
             if current_size + len(paragraph) > max_chunk_size and current_chunk:
-                chunk_content = "\n\n".join(current_chunk)
-                chunks.append(
-                    {
-                        "content": chunk_content,
-                        "metadata": {
-                            "chunk_index": chunk_index,
-                            "char_start": char_position - current_size,
-                            "char_end": char_position,
-                            "position_ratio": (char_position - current_size)
-                            / total_chars
-                            if total_chars > 0
-                            else 0,
-                            "content_type": detect_content_type(chunk_content),
-                            "headings": extract_headings(chunk_content),
-                        },
-                    }
+                yield _chunk_record(
+                    "\n\n".join(current_chunk),
+                    chunk_index,
+                    *_source_span(parts),
+                    total_chars,
                 )
                 chunk_index += 1
                 current_chunk = []
+                parts = []
                 current_size = 0
 
+            _add_part(parts, "\n\n" if current_chunk else "", paragraph, offset)
             current_chunk.append(paragraph)
             current_size += len(paragraph) + 2  # +2 for \n\n
-            char_position += len(paragraph) + 2
             continue
 
         # For narrative text, split into sentences
-        sentences = sent_tokenize(paragraph)
+        spans = segmenter.spans(paragraph)
 
-        for sent_idx, sentence in enumerate(sentences):
+        for sent_idx, (start, end) in enumerate(spans):
+            sentence = paragraph[start:end]
             sentence_len = len(sentence)
 
             # If adding this sentence exceeds max size, flush current chunk
             if current_size + sentence_len > max_chunk_size and current_chunk:
                 chunk_content = "\n\n".join(current_chunk)
-                chunks.append(
-                    {
-                        "content": chunk_content,
-                        "metadata": {
-                            "chunk_index": chunk_index,
-                            "char_start": char_position - current_size,
-                            "char_end": char_position,
-                            "position_ratio": (char_position - current_size)
-                            / total_chars
-                            if total_chars > 0
-                            else 0,
-                            "content_type": detect_content_type(chunk_content),
-                            "headings": extract_headings(chunk_content),
-                        },
-                    }
+                yield _chunk_record(
+                    chunk_content, chunk_index, *_source_span(parts), total_chars
                 )
                 chunk_index += 1
 
@@ -138,63 +231,44 @@ def chunk_text_semantic(
                     else chunk_content
                 )
                 current_chunk = [overlap_text]
+                parts = _tail_parts(parts, len(overlap_text))
                 current_size = len(overlap_text)
 
             # Add sentence to current chunk
             if current_chunk and not current_chunk[-1].endswith(sentence):
+                _add_part(parts, "\n\n", sentence, offset + start)
                 current_chunk.append(sentence)
             elif not current_chunk:
+                _add_part(parts, "", sentence, offset + start)
                 current_chunk.append(sentence)
             else:
+                _add_part(parts, " ", sentence, offset + start)
                 current_chunk[-1] += " " + sentence
 
             current_size += sentence_len + 1  # +1 for space
-            char_position += sentence_len + 1
 
             # If we've reached a good chunk size and we're at paragraph boundary, flush
-            if current_size >= target_chunk_size and sent_idx == len(sentences) - 1:
-                chunk_content = "\n\n".join(current_chunk)
-                chunks.append(
-                    {
-                        "content": chunk_content,
-                        "metadata": {
-                            "chunk_index": chunk_index,
-                            "char_start": char_position - current_size,
-                            "char_end": char_position,
-                            "position_ratio": (char_position - current_size)
-                            / total_chars
-                            if total_chars > 0
-                            else 0,
-                            "content_type": detect_content_type(chunk_content),
-                            "headings": extract_headings(chunk_content),
-                        },
-                    }
+            if current_size >= target_chunk_size and sent_idx == len(spans) - 1:
+                yield _chunk_record(
+                    "\n\n".join(current_chunk),
+                    chunk_index,
+                    *_source_span(parts),
+                    total_chars,
                 )
                 chunk_index += 1
                 current_chunk = []
+                parts = []
                 current_size = 0
 
     # Flush remaining content
     if current_chunk:
-        chunk_content = "\n\n".join(current_chunk)
-        chunks.append(
-            {
-                "content": chunk_content,
-                "metadata": {
-                    "chunk_index": chunk_index,
-                    "char_start": char_position - current_size,
-                    "char_end": char_position,
-                    "position_ratio": (char_position - current_size) / total_chars
-                    if total_chars > 0
-                    else 0,
-                    "content_type": detect_content_type(chunk_content),
-                    "headings": extract_headings(chunk_content),
-                },
-            }
+        yield _chunk_record(
+            "\n\n".join(current_chunk),
+            chunk_index,
+            *_source_span(parts),
+            total_chars,
         )
 
-    return chunks
-
 
 def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100) -> List[str]:
     """Legacy chunking function - kept for backward compatibility."""
@@ -202,3 +276,61 @@ def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100) -> List[str
         text, target_chunk_size=chunk_size, overlap=overlap
     )
     return [chunk["content"] for chunk in chunks_with_metadata]
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count for budgeting, from the LLM model's calibrated estimator."""
+    return get_token_estimator().count(text)
+
+
+def strip_overlap(previous: str, content: str, overlap: int) -> str:
+    """content without the `overlap` characters it repeats from the end of previous."""
+    if overlap:
+        head = previous[-overlap:]
+        if content.startswith(head):
+            return content[len(head) :].lstrip()
+    return content
+
+
+def iter_extraction_windows(
+    chunks: Iterable[Dict[str, Any]],
+    max_tokens: int,
+    overlap: int = 0,
+    max_chunks: int = 0,
+    gate: Optional[Callable[[str, str], Optional[str]]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Consecutive chunks grouped so each group's text fits in max_tokens, for
+    one extraction call per group. Yields {"chunks": [...], "texts": [...]}
+    where texts are the chunk contents without their overlaps. A chunk over
+    the budget gets a window of its own; max_tokens <= 0 gives one window per
+    chunk, and max_chunks > 0 caps the chunks per window.
+
+    `gate(text, content_type)` may return a reason a chunk needs no
+    extraction; the chunk is then marked embed_only in its metadata, its text
+    is "" and it takes no room in the budget.
+    """
+    window, texts, used = [], [], 0
+    previous = None
+    for chunk in chunks:
+        text = chunk["content"]
+        if previous is not None:
+            text = strip_overlap(previous, text, overlap)
+        previous = chunk["content"]
+        reason = gate(text, chunk["metadata"]["content_type"]) if gate else None
+        if reason:
+            chunk["metadata"]["embed_only"] = reason
+            text = ""
+        tokens = estimate_tokens(text) if text else 0
+        if window and (
+            max_tokens <= 0
+            or used + tokens > max_tokens
+            or 0 < max_chunks <= len(window)
+        ):
+            yield {"chunks": window, "texts": texts}
+            window, texts, used = [], [], 0
+        window.append(chunk)
+        texts.append(text)
+        used += tokens
+    if window:
+        yield {"chunks": window, "texts": texts}
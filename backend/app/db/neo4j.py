@@ -1,12 +1,41 @@
-from neo4j import GraphDatabase
+import logging
 from app.core.config import settings
+from app.core.coordination import get_coordinator
+from app.db.queries.graph import ENTITY_CONSTRAINTS, ENTITY_INDEXES
+
+logger = logging.getLogger(__name__)
+
+
+def read_query(text: str):
+    """A query the server aborts after NEO4J_TIMEOUT_SECONDS."""
+    from neo4j import Query
+
+    return Query(text, timeout=settings.NEO4J_TIMEOUT_SECONDS)
 
 
 class Neo4jClient:
     def __init__(self):
+        # Imported on first use to keep worker start-up fast
+        from neo4j import GraphDatabase
+
         self.driver = GraphDatabase.driver(
-            settings.NEO4J_URI, auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+            settings.NEO4J_URI,
+            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+            connection_timeout=settings.NEO4J_TIMEOUT_SECONDS,
+            connection_acquisition_timeout=settings.NEO4J_TIMEOUT_SECONDS,
         )
 
+    def ensure_schema(self):
+        """Create the Entity constraints and indexes if they are missing."""
+        # Concurrent schema changes from several workers conflict in Neo4j
+        with get_coordinator().lock_sync("schema:neo4j"):
+            with self.driver.session() as session:
+                for statement in ENTITY_CONSTRAINTS + ENTITY_INDEXES:
+                    try:
+                        session.run(statement).consume()
+                    except Exception as e:
+                        # Existence constraints need Enterprise Edition; the rest still apply
+                        logger.warning(f"Skipping schema statement: {e}")
+
     def close(self):
         self.driver.close()
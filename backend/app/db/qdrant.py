@@ -1,11 +1,33 @@
-from qdrant_client import QdrantClient as LibQdrantClient
-from qdrant_client.models import VectorParams, Distance
+import threading
 from app.core.config import settings
 
+_default_collection_lock = threading.Lock()
+_default_collection_ready = False
+
 
 class QdrantDBClient:
-    def __init__(self):
-        self.client = LibQdrantClient(url=settings.QDRANT_URL)
+    def __init__(self, client=None):
+        if client is None:
+            # Imported on first use; qdrant_client takes over a second to import
+            from qdrant_client import QdrantClient as LibQdrantClient
+
+            client = LibQdrantClient(
+                url=settings.QDRANT_URL, timeout=settings.QDRANT_TIMEOUT_SECONDS
+            )
+        self.client = client
+
+    def ensure_default_collection(self):
+        """Create QDRANT_COLLECTION with the right dimensions, once per process."""
+        global _default_collection_ready
+        if _default_collection_ready:
+            return
+        with _default_collection_lock:
+            if not _default_collection_ready:
+                self._ensure_default_collection()
+                _default_collection_ready = True
+
+    def _ensure_default_collection(self):
+        from qdrant_client.models import VectorParams, Distance
 
         # Ensure collection exists and has correct dimensions
         if self.client.collection_exists(settings.QDRANT_COLLECTION):
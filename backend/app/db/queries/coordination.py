@@ -0,0 +1,25 @@
+# Advisory locks are session level: they stay held until unlocked or the
+# connection closes, so a crashed worker never leaves a lock behind.
+TRY_ADVISORY_LOCK_QUERY = "SELECT pg_try_advisory_lock(:key)"
+
+ADVISORY_UNLOCK_QUERY = "SELECT pg_advisory_unlock(:key)"
+
+# Token buckets use the database clock so replicas agree on refill time
+ENSURE_RATE_BUCKET_QUERY = """
+INSERT INTO rate_buckets (name, tokens, updated_at)
+VALUES (:name, :capacity, extract(epoch FROM clock_timestamp()))
+ON CONFLICT (name) DO NOTHING
+"""
+
+LOCK_RATE_BUCKET_QUERY = """
+SELECT tokens, extract(epoch FROM clock_timestamp()) - updated_at AS elapsed
+FROM rate_buckets
+WHERE name = :name
+FOR UPDATE
+"""
+
+UPDATE_RATE_BUCKET_QUERY = """
+UPDATE rate_buckets
+SET tokens = :tokens, updated_at = extract(epoch FROM clock_timestamp())
+WHERE name = :name
+"""
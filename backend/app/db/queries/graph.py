@@ -19,6 +19,15 @@ ENTITY_CONSTRAINTS = [
     """,
 ]
 
+ENTITY_INDEXES = [
+    """
+    CREATE INDEX entity_id_per_chat
+    IF NOT EXISTS
+    FOR (e:Entity)
+    ON (e.chat_id, e.entity_id)
+    """,
+]
+
 # In your graph queries file
 UPSERT_ENTITY_QUERY = """
         MERGE (e:Entity {{
@@ -31,9 +40,16 @@ UPSERT_ENTITY_QUERY = """
             e.type = $type,
             e.confidence = $confidence,
             e.created_from_chunk_id = $chunk_id,
-            e.created_at = $created_at
+            e.chunk_ids = $chunk_ids,
+            e.created_at = $created_at,
+            e.aliases = $aliases
         ON MATCH SET
-            e.confidence = coalesce(e.confidence, 0) + $confidence
+            e.confidence = coalesce(e.confidence, 0) + $confidence,
+            e.chunk_ids = coalesce(e.chunk_ids, [e.created_from_chunk_id])
+                + [c IN $chunk_ids WHERE NOT c IN coalesce(e.chunk_ids, [e.created_from_chunk_id])],
+            e.aliases = coalesce(e.aliases, [])
+                + [a IN $aliases WHERE NOT a IN coalesce(e.aliases, [])]
+        RETURN e.entity_id AS entity_id
         """
 
 
@@ -43,17 +59,72 @@ UPSERT_RELATIONSHIP_QUERY = """
         MERGE (a)-[r:{} {{chat_id: $chat_id}}]->(b)
         ON CREATE SET
             r.confidence = $confidence,
-            r.created_from_chunk_id = $chunk_id
+            r.created_from_chunk_id = $chunk_id,
+            r.chunk_ids = $chunk_ids
         ON MATCH SET
-            r.confidence = CASE WHEN $confidence > r.confidence THEN $confidence ELSE r.confidence END
+            r.confidence = CASE WHEN $confidence > r.confidence THEN $confidence ELSE r.confidence END,
+            r.chunk_ids = coalesce(r.chunk_ids, [r.created_from_chunk_id])
+                + [c IN $chunk_ids WHERE NOT c IN coalesce(r.chunk_ids, [r.created_from_chunk_id])]
         """
 
-MATCH_QUERY = """
+# Neighbourhood digests: top-k incident relationships per entity, cached on the node
+NEIGHBOURHOOD_QUERY = """
+UNWIND $entity_ids AS entity_id
+MATCH (e:Entity {chat_id: $chat_id, entity_id: entity_id})
+OPTIONAL MATCH (e)-[r]-(n:Entity)
+WITH e, r, n
+ORDER BY r.confidence DESC
+WITH e, collect(CASE WHEN r IS NULL THEN NULL ELSE {
+    type: type(r),
+    direction: CASE WHEN startNode(r) = e THEN 'out' ELSE 'in' END,
+    name: n.name,
+    entity_type: n.type,
+    confidence: r.confidence,
+    chunk_ids: coalesce(r.chunk_ids, [r.created_from_chunk_id])
+} END)[..$top_k] AS facts
+RETURN e.entity_id AS entity_id, e.name AS name, e.type AS type,
+       coalesce(e.chunk_ids, [e.created_from_chunk_id]) AS chunk_ids, facts
+"""
+
+SET_NEIGHBOURHOOD_QUERY = """
+UNWIND $rows AS row
+MATCH (e:Entity {chat_id: $chat_id, entity_id: row.entity_id})
+SET e.neighbourhood = row.digest, e.neighbourhood_updated_at = $updated_at
+"""
+
+CLEAR_NEIGHBOURHOODS_QUERY = """
+MATCH (e:Entity {chat_id: $chat_id})
+WHERE e.neighbourhood IS NOT NULL
+REMOVE e.neighbourhood, e.neighbourhood_updated_at
+"""
+
+DIGEST_LOOKUP_QUERY = """
 MATCH (e:Entity)
 WHERE e.chat_id = $chat_id
   AND e.name_normalized IN $names
-MATCH (e)-[r*1..{}]->(related)
-RETURN e, r, related
+RETURN e.entity_id AS entity_id, e.neighbourhood AS neighbourhood
+"""
+
+# Names for entity resolution and the per-chat alias index
+ENTITY_NAMES_QUERY = """
+MATCH (e:Entity {chat_id: $chat_id})
+RETURN e.name AS name, e.name_normalized AS name_normalized, e.type AS type,
+       coalesce(e.aliases, []) AS aliases
+"""
+
+# Adjacency export for local processing (community detection, CSR graph cache)
+ADJACENCY_ENTITIES_QUERY = """
+MATCH (e:Entity {chat_id: $chat_id})
+RETURN e.entity_id AS entity_id, e.name AS name, e.type AS type,
+       e.name_normalized AS name_normalized,
+       coalesce(e.chunk_ids, [e.created_from_chunk_id]) AS chunk_ids
+"""
+
+ADJACENCY_EDGES_QUERY = """
+MATCH (a:Entity {chat_id: $chat_id})-[r]->(b:Entity {chat_id: $chat_id})
+RETURN a.entity_id AS source_id, b.entity_id AS target_id,
+       type(r) AS type, r.confidence AS confidence,
+       coalesce(r.chunk_ids, [r.created_from_chunk_id]) AS chunk_ids
 """
 
 EXTRACT_ENTITIES_PROMPT = """
@@ -66,3 +137,82 @@ Return ONLY valid JSON:
   ]
 }
 """
+
+# Compaction: each call removes at most $limit rows, committing every $batch_size
+DELETE_CHAT_RELATIONSHIPS_QUERY = """
+MATCH (:Entity {chat_id: $chat_id})-[r]->()
+WITH r LIMIT $limit
+CALL { WITH r DELETE r } IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS deleted
+"""
+
+DELETE_CHAT_ENTITIES_QUERY = """
+MATCH (e:Entity {chat_id: $chat_id})
+WITH e LIMIT $limit
+CALL { WITH e DETACH DELETE e } IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS deleted
+"""
+
+# Elements survive a document purge while other chunks still mention them
+DELETE_CHUNK_RELATIONSHIPS_QUERY = """
+MATCH (:Entity {chat_id: $chat_id})-[r]->()
+WHERE all(c IN coalesce(r.chunk_ids, [r.created_from_chunk_id]) WHERE c IN $chunk_ids)
+WITH r LIMIT $limit
+CALL { WITH r DELETE r } IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS deleted
+"""
+
+DELETE_ORPHAN_CHUNK_ENTITIES_QUERY = """
+MATCH (e:Entity {chat_id: $chat_id})
+WHERE all(c IN coalesce(e.chunk_ids, [e.created_from_chunk_id]) WHERE c IN $chunk_ids)
+  AND NOT (e)--()
+WITH e LIMIT $limit
+CALL { WITH e DELETE e } IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS deleted
+"""
+
+PRUNE_CHUNK_RELATIONSHIPS_QUERY = """
+MATCH (:Entity {chat_id: $chat_id})-[r]->()
+WHERE any(c IN r.chunk_ids WHERE c IN $chunk_ids)
+WITH r LIMIT $limit
+CALL {
+    WITH r SET r.chunk_ids = [c IN r.chunk_ids WHERE NOT c IN $chunk_ids]
+} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS deleted
+"""
+
+PRUNE_CHUNK_ENTITIES_QUERY = """
+MATCH (e:Entity {chat_id: $chat_id})
+WHERE any(c IN e.chunk_ids WHERE c IN $chunk_ids)
+WITH e LIMIT $limit
+CALL {
+    WITH e SET e.chunk_ids = [c IN e.chunk_ids WHERE NOT c IN $chunk_ids]
+} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS deleted
+"""
+
+# Snapshot export/import
+EXPORT_ENTITIES_QUERY = """
+MATCH (e:Entity {chat_id: $chat_id})
+RETURN properties(e) AS props
+"""
+
+EXPORT_RELATIONSHIPS_QUERY = """
+MATCH (a:Entity {chat_id: $chat_id})-[r]->(b:Entity {chat_id: $chat_id})
+RETURN a.entity_id AS source_id, b.entity_id AS target_id, type(r) AS type, properties(r) AS props
+"""
+
+IMPORT_ENTITIES_QUERY = """
+UNWIND $rows AS row
+CREATE (e:Entity)
+SET e = row, e.chat_id = $chat_id
+"""
+
+# Relationship types cannot be parameters, so rows are grouped by type
+IMPORT_RELATIONSHIPS_QUERY = """
+UNWIND $rows AS row
+MATCH (a:Entity {{chat_id: $chat_id, entity_id: row.source_id}})
+MATCH (b:Entity {{chat_id: $chat_id, entity_id: row.target_id}})
+CREATE (a)-[r:{}]->(b)
+SET r = row.props, r.chat_id = $chat_id
+"""
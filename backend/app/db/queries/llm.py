@@ -12,6 +12,97 @@ Return ONLY valid JSON in this exact format:
 }
 """
 
+EXTRACT_PACKED_PROMPT = """
+You extract entities and relationships from several numbered text chunks.
+Each chunk starts with a line "### Chunk N". Extract from every chunk on its
+own, and return an entry for every chunk, even when it has no entities.
+
+Return ONLY valid JSON in this exact format:
+{
+  "chunks": [
+    {
+      "chunk": 1,
+      "entities": [
+        {"name": "...", "type": "...", "confidence": 0.0}
+      ],
+      "relationships": [
+        {"source": "...", "target": "...", "type": "...", "confidence": 0.0}
+      ]
+    }
+  ]
+}
+"""
+
+_ENTITY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "type": {"type": "string"},
+        "confidence": {"type": "number"},
+    },
+    "required": ["name", "type", "confidence"],
+    "additionalProperties": False,
+}
+
+_RELATIONSHIP_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "source": {"type": "string"},
+        "target": {"type": "string"},
+        "type": {"type": "string"},
+        "confidence": {"type": "number"},
+    },
+    "required": ["source", "target", "type", "confidence"],
+    "additionalProperties": False,
+}
+
+_EXTRACTION_PROPERTIES = {
+    "entities": {"type": "array", "items": _ENTITY_SCHEMA},
+    "relationships": {"type": "array", "items": _RELATIONSHIP_SCHEMA},
+}
+
+# OpenAI structured output: the reply is guaranteed to match the schema
+EXTRACTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "extraction",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": _EXTRACTION_PROPERTIES,
+            "required": ["entities", "relationships"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+EXTRACT_PACKED_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "packed_extraction",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "chunks": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "chunk": {"type": "integer"},
+                            **_EXTRACTION_PROPERTIES,
+                        },
+                        "required": ["chunk", "entities", "relationships"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["chunks"],
+            "additionalProperties": False,
+        },
+    },
+}
+
 ANSWER_QUESTION_PROMPT = """
 You are a helpful, accurate assistant that answers user questions using the provided context.
 
@@ -22,3 +113,37 @@ Instructions:
 - If the question is ambiguous, ask a brief clarifying question instead of guessing.
 - Keep responses short, direct, and factual.
 """
+
+COMMUNITY_SUMMARY_PROMPT = """
+You summarise one community of a knowledge graph built from the user's documents.
+You are given its entities and the relationships between them.
+
+Return ONLY valid JSON:
+{
+  "title": "short name for the community",
+  "summary": "two to four sentences on what connects these entities and why it matters"
+}
+"""
+
+GLOBAL_MAP_PROMPT = """
+You are given summaries of communities from a knowledge graph and a question.
+List the points from these summaries that help answer the question, each with
+an importance score from 0 to 100. Use only the summaries.
+
+Return ONLY valid JSON:
+{
+  "points": [
+    {"description": "...", "score": 0}
+  ]
+}
+"""
+
+GLOBAL_REDUCE_PROMPT = """
+You answer a broad question about the user's documents from key points that
+analysts extracted from community summaries. Points are ordered by importance.
+
+Instructions:
+- Combine the points into one coherent answer.
+- Do NOT invent facts that are not in the points.
+- If the points do not answer the question, say so.
+"""
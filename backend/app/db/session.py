@@ -2,7 +2,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, Asyn
 from app.core.config import settings
 from app.models.base import Base
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+engine = create_async_engine(settings.DATABASE_URL, echo=settings.SQL_ECHO)
 
 SessionLocal = async_sessionmaker(
     bind=engine,
@@ -12,11 +12,16 @@ SessionLocal = async_sessionmaker(
 
 
 async def init_db():
-    async with engine.begin() as conn:
-        # Import models here to ensure they are registered with Base
-        from app.models.chat import Chat, Message, Document
+    from app.core.coordination import get_coordinator
 
-        await conn.run_sync(Base.metadata.create_all)
+    # Workers starting together would otherwise race on CREATE TABLE
+    async with get_coordinator().lock("schema:postgres"):
+        async with engine.begin() as conn:
+            # Import models here to ensure they are registered with Base
+            from app.models.chat import Chat, Message, Document, CommunitySummary
+            from app.models.coordination import RateBucket
+
+            await conn.run_sync(Base.metadata.create_all)
 
 
 async def get_db():
@@ -1,12 +1,19 @@
 from app.db.queries.graph import UPSERT_ENTITY_QUERY, UPSERT_RELATIONSHIP_QUERY
+from collections import Counter
+from app.core.config import settings
 from app.core.utils import normalize_name
 from datetime import datetime
 
 
-def upsert_entity(tx, entity):
+def _provenance(element) -> list[str]:
+    return [str(c) for c in dict.fromkeys(element.chunk_ids or [element.chunk_id])]
+
+
+def upsert_entity(tx, entity) -> str:
+    """Merge the entity and return the entity_id stored on the node."""
     name_norm = normalize_name(entity.name)
 
-    tx.run(
+    result = tx.run(
         UPSERT_ENTITY_QUERY.format(f"`{entity.type}`"),
         chat_id=str(entity.chat_id),
         entity_id=str(entity.id),
@@ -15,8 +22,13 @@ def upsert_entity(tx, entity):
         type=entity.type,
         confidence=entity.confidence or 0.0,
         chunk_id=str(entity.chunk_id),
+        chunk_ids=_provenance(entity),
+        aliases=list(entity.aliases),
         created_at=datetime.utcnow().isoformat(),
     )
+    # An existing node keeps its original entity_id
+    record = result.single()
+    return record["entity_id"] if record else str(entity.id)
 
 
 def upsert_relationship(tx, rel):
@@ -27,18 +39,83 @@ def upsert_relationship(tx, rel):
         chat_id=str(rel.chat_id),
         confidence=rel.confidence or 0.0,
         chunk_id=str(rel.chunk_id),
+        chunk_ids=_provenance(rel),
     )
 
 
-def build_context(chunks, graph_results) -> str:
+def build_context(chunks, graph_results, supporting=()) -> str:
     context_parts = []
 
     context_parts.append("### Relevant Information")
     for c in chunks:
         context_parts.append(f"- {c.payload['text']}")
+    for c in supporting:
+        context_parts.append(f"- {c.payload['text']}")
 
     context_parts.append("\n### Knowledge Graph Facts")
-    for record in graph_results:
-        context_parts.append(str(record))
+    seen = set()
+    for digest in graph_results:
+        for fact in digest["facts"]:
+            if fact["direction"] == "out":
+                line = f"- {digest['name']} -[{fact['type']}]-> {fact['name']}"
+            else:
+                line = f"- {fact['name']} -[{fact['type']}]-> {digest['name']}"
+            # Facts between two queried entities appear in both digests
+            if line in seen:
+                continue
+            seen.add(line)
+            context_parts.append(f"{line} (confidence {fact['confidence']:.2f})")
 
     return "\n".join(context_parts)
+
+
+def digest_chunk_ids(fact_chunk_ids, entity_chunk_ids, limit: int) -> list[str]:
+    """Chunks backing the ranked facts first, then the entity's own mentions."""
+    chunk_ids = {}
+    for ids in [*fact_chunk_ids, entity_chunk_ids]:
+        for chunk_id in ids:
+            if chunk_id and len(chunk_ids) < limit:
+                chunk_ids.setdefault(chunk_id, None)
+    return list(chunk_ids)
+
+
+def build_digest(record) -> dict:
+    """Compact neighbourhood digest from a NEIGHBOURHOOD_QUERY record."""
+    facts = [
+        {
+            "type": fact["type"],
+            "direction": fact["direction"],
+            "name": fact["name"],
+            "entity_type": fact["entity_type"],
+            "confidence": round(fact["confidence"] or 0.0, 4),
+        }
+        for fact in record["facts"]
+    ]
+    return {
+        "entity_id": record["entity_id"],
+        "name": record["name"],
+        "type": record["type"],
+        "facts": facts,
+        "chunk_ids": digest_chunk_ids(
+            [fact["chunk_ids"] or [] for fact in record["facts"]],
+            record["chunk_ids"] or [],
+            settings.GRAPH_DIGEST_MAX_CHUNKS,
+        ),
+    }
+
+
+def supporting_chunk_ids(digests, exclude=(), limit: int = 3) -> list[str]:
+    """Chunk ids cited by the most digests, earliest citation breaking ties."""
+    counts = Counter()
+    for digest in digests:
+        counts.update(set(digest.get("chunk_ids") or []))
+    order = {}
+    for digest in digests:
+        for chunk_id in digest.get("chunk_ids") or []:
+            order.setdefault(chunk_id, len(order))
+    excluded = {str(c) for c in exclude}
+    ranked = sorted(
+        (c for c in counts if c not in excluded),
+        key=lambda c: (-counts[c], order[c]),
+    )
+    return ranked[:limit]
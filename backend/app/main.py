@@ -1,11 +1,24 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.coordination import get_coordinator
+from app.core.health import check_dependencies, warm_up
+from app.core.metrics import REGISTRY
+from app.db.qdrant import QdrantDBClient
 from app.db.session import init_db
 from app.api.endpoints.chats import router as chat_router
 from app.api.endpoints.ingestion import router as ingestion_router
+from app.api.endpoints.maintenance import router as maintenance_router
+from app.services.compaction_service import run_compaction_loop
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.APP_NAME, debug=settings.DEBUG)
+app.state.ready = False
 
 # Configure CORS
 app.add_middleware(
@@ -20,15 +33,106 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Multipart framing on top of the file content
+UPLOAD_OVERHEAD_BYTES = 1024 * 1024
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized uploads from Content-Length before reading the body."""
+    if request.method == "POST" and request.url.path.startswith("/ingest"):
+        if request.url.path.startswith("/ingest/batch"):
+            limit_mb = settings.INGEST_BATCH_MAX_MB
+        else:
+            limit_mb = settings.INGEST_MAX_UPLOAD_MB
+        length = request.headers.get("content-length")
+        if (
+            length
+            and length.isdigit()
+            and int(length) > limit_mb * 1024 * 1024 + UPLOAD_OVERHEAD_BYTES
+        ):
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds {limit_mb} MB"},
+            )
+    return await call_next(request)
+
+
 app.include_router(chat_router)
 app.include_router(ingestion_router)
+app.include_router(maintenance_router)
 
 
 @app.on_event("startup")
 async def startup_event():
-    await init_db()
+    await get_coordinator().start()
+    # Serve liveness right away; readiness waits for the stores
+    app.state.prepare_task = asyncio.create_task(prepare())
+
+
+async def prepare():
+    """Initialise storage, then warm up the modules deferred at import time."""
+    started = time.perf_counter()
+    delay = 1.0
+    while True:
+        try:
+            await init_db()
+            break
+        except Exception as e:
+            logger.warning(f"⚠️ Database not ready ({e}); retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+    if settings.COMPACTION_ENABLED:
+        app.state.compaction_task = asyncio.create_task(run_compaction_loop())
+    app.state.ready = True
+    logger.info(f"✅ Ready in {time.perf_counter() - started:.2f}s")
+
+    timings = await asyncio.to_thread(warm_up)
+    logger.info(f"🔥 Warm-up finished: {timings}")
+    try:
+        await asyncio.to_thread(QdrantDBClient().ensure_default_collection)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not check {settings.QDRANT_COLLECTION}: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for name in ("prepare_task", "compaction_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
 
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "app": settings.APP_NAME}
+
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving; never touches a dependency."""
+    return {"status": "alive", "app": settings.APP_NAME}
+
+
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """Startup finished and Postgres, Qdrant and Neo4j answer."""
+    if not app.state.ready:
+        response.status_code = 503
+        return {"status": "starting", "app": settings.APP_NAME}
+    checks = await check_dependencies(settings.HEALTH_CHECK_TIMEOUT_SECONDS)
+    ready = all(result == "ok" for result in checks.values())
+    if not ready:
+        response.status_code = 503
+    return {
+        "status": "ready" if ready else "unavailable",
+        "app": settings.APP_NAME,
+        "checks": checks,
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
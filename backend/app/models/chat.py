@@ -1,7 +1,7 @@
 from datetime import datetime
 from uuid import UUID, uuid4
 from typing import List
-from sqlalchemy import String, ForeignKey, DateTime, Integer
+from sqlalchemy import String, ForeignKey, DateTime, Integer, Float
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.models.base import Base
 
@@ -53,3 +53,19 @@ class Document(Base):
     )
 
     chat: Mapped["Chat"] = relationship(back_populates="documents")
+
+
+class CommunitySummary(Base):
+    __tablename__ = "community_summaries"
+
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    chat_id: Mapped[UUID] = mapped_column(ForeignKey("chats.id"), index=True)
+    level: Mapped[int] = mapped_column(Integer)
+    community: Mapped[int] = mapped_column(Integer)
+    entity_count: Mapped[int] = mapped_column(Integer)
+    # Community size relative to the largest one at the same level
+    rank: Mapped[float] = mapped_column(Float)
+    title: Mapped[str] = mapped_column(String(255))
+    summary: Mapped[str] = mapped_column(String)
+    entity_names: Mapped[str] = mapped_column(String)  # JSON list
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,14 @@
+from sqlalchemy import String, Float
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import Base
+
+
+class RateBucket(Base):
+    """Token bucket shared by every backend process."""
+
+    __tablename__ = "rate_buckets"
+
+    name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float)
+    # Seconds since the epoch on the database clock
+    updated_at: Mapped[float] = mapped_column(Float)
@@ -1,5 +1,5 @@
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Optional, List, Literal
+from pydantic import BaseModel, Field
 from app.schemas.chat import Chat
 from app.schemas.message import Message
 from app.schemas.document import Document
@@ -17,6 +17,10 @@ class ChatUpdate(BaseModel):
 class MessageCreate(BaseModel):
     content: str
     role: Optional[str] = "user"
+    # "global" answers broad questions from community summaries
+    mode: Literal["local", "global"] = "local"
+    # Shorter deadline for this message; the configured one still applies
+    deadline_seconds: Optional[float] = Field(None, gt=0)
 
 
 class ChatDetailed(Chat):
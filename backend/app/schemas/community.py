@@ -0,0 +1,30 @@
+# Community Summary Model
+from uuid import UUID
+from app.schemas.base import BaseSchema
+from datetime import datetime
+from pydantic import Field
+from typing import List
+from uuid import uuid4
+
+
+class CommunitySummary(BaseSchema):
+    id: UUID = Field(default_factory=uuid4)
+    chat_id: UUID
+    level: int
+    community: int
+    entity_count: int
+    rank: float
+    title: str
+    summary: str
+    entity_names: List[str] = []
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+class CommunityBuildReport(BaseSchema):
+    chat_id: UUID
+    entities: int = 0
+    relationships: int = 0
+    levels: int = 0
+    communities: int = 0
+    summaries: int = 0
+    errors: List[str] = []
@@ -0,0 +1,25 @@
+# Compaction Report Model
+from app.schemas.base import BaseSchema
+from datetime import datetime
+from pydantic import Field, computed_field
+from typing import List, Optional
+
+
+class CompactionReport(BaseSchema):
+    started_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+
+    chats_purged: int = 0
+    documents_purged: int = 0
+    points_deleted: int = 0
+    points_reassigned: int = 0  # kept for documents that alias them
+    vector_bytes_reclaimed: int = 0
+    payload_bytes_reclaimed: int = 0
+    nodes_deleted: int = 0
+    relationships_deleted: int = 0
+    errors: List[str] = []
+
+    @computed_field
+    @property
+    def bytes_reclaimed(self) -> int:
+        return self.vector_bytes_reclaimed + self.payload_bytes_reclaimed
@@ -1,7 +1,7 @@
 # Entity Model
 from uuid import UUID
 from app.schemas.base import BaseSchema
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic import Field
 from uuid import uuid4
@@ -15,4 +15,8 @@ class Entity(BaseSchema):
     name: str
     confidence: Optional[float]
     chunk_id: UUID
+    # Every chunk of the document that mentions the entity
+    chunk_ids: List[UUID] = Field(default_factory=list)
+    # Other names resolved to this entity, normalised
+    aliases: List[str] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,32 @@
+# Batch Ingestion Models
+from uuid import UUID
+from app.schemas.base import BaseSchema
+from datetime import datetime
+from pydantic import Field
+from typing import List, Optional
+
+
+class BatchDocument(BaseSchema):
+    document_id: UUID
+    file_name: str
+    file_size: int
+    checksum: str = ""
+    # Spooled upload to read from; text is used when there is no file
+    path: Optional[str] = None
+    text: Optional[str] = None
+
+
+class BatchIngestionStatus(BaseSchema):
+    batch_id: UUID
+    chat_id: UUID
+    status: str = "processing"
+    started_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+
+    documents_total: int = 0
+    documents_completed: int = 0
+    documents_failed: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_extracted: int = 0
+    errors: List[str] = []
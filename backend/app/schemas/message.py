@@ -3,6 +3,7 @@ from uuid import UUID
 from app.schemas.base import BaseSchema
 from app.core.constants import MessageRole
 from datetime import datetime
+from typing import List
 from pydantic import Field
 from uuid import uuid4
 
@@ -13,3 +14,7 @@ class Message(BaseSchema):
     role: MessageRole
     content: str
     created_at: datetime = Field(default_factory=datetime.now)
+    # True when the answer came from the chat's semantic answer cache
+    cached: bool = False
+    # Retrieval stages left out to answer within the deadline
+    skipped_stages: List[str] = Field(default_factory=list)
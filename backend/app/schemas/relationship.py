@@ -3,7 +3,7 @@ from uuid import UUID
 from app.schemas.base import BaseSchema
 from datetime import datetime
 from pydantic import Field
-from typing import Optional
+from typing import List, Optional
 from uuid import uuid4
 
 
@@ -15,4 +15,6 @@ class Relationship(BaseSchema):
     type: str
     confidence: Optional[float]
     chunk_id: UUID
+    # Every chunk of the document that states the relationship
+    chunk_ids: List[UUID] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=datetime.now)
@@ -1,10 +1,12 @@
 from app.services.llm_service import LLMService
 from app.db.queries.llm import ANSWER_QUESTION_PROMPT
+from app.core.tracing import instrument
 
 
+@instrument
 class AnswerService:
-    def __init__(self):
-        self.llm = LLMService()
+    def __init__(self, llm=None):
+        self.llm = llm or LLMService()
 
     def generate_answer(self, question: str, context: str) -> str:
         prompt = f"""
@@ -18,4 +20,4 @@ Question:
 
 Answer:
 """
-        return self.llm.generate(prompt)
+        return self.llm.generate(prompt, call_site="answer")
@@ -1,18 +1,46 @@
+import asyncio
+import logging
 from app.services.retrieval_service import RetrievalService
 from app.services.answer_service import AnswerService
+from app.services.global_search_service import GlobalSearchService
 from app.schemas.message import Message as MessageSchema
-from app.core.constants import MessageRole, ChatStatus
-from app.models.chat import Message as MessageModel, Chat as ChatModel
+from app.core.constants import MessageRole, ChatStatus, DocumentStatus
+from app.models.chat import (
+    Message as MessageModel,
+    Chat as ChatModel,
+    Document as DocumentModel,
+)
 from app.db.session import SessionLocal
+from app.core.answer_cache import get_answer_cache
+from app.core.config import settings
+from app.core.deadlines import Deadline, DeadlineExceeded, run_stage
+from app.core.metrics import (
+    ANSWER_CACHE_REQUESTS,
+    CHAT_DEADLINE_EXCEEDED,
+    CHAT_STAGE_SECONDS,
+)
+from app.core.tracing import instrument
 from uuid import UUID, uuid4
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, func
 from typing import List, Optional
 
+logger = logging.getLogger(__name__)
 
+
+@instrument
 class ChatService:
-    def __init__(self):
-        self.retrieval = RetrievalService()
-        self.answer_service = AnswerService()
+    def __init__(
+        self, retrieval=None, answer_service=None, answer_cache=None, global_search=None
+    ):
+        self.retrieval = retrieval or RetrievalService()
+        self.answer_service = answer_service or AnswerService()
+        self.global_search = global_search or GlobalSearchService(
+            llm=self.answer_service.llm
+        )
+        # Pass answer_cache=False to opt out of the configured cache
+        if answer_cache is None:
+            answer_cache = get_answer_cache()
+        self.answer_cache = answer_cache or None
 
     async def create_chat(self, title: str) -> ChatModel:
         async with SessionLocal() as db:
@@ -28,7 +56,9 @@ class ChatService:
             if status:
                 query = query.where(ChatModel.status == status)
             else:
-                query = query.where(ChatModel.status != ChatStatus.DELETED)
+                query = query.where(
+                    ChatModel.status.notin_([ChatStatus.DELETED, ChatStatus.PURGED])
+                )
 
             result = await db.execute(query)
             return result.scalars().all()
@@ -75,14 +105,123 @@ class ChatService:
             await db.commit()
             return True
 
-    async def handle_user_message(self, chat_id, content: str) -> MessageSchema:
-        # 1. Retrieve context
-        context = self.retrieval.retrieve_context(chat_id, content)
+    async def handle_user_message(
+        self,
+        chat_id,
+        content: str,
+        mode: str = "local",
+        deadline_seconds: Optional[float] = None,
+    ) -> MessageSchema:
+        """
+        Answer the message within its deadline. Retrieval stages that would
+        overrun it are left out and listed in the reply's skipped_stages;
+        DeadlineExceeded is raised when no answer fits.
+        """
+        deadline = Deadline(self._deadline_seconds(mode, deadline_seconds))
+        with CHAT_STAGE_SECONDS.labels(stage="end_to_end").time():
+            if mode == "global":
+                try:
+                    with CHAT_STAGE_SECONDS.labels(stage="global_search").time():
+                        answer = await asyncio.wait_for(
+                            self.global_search.answer(chat_id, content),
+                            deadline.remaining(),
+                        )
+                except TimeoutError:
+                    CHAT_DEADLINE_EXCEEDED.labels(mode=mode).inc()
+                    raise DeadlineExceeded("Global search did not finish in time")
+                if answer is not None:
+                    with CHAT_STAGE_SECONDS.labels(stage="persist").time():
+                        return await self._save_exchange(chat_id, content, answer)
+                # No community summaries yet: answer from local retrieval
+
+            # 0. Semantic answer cache; the embedding is reused for vector recall
+            query_vector = None
+            if self.answer_cache is not None:
+                version = await self._document_version(chat_id)
+                hit = None
+                try:
+                    with CHAT_STAGE_SECONDS.labels(stage="answer_cache").time():
+                        query_vector = await run_stage(
+                            deadline.child(
+                                settings.CHAT_VECTOR_BUDGET_SECONDS,
+                                settings.CHAT_ANSWER_RESERVE_SECONDS,
+                            ),
+                            self.retrieval.embed_question,
+                            content,
+                        )
+                        hit = self.answer_cache.lookup(chat_id, query_vector, version)
+                except Exception as e:
+                    logger.warning(f"⏱️ Skipping the answer cache: {e}")
+                ANSWER_CACHE_REQUESTS.labels(result="hit" if hit else "miss").inc()
+                if hit:
+                    with CHAT_STAGE_SECONDS.labels(stage="persist").time():
+                        return await self._save_exchange(
+                            chat_id, content, hit["answer"], cached=True
+                        )
+
+            # 1. Retrieve context
+            context, skipped = await self.retrieval.retrieve_context_async(
+                chat_id, content, deadline, query_vector=query_vector
+            )
 
-        # 2. Generate answer
-        answer = self.answer_service.generate_answer(content, context)
+            # 2. Generate answer
+            try:
+                with CHAT_STAGE_SECONDS.labels(stage="answer").time():
+                    answer = await run_stage(
+                        deadline, self.answer_service.generate_answer, content, context
+                    )
+            except TimeoutError:
+                CHAT_DEADLINE_EXCEEDED.labels(mode=mode).inc()
+                raise DeadlineExceeded("The answer did not finish in time")
+
+            # An answer from partial context is not worth reusing
+            if (
+                self.answer_cache is not None
+                and query_vector is not None
+                and not skipped
+            ):
+                self.answer_cache.store(chat_id, query_vector, version, content, answer)
+
+            # 3. Create assistant message and save to DB
+            with CHAT_STAGE_SECONDS.labels(stage="persist").time():
+                return await self._save_exchange(
+                    chat_id, content, answer, skipped_stages=skipped
+                )
 
-        # 3. Create assistant message and save to DB
+    @staticmethod
+    def _deadline_seconds(mode: str, requested: Optional[float]) -> Optional[float]:
+        """The mode's configured deadline, shortened to the one requested if any."""
+        configured = (
+            settings.CHAT_GLOBAL_DEADLINE_SECONDS
+            if mode == "global"
+            else settings.CHAT_DEADLINE_SECONDS
+        )
+        if requested and configured:
+            return min(requested, configured)
+        return requested or configured or None
+
+    async def _document_version(self, chat_id):
+        """Changes whenever a document of the chat completes or is removed."""
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(
+                    func.count(DocumentModel.id), func.max(DocumentModel.updated_at)
+                ).where(
+                    DocumentModel.chat_id == chat_id,
+                    DocumentModel.status == DocumentStatus.COMPLETED,
+                )
+            )
+            count, last_updated = result.one()
+            return f"{count}:{last_updated.isoformat() if last_updated else ''}"
+
+    async def _save_exchange(
+        self,
+        chat_id,
+        content: str,
+        answer: str,
+        cached: bool = False,
+        skipped_stages: Optional[List[str]] = None,
+    ) -> MessageSchema:
         async with SessionLocal() as db:
             # Save user message (assuming it's not saved elsewhere yet)
             user_msg = MessageModel(
@@ -103,4 +242,6 @@ class ChatService:
                 role=MessageRole.ASSISTANT,
                 content=answer,
                 created_at=assistant_msg.created_at,
+                cached=cached,
+                skipped_stages=skipped_stages or [],
             )
@@ -0,0 +1,185 @@
+import asyncio
+import json
+from collections import defaultdict
+from app.db.neo4j import Neo4jClient
+from app.db.session import SessionLocal
+from app.db.queries.graph import ADJACENCY_ENTITIES_QUERY, ADJACENCY_EDGES_QUERY
+from app.db.queries.llm import COMMUNITY_SUMMARY_PROMPT
+from app.models.chat import CommunitySummary as CommunitySummaryModel
+from app.schemas.community import CommunityBuildReport
+from app.services.llm_service import LLMService
+from app.core.community import louvain
+from app.core.config import settings
+from app.core.tracing import instrument
+from app.core.utils import estimate_tokens
+from sqlalchemy import delete
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_summary(raw: str, fallback_title: str) -> tuple[str, str]:
+    start, end = raw.find("{"), raw.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(raw[start : end + 1])
+            return (
+                str(data.get("title") or fallback_title)[:255],
+                str(data.get("summary") or "").strip(),
+            )
+        except json.JSONDecodeError:
+            pass
+    return fallback_title, raw.strip()
+
+
+@instrument
+class CommunityService:
+    """Detects entity communities per chat and stores an LLM summary for each."""
+
+    def __init__(self, client=None, llm=None, max_workers: int = None):
+        self.client = client or Neo4jClient()
+        self.llm = llm or LLMService()
+        self.max_workers = max_workers or settings.COMMUNITY_SUMMARY_WORKERS
+
+    async def build(self, chat_id) -> CommunityBuildReport:
+        """Recompute the chat's community hierarchy and replace its summaries."""
+        report = CommunityBuildReport(chat_id=chat_id)
+        entities, edges = await asyncio.to_thread(self._export_graph, chat_id)
+        report.entities, report.relationships = len(entities), len(edges)
+        if not edges:
+            await self._save(chat_id, [])
+            return report
+
+        index = {e["entity_id"]: i for i, e in enumerate(entities)}
+        weighted = [
+            (index[e["source_id"]], index[e["target_id"]], e["confidence"] or 0.5)
+            for e in edges
+            if e["source_id"] in index and e["target_id"] in index
+        ]
+        levels = await asyncio.to_thread(
+            louvain,
+            len(entities),
+            weighted,
+            resolution=settings.COMMUNITY_RESOLUTION,
+            max_levels=settings.COMMUNITY_MAX_LEVELS,
+        )
+        report.levels = len(levels)
+
+        selected = self._select_communities(levels)
+        report.communities = len(selected)
+        logger.info(
+            f"🧩 Chat {chat_id}: {len(selected)} communities over {len(levels)} levels"
+        )
+
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def summarise(level, community, members, rank):
+            description = self._describe(members, entities, edges, index)
+            async with semaphore:
+                try:
+                    raw = await asyncio.to_thread(
+                        self.llm.generate,
+                        COMMUNITY_SUMMARY_PROMPT + "\n\nCommunity:\n" + description,
+                        call_site="community",
+                    )
+                except Exception as e:
+                    report.errors.append(f"level {level} community {community}: {e}")
+                    return None
+            title, summary = _parse_summary(raw, f"Community {level}.{community}")
+            return CommunitySummaryModel(
+                chat_id=chat_id,
+                level=level,
+                community=community,
+                entity_count=len(members),
+                rank=rank,
+                title=title,
+                summary=summary,
+                entity_names=json.dumps([entities[i]["name"] for i in members]),
+            )
+
+        rows = await asyncio.gather(*(summarise(*c) for c in selected))
+        rows = [r for r in rows if r is not None]
+        await self._save(chat_id, rows)
+        report.summaries = len(rows)
+        return report
+
+    def _export_graph(self, chat_id):
+        with self.client.driver.session() as session:
+            entities = [
+                r.data()
+                for r in session.run(ADJACENCY_ENTITIES_QUERY, chat_id=str(chat_id))
+            ]
+            edges = [
+                r.data()
+                for r in session.run(ADJACENCY_EDGES_QUERY, chat_id=str(chat_id))
+            ]
+        return entities, edges
+
+    def _select_communities(self, levels):
+        """Largest communities per level as (level, community, members, rank)."""
+        selected = []
+        for level, partition in enumerate(levels):
+            groups = defaultdict(list)
+            for node, community in enumerate(partition):
+                groups[community].append(node)
+            ranked = sorted(
+                (
+                    (c, members)
+                    for c, members in groups.items()
+                    if len(members) >= settings.COMMUNITY_MIN_SIZE
+                ),
+                key=lambda item: len(item[1]),
+                reverse=True,
+            )[: settings.COMMUNITY_MAX_PER_LEVEL]
+            if not ranked:
+                continue
+            largest = len(ranked[0][1])
+            selected.extend(
+                (level, c, members, len(members) / largest) for c, members in ranked
+            )
+        return selected
+
+    def _describe(self, members, entities, edges, index) -> str:
+        """Entities and strongest internal relationships, within the token budget."""
+        budget = settings.COMMUNITY_REPORT_MAX_TOKENS
+        member_set = set(members)
+        lines = ["Entities:"]
+        for i in members:
+            lines.append(f"- {entities[i]['name']} ({entities[i]['type']})")
+        lines.append("Relationships:")
+        internal = sorted(
+            (
+                e
+                for e in edges
+                if index.get(e["source_id"]) in member_set
+                and index.get(e["target_id"]) in member_set
+            ),
+            key=lambda e: e["confidence"] or 0.0,
+            reverse=True,
+        )
+        for e in internal:
+            lines.append(
+                f"- {entities[index[e['source_id']]]['name']} -[{e['type']}]-> "
+                f"{entities[index[e['target_id']]]['name']}"
+            )
+
+        text, used = [], 0
+        for line in lines:
+            used += estimate_tokens(line)
+            if used > budget:
+                break
+            text.append(line)
+        return "\n".join(text)
+
+    async def _save(self, chat_id, rows):
+        async with SessionLocal() as db:
+            await db.execute(
+                delete(CommunitySummaryModel).where(
+                    CommunitySummaryModel.chat_id == chat_id
+                )
+            )
+            db.add_all(rows)
+            await db.commit()
+
+    def close(self):
+        self.client.close()
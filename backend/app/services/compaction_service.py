@@ -0,0 +1,369 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from app.db.neo4j import Neo4jClient
+from app.db.qdrant import QdrantDBClient
+from app.db.session import SessionLocal
+from app.db.queries.graph import (
+    DELETE_CHAT_RELATIONSHIPS_QUERY,
+    DELETE_CHAT_ENTITIES_QUERY,
+    DELETE_CHUNK_RELATIONSHIPS_QUERY,
+    DELETE_ORPHAN_CHUNK_ENTITIES_QUERY,
+    PRUNE_CHUNK_RELATIONSHIPS_QUERY,
+    PRUNE_CHUNK_ENTITIES_QUERY,
+    CLEAR_NEIGHBOURHOODS_QUERY,
+)
+from app.models.chat import (
+    Chat as ChatModel,
+    Document as DocumentModel,
+    CommunitySummary as CommunitySummaryModel,
+)
+from app.schemas.compaction import CompactionReport
+from app.core import events
+from app.core.constants import ChatStatus, DocumentStatus
+from app.core.coordination import get_coordinator
+from app.core.config import settings
+from app.core.tracing import instrument
+from sqlalchemy import delete, select
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Batched transactions committed per delete round before pausing
+TRANSACTIONS_PER_ROUND = 10
+
+
+@instrument
+class CompactionService:
+    """Reclaims vectors and graph data left behind by deleted chats and failed documents."""
+
+    def __init__(
+        self,
+        batch_size: int = settings.COMPACTION_BATCH_SIZE,
+        batch_pause: float = settings.COMPACTION_BATCH_PAUSE_SECONDS,
+        grace_seconds: int = settings.COMPACTION_GRACE_SECONDS,
+    ):
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.grace_seconds = grace_seconds
+        self.qdrant = QdrantDBClient()
+        self.neo4j = Neo4jClient()
+
+    def _get_collection_name(self, chat_id) -> str:
+        return f"chat_{chat_id}"
+
+    async def run(self) -> CompactionReport:
+        """Run one compaction pass and return what was reclaimed."""
+        report = CompactionReport()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.grace_seconds)
+
+        async with SessionLocal() as db:
+            chats = (
+                (
+                    await db.execute(
+                        select(ChatModel).where(
+                            ChatModel.status == ChatStatus.DELETED,
+                            ChatModel.updated_at < cutoff,
+                        )
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            documents = (
+                (
+                    await db.execute(
+                        select(DocumentModel)
+                        .join(ChatModel)
+                        .where(
+                            DocumentModel.status == DocumentStatus.FAILED,
+                            DocumentModel.updated_at < cutoff,
+                            ChatModel.status != ChatStatus.PURGED,
+                        )
+                    )
+                )
+                .scalars()
+                .all()
+            )
+
+            purged_chat_ids = set()
+            for chat in chats:
+                try:
+                    await self.purge_chat(chat.id, report)
+                    chat.status = ChatStatus.PURGED
+                    await db.commit()
+                    purged_chat_ids.add(chat.id)
+                    report.chats_purged += 1
+                except Exception as e:
+                    await db.rollback()
+                    logger.error(f"Failed to purge chat {chat.id}: {e}")
+                    report.errors.append(f"chat {chat.id}: {e}")
+
+            for doc in documents:
+                if doc.chat_id in purged_chat_ids:
+                    # Already reclaimed together with its chat
+                    doc.status = DocumentStatus.PURGED
+                    await db.commit()
+                    continue
+                try:
+                    await self.purge_document(doc.chat_id, doc.id, report)
+                    doc.status = DocumentStatus.PURGED
+                    await db.commit()
+                    report.documents_purged += 1
+                except Exception as e:
+                    await db.rollback()
+                    logger.error(f"Failed to purge document {doc.id}: {e}")
+                    report.errors.append(f"document {doc.id}: {e}")
+
+        report.finished_at = datetime.now()
+        logger.info(
+            f"🧹 Compaction reclaimed {report.bytes_reclaimed} bytes, "
+            f"{report.nodes_deleted} nodes, {report.relationships_deleted} relationships "
+            f"({report.chats_purged} chats, {report.documents_purged} documents)"
+        )
+        return report
+
+    async def purge_chat(self, chat_id, report: CompactionReport):
+        """Drop the chat's Qdrant collection and every graph element it owns."""
+        collection_name = self._get_collection_name(chat_id)
+        if await asyncio.to_thread(
+            self.qdrant.client.collection_exists, collection_name
+        ):
+            count, _, payload_bytes = await self._scan_points(collection_name)
+            dim = await asyncio.to_thread(self._vector_size, collection_name)
+            await asyncio.to_thread(
+                self.qdrant.client.delete_collection, collection_name
+            )
+            report.points_deleted += count
+            report.vector_bytes_reclaimed += count * dim * 4
+            report.payload_bytes_reclaimed += payload_bytes
+
+        params = {"chat_id": str(chat_id)}
+        report.relationships_deleted += await self._delete_in_batches(
+            DELETE_CHAT_RELATIONSHIPS_QUERY, params, "relationships_deleted"
+        )
+        report.nodes_deleted += await self._delete_in_batches(
+            DELETE_CHAT_ENTITIES_QUERY, params, "nodes_deleted"
+        )
+        async with SessionLocal() as db:
+            await db.execute(
+                delete(CommunitySummaryModel).where(
+                    CommunitySummaryModel.chat_id == chat_id
+                )
+            )
+            await db.commit()
+        events.publish(events.GRAPH_CHANGED, chat_id=chat_id)
+
+    async def purge_document(self, chat_id, document_id, report: CompactionReport):
+        """Remove the points and graph elements written by a failed document."""
+        collection_name = self._get_collection_name(chat_id)
+        chunk_ids = []
+        if await asyncio.to_thread(
+            self.qdrant.client.collection_exists, collection_name
+        ):
+            # qdrant_client is imported where used; it takes over a second
+            from qdrant_client.models import (
+                FieldCondition,
+                Filter,
+                FilterSelector,
+                MatchValue,
+            )
+
+            report.points_reassigned += await self._release_aliases(
+                collection_name, document_id
+            )
+            document_filter = Filter(
+                must=[
+                    FieldCondition(
+                        key="document_id", match=MatchValue(value=str(document_id))
+                    )
+                ]
+            )
+            count, chunk_ids, payload_bytes = await self._scan_points(
+                collection_name, document_filter
+            )
+            if count:
+                dim = await asyncio.to_thread(self._vector_size, collection_name)
+                await asyncio.to_thread(
+                    self.qdrant.client.delete,
+                    collection_name=collection_name,
+                    points_selector=FilterSelector(filter=document_filter),
+                )
+                report.points_deleted += count
+                report.vector_bytes_reclaimed += count * dim * 4
+                report.payload_bytes_reclaimed += payload_bytes
+
+        if not chunk_ids:
+            return
+
+        params = {"chat_id": str(chat_id), "chunk_ids": chunk_ids}
+        report.relationships_deleted += await self._delete_in_batches(
+            DELETE_CHUNK_RELATIONSHIPS_QUERY, params, "relationships_deleted"
+        )
+        # Entities first seen in this document survive if other documents link to them
+        report.nodes_deleted += await self._delete_in_batches(
+            DELETE_ORPHAN_CHUNK_ENTITIES_QUERY, params, "nodes_deleted"
+        )
+        # Survivors must not point provenance at the deleted points
+        await self._delete_in_batches(
+            PRUNE_CHUNK_RELATIONSHIPS_QUERY, params, "properties_set"
+        )
+        await self._delete_in_batches(
+            PRUNE_CHUNK_ENTITIES_QUERY, params, "properties_set"
+        )
+        # Digests may cite the removed relationships; they rebuild on next lookup
+        await asyncio.to_thread(self._clear_neighbourhoods, chat_id)
+        events.publish(events.GRAPH_CHANGED, chat_id=chat_id)
+
+    def _clear_neighbourhoods(self, chat_id):
+        with self.neo4j.driver.session() as session:
+            session.run(CLEAR_NEIGHBOURHOODS_QUERY, chat_id=str(chat_id)).consume()
+
+    async def _release_aliases(self, collection_name: str, document_id) -> int:
+        """
+        Drop the document's entries from alias lists, and hand its points that
+        other documents alias over to the first of them instead of deleting
+        them; returns how many points were handed over.
+        """
+        from qdrant_client.models import (
+            FieldCondition,
+            Filter,
+            IsEmptyCondition,
+            MatchValue,
+            PayloadField,
+        )
+
+        document_id = str(document_id)
+        async with get_coordinator().lock(f"qdrant:aliases:{collection_name}"):
+            listing = await self._scroll_all(
+                collection_name,
+                Filter(
+                    must=[
+                        FieldCondition(
+                            key="aliases[].document_id",
+                            match=MatchValue(value=document_id),
+                        )
+                    ]
+                ),
+            )
+            for point in listing:
+                entries = [
+                    e
+                    for e in point.payload["aliases"]
+                    if e["document_id"] != document_id
+                ]
+                await asyncio.to_thread(
+                    self.qdrant.client.set_payload,
+                    collection_name=collection_name,
+                    payload={"aliases": entries},
+                    points=[point.id],
+                )
+            aliased = await self._scroll_all(
+                collection_name,
+                Filter(
+                    must=[
+                        FieldCondition(
+                            key="document_id", match=MatchValue(value=document_id)
+                        )
+                    ],
+                    must_not=[IsEmptyCondition(is_empty=PayloadField(key="aliases"))],
+                ),
+            )
+            for point in aliased:
+                heir, *rest = point.payload["aliases"]
+                await asyncio.to_thread(
+                    self.qdrant.client.set_payload,
+                    collection_name=collection_name,
+                    payload={"document_id": heir["document_id"], "aliases": rest},
+                    points=[point.id],
+                )
+        return len(aliased)
+
+    async def _scroll_all(self, collection_name: str, scroll_filter) -> list:
+        """Every point matching the filter, with its alias list."""
+        points = []
+        offset = None
+        while True:
+            page, offset = await asyncio.to_thread(
+                self.qdrant.client.scroll,
+                collection_name=collection_name,
+                scroll_filter=scroll_filter,
+                limit=self.batch_size,
+                offset=offset,
+                with_payload=["aliases"],
+                with_vectors=False,
+            )
+            points.extend(page)
+            if offset is None:
+                return points
+
+    def _vector_size(self, collection_name: str) -> int:
+        info = self.qdrant.client.get_collection(collection_name)
+        return info.config.params.vectors.size
+
+    async def _scan_points(self, collection_name: str, scroll_filter=None):
+        """Page through points without vectors to count them and size their payloads."""
+        count = 0
+        chunk_ids = []
+        payload_bytes = 0
+        offset = None
+        while True:
+            points, offset = await asyncio.to_thread(
+                self.qdrant.client.scroll,
+                collection_name=collection_name,
+                scroll_filter=scroll_filter,
+                limit=self.batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            for point in points:
+                count += 1
+                chunk_ids.append(str(point.id))
+                payload_bytes += len(json.dumps(point.payload or {}).encode("utf-8"))
+            if offset is None:
+                break
+            await asyncio.sleep(self.batch_pause)
+        return count, chunk_ids, payload_bytes
+
+    async def _delete_in_batches(self, query: str, params: dict, counter: str) -> int:
+        """Repeat a bounded delete until nothing is left, pausing between rounds."""
+        limit = self.batch_size * TRANSACTIONS_PER_ROUND
+        total = 0
+        while True:
+            deleted, removed = await asyncio.to_thread(
+                self._run_delete, query, params, counter, limit
+            )
+            total += removed
+            if deleted < limit:
+                return total
+            await asyncio.sleep(self.batch_pause)
+
+    def _run_delete(self, query: str, params: dict, counter: str, limit: int):
+        # CALL { ... } IN TRANSACTIONS must run in an auto-commit transaction
+        with self.neo4j.driver.session() as session:
+            result = session.run(
+                query, limit=limit, batch_size=self.batch_size, **params
+            )
+            record = result.single()
+            summary = result.consume()
+            deleted = record["deleted"] if record else 0
+            return deleted, getattr(summary.counters, counter) or deleted
+
+    def close(self):
+        self.qdrant.close()
+        self.neo4j.close()
+
+
+async def run_compaction_loop():
+    """Periodically compact until cancelled."""
+    while True:
+        await asyncio.sleep(settings.COMPACTION_INTERVAL_SECONDS)
+        service = CompactionService()
+        try:
+            await service.run()
+        except Exception as e:
+            logger.error(f"Compaction pass failed: {e}")
+        finally:
+            service.close()
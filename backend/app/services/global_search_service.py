@@ -0,0 +1,153 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Optional
+from app.db.session import SessionLocal
+from app.db.queries.llm import GLOBAL_MAP_PROMPT, GLOBAL_REDUCE_PROMPT
+from app.models.chat import CommunitySummary as CommunitySummaryModel
+from app.services.llm_service import LLMService
+from app.core.config import settings
+from app.core.tracing import instrument
+from app.core.utils import estimate_tokens
+from sqlalchemy import select
+import logging
+
+logger = logging.getLogger(__name__)
+
+NO_ANSWER = (
+    "The document summaries do not contain enough information to answer this question."
+)
+
+
+def _parse_points(raw: str) -> list[dict]:
+    start, end = raw.find("{"), raw.rfind("}")
+    if start == -1 or end <= start:
+        return []
+    try:
+        data = json.loads(raw[start : end + 1])
+    except json.JSONDecodeError:
+        return []
+    points = []
+    for point in data.get("points") or []:
+        if not isinstance(point, dict) or not point.get("description"):
+            continue
+        try:
+            score = float(point.get("score") or 0)
+        except (TypeError, ValueError):
+            score = 0.0
+        points.append({"description": str(point["description"]), "score": score})
+    return points
+
+
+@instrument
+class GlobalSearchService:
+    """
+    Answers broad questions by map-reduce over community summaries.
+
+    At most GLOBAL_MAP_CALLS map calls plus one reduce call are made, each
+    with a bounded prompt, so the cost does not grow with the corpus.
+    """
+
+    def __init__(self, llm=None):
+        self.llm = llm or LLMService()
+        self.map_calls = settings.GLOBAL_MAP_CALLS
+        self.map_batch_tokens = settings.GLOBAL_MAP_BATCH_TOKENS
+        self.reduce_tokens = settings.GLOBAL_REDUCE_TOKENS
+
+    async def answer(self, chat_id, question: str) -> Optional[str]:
+        """Global answer, or None when the chat has no community summaries yet."""
+        summaries = await self._load_summaries(chat_id)
+        if not summaries:
+            return None
+
+        batches = self._pack(self._choose_level(summaries))
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._map, question, batch) for batch in batches),
+            return_exceptions=True,
+        )
+        points = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Global map call failed: {result}")
+                continue
+            points.extend(result)
+        return await asyncio.to_thread(self._reduce, question, points)
+
+    async def _load_summaries(self, chat_id) -> list[CommunitySummaryModel]:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(CommunitySummaryModel).where(
+                    CommunitySummaryModel.chat_id == chat_id
+                )
+            )
+            return result.scalars().all()
+
+    def _choose_level(self, summaries) -> list:
+        """Finest level whose summaries fit the map budget, else the coarsest."""
+        by_level = defaultdict(list)
+        for s in summaries:
+            by_level[s.level].append(s)
+        budget = self.map_calls * self.map_batch_tokens
+        for level in sorted(by_level):
+            rows = by_level[level]
+            if sum(estimate_tokens(self._format(s)) for s in rows) <= budget:
+                break
+        return sorted(rows, key=lambda s: s.rank, reverse=True)
+
+    @staticmethod
+    def _format(summary) -> str:
+        return f"## {summary.title}\n{summary.summary}"
+
+    def _pack(self, summaries) -> list[list[str]]:
+        """Fill up to map_calls batches by rank; lower-ranked overflow is dropped."""
+        batches, current, used = [], [], 0
+        for summary in summaries:
+            text = self._format(summary)
+            tokens = estimate_tokens(text)
+            if current and used + tokens > self.map_batch_tokens:
+                batches.append(current)
+                if len(batches) == self.map_calls:
+                    return batches
+                current, used = [], 0
+            current.append(text)
+            used += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _map(self, question: str, batch: list[str]) -> list[dict]:
+        raw = self.llm.generate(
+            GLOBAL_MAP_PROMPT
+            + "\n\nQuestion:\n"
+            + question
+            + "\n\nSummaries:\n"
+            + "\n\n".join(batch),
+            call_site="global_map",
+        )
+        return _parse_points(raw)
+
+    def _reduce(self, question: str, points: list[dict]) -> str:
+        points = sorted(
+            (p for p in points if p["score"] > 0),
+            key=lambda p: p["score"],
+            reverse=True,
+        )
+        lines, used = [], 0
+        for point in points:
+            line = f"- ({point['score']:.0f}) {point['description']}"
+            used += estimate_tokens(line)
+            if used > self.reduce_tokens:
+                break
+            lines.append(line)
+        if not lines:
+            return NO_ANSWER
+
+        return self.llm.generate(
+            GLOBAL_REDUCE_PROMPT
+            + "\n\nKey points:\n"
+            + "\n".join(lines)
+            + "\n\nQuestion:\n"
+            + question
+            + "\n\nAnswer:\n",
+            call_site="global_reduce",
+        )
@@ -1,69 +1,332 @@
 import json
-from app.db.neo4j import Neo4jClient
-from app.db.utils.graph import upsert_entity, upsert_relationship
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from app.db.neo4j import Neo4jClient, read_query
+from app.db.utils.graph import upsert_entity, upsert_relationship, build_digest
 from app.services.llm_service import LLMService
-from app.schemas.extraction import ExtractionResult
-from app.db.queries.llm import EXTRACT_ENTITIES_AND_RELATIONSHIPS_PROMPT
-from app.db.queries.graph import EXTRACT_ENTITIES_PROMPT, MATCH_QUERY
+from pydantic import ValidationError
+from app.schemas.extraction import (
+    ExtractedEntity,
+    ExtractedRelationship,
+    ExtractionResult,
+)
+from app.db.queries.llm import (
+    EXTRACT_ENTITIES_AND_RELATIONSHIPS_PROMPT,
+    EXTRACT_PACKED_PROMPT,
+    EXTRACTION_RESPONSE_FORMAT,
+    EXTRACT_PACKED_RESPONSE_FORMAT,
+)
+from app.db.queries.graph import (
+    EXTRACT_ENTITIES_PROMPT,
+    NEIGHBOURHOOD_QUERY,
+    SET_NEIGHBOURHOOD_QUERY,
+    CLEAR_NEIGHBOURHOODS_QUERY,
+    DIGEST_LOOKUP_QUERY,
+    ADJACENCY_ENTITIES_QUERY,
+    ADJACENCY_EDGES_QUERY,
+    ENTITY_NAMES_QUERY,
+)
+from app.core.config import settings
+from app.core.json_recovery import json_span, parse_json_object
 from app.core.utils import normalize_name
+from app.core.graph_cache import CSRGraph, get_graph_cache
+from app.core.entity_resolution import AliasIndex, get_alias_cache
+from app.core.metrics import EXTRACTION_PARSES, NEO4J_QUERY_SECONDS
+from app.core.tracing import instrument
 
+logger = logging.getLogger(__name__)
 
-class GraphService:
-    def __init__(self):
-        self.client = Neo4jClient()
-        self.llm_service = LLMService()  # Initialize once to avoid import deadlock
+_write_back_lock = threading.Lock()
+_write_back_executor = None
+_write_back_pending = set()  # (chat_id, entity_id) with a digest write queued
 
-    def add_entity(self, entity):
-        with self.client.driver.session() as session:
-            session.execute_write(upsert_entity, entity)
 
-    def add_relationship(self, relationship):
-        with self.client.driver.session() as session:
-            session.execute_write(upsert_relationship, relationship)
+def _digest_writer() -> ThreadPoolExecutor:
+    global _write_back_executor
+    if _write_back_executor is None:
+        with _write_back_lock:
+            if _write_back_executor is None:
+                # One writer: the write-back is best effort and must not crowd out reads
+                _write_back_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="digest-write-back"
+                )
+    return _write_back_executor
 
-    def _extract_json(self, text: str) -> str:
-        # Simple extraction of JSON from text
-        start_brace = text.find("{")
-        start_bracket = text.find("[")
 
-        start = -1
-        if start_brace != -1 and (start_bracket == -1 or start_brace < start_bracket):
-            start = start_brace
-            end = text.rfind("}")
-        elif start_bracket != -1:
-            start = start_bracket
-            end = text.rfind("]")
+@instrument
+class GraphService:
+    def __init__(
+        self, client=None, llm_service=None, graph_cache=None, alias_cache=None
+    ):
+        self.client = client or Neo4jClient()
+        # Initialize once to avoid import deadlock
+        self.llm_service = llm_service or LLMService()
+        if graph_cache is None:
+            graph_cache = get_graph_cache()
+        self.graph_cache = graph_cache or None
+        if alias_cache is None:
+            alias_cache = get_alias_cache()
+        self.alias_cache = alias_cache or None
+
+    def add_entity(self, entity) -> str:
+        """Upsert the entity; returns the entity_id stored in the graph."""
+        with NEO4J_QUERY_SECONDS.labels(operation="upsert_entity").time():
+            with self.client.driver.session() as session:
+                return session.execute_write(upsert_entity, entity)
+
+    def add_relationship(self, relationship):
+        with NEO4J_QUERY_SECONDS.labels(operation="upsert_relationship").time():
+            with self.client.driver.session() as session:
+                session.execute_write(upsert_relationship, relationship)
 
-        if start != -1 and end != -1:
-            return text[start : end + 1]
-        return text
+    def entity_names(self, chat_id) -> list[dict]:
+        """Name, normalised name, type and aliases of every entity in the chat."""
+        with NEO4J_QUERY_SECONDS.labels(operation="entity_names").time():
+            with self.client.driver.session() as session:
+                return [
+                    record.data()
+                    for record in session.run(
+                        read_query(ENTITY_NAMES_QUERY), chat_id=str(chat_id)
+                    )
+                ]
 
     def extract_entities_and_relationships(self, text: str) -> ExtractionResult:
         response = self.llm_service.generate(
-            EXTRACT_ENTITIES_AND_RELATIONSHIPS_PROMPT + "\n\nText:\n" + text
+            EXTRACT_ENTITIES_AND_RELATIONSHIPS_PROMPT + "\n\nText:\n" + text,
+            call_site="extract",
+            response_format=EXTRACTION_RESPONSE_FORMAT,
         )
+        data = self._parse_reply(response, "single", ("entities", "relationships"))
+        return self._extraction_result(data)
 
-        data = json.loads(self._extract_json(response))
+    def extract_packed(self, texts: list[str]) -> dict[int, ExtractionResult]:
+        """
+        Extract from several chunks in one request. Results are keyed by
+        position in `texts`; chunks missing from the reply or malformed in it
+        are left out so the caller can retry them on their own.
+        """
+        prompt = EXTRACT_PACKED_PROMPT + "".join(
+            f"\n\n### Chunk {i + 1}\n{text}" for i, text in enumerate(texts)
+        )
+        response = self.llm_service.generate(
+            prompt, call_site="extract", response_format=EXTRACT_PACKED_RESPONSE_FORMAT
+        )
+        # A cut-off reply still yields the chunks completed before the cut
+        data = self._parse_reply(response, "packed", ("chunks",))
+        items = data.get("chunks")
+
+        results = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict) or not all(
+                isinstance(item.get(key, []), list)
+                for key in ("entities", "relationships")
+            ):
+                continue
+            try:
+                position = int(item.get("chunk")) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= position < len(texts) and position not in results:
+                results[position] = self._extraction_result(item)
+        return results
 
-        return ExtractionResult(**data)
+    @staticmethod
+    def _parse_reply(response: str, prompt: str, array_keys) -> dict:
+        data, result = parse_json_object(response, array_keys)
+        EXTRACTION_PARSES.labels(prompt=prompt, result=result).inc()
+        if data is None:
+            raise ValueError(f"Unparseable {prompt} extraction reply")
+        return data
+
+    @staticmethod
+    def _extraction_result(data: dict) -> ExtractionResult:
+        """The well-formed entities and relationships of a parsed reply."""
+        return ExtractionResult(
+            entities=_valid_items(ExtractedEntity, data.get("entities")),
+            relationships=_valid_items(
+                ExtractedRelationship, data.get("relationships")
+            ),
+        )
 
-    def retrieve(self, chat_id, entity_names, depth: int = 2):
-        query = MATCH_QUERY.format(depth)
+    def refresh_neighbourhoods(self, chat_id, entity_ids) -> list[dict]:
+        """Recompute and store the neighbourhood digests of the given entities."""
+        digests = self.build_neighbourhoods(chat_id, entity_ids)
+        self.store_neighbourhoods(chat_id, digests)
+        return digests
 
+    def build_neighbourhoods(self, chat_id, entity_ids) -> list[dict]:
+        """Neighbourhood digests of the given entities, computed without storing them."""
+        entity_ids = list(dict.fromkeys(str(e) for e in entity_ids))
+        batch_size = settings.GRAPH_DIGEST_BATCH_SIZE
+        digests = []
+        for start in range(0, len(entity_ids), batch_size):
+            batch = entity_ids[start : start + batch_size]
+            with NEO4J_QUERY_SECONDS.labels(operation="build_digest").time():
+                with self.client.driver.session() as session:
+                    records = session.run(
+                        read_query(NEIGHBOURHOOD_QUERY),
+                        chat_id=str(chat_id),
+                        entity_ids=batch,
+                        top_k=settings.GRAPH_DIGEST_TOP_K,
+                    )
+                    digests.extend(build_digest(record) for record in records)
+        return digests
+
+    def store_neighbourhoods(self, chat_id, digests):
+        batch_size = settings.GRAPH_DIGEST_BATCH_SIZE
+        updated_at = datetime.utcnow().isoformat()
+        for start in range(0, len(digests), batch_size):
+            batch = digests[start : start + batch_size]
+            with NEO4J_QUERY_SECONDS.labels(operation="store_digest").time():
+                with self.client.driver.session() as session:
+                    session.run(
+                        SET_NEIGHBOURHOOD_QUERY,
+                        chat_id=str(chat_id),
+                        rows=[
+                            {"entity_id": d["entity_id"], "digest": json.dumps(d)}
+                            for d in batch
+                        ],
+                        updated_at=updated_at,
+                    ).consume()
+
+    def _write_back(self, chat_id, digests):
+        """Store digests built on the read path without making the reader wait."""
+        keys = {(str(chat_id), d["entity_id"]) for d in digests}
+        with _write_back_lock:
+            keys -= _write_back_pending
+            _write_back_pending.update(keys)
+        digests = [d for d in digests if (str(chat_id), d["entity_id"]) in keys]
+        if digests:
+            _digest_writer().submit(self._store_pending, chat_id, digests, keys)
+
+    def _store_pending(self, chat_id, digests, keys):
+        try:
+            self.store_neighbourhoods(chat_id, digests)
+        except Exception as e:
+            # The next lookup rebuilds them
+            logger.warning(f"⚠️ Digest write-back for chat {chat_id} failed: {e}")
+        finally:
+            with _write_back_lock:
+                _write_back_pending.difference_update(keys)
+
+    def clear_neighbourhoods(self, chat_id):
+        """Drop a chat's digests; they are rebuilt lazily on the next lookup."""
         with self.client.driver.session() as session:
-            result = session.run(
-                query,
-                chat_id=str(chat_id),
-                names=[normalize_name(n) for n in entity_names],
+            session.run(CLEAR_NEIGHBOURHOODS_QUERY, chat_id=str(chat_id)).consume()
+
+    def retrieve(self, chat_id, entity_names) -> list[dict]:
+        """
+        Neighbourhood digests of the named entities, expanded through their
+        neighbours for GRAPH_RETRIEVE_HOPS hops and capped at
+        GRAPH_RETRIEVE_MAX_DIGESTS.
+        """
+        graph = None
+        if self.graph_cache is not None:
+            graph = self.graph_cache.get(chat_id, lambda: self._load_graph(chat_id))
+
+        names = [normalize_name(n) for n in entity_names]
+        if self.alias_cache is not None:
+            # "Open AI" in a question finds the entity stored as "OpenAI"
+            aliases = self.alias_cache.get(
+                chat_id, lambda: AliasIndex(self.entity_names(chat_id))
+            )
+            names = [aliases.canonical(n) for n in names]
+        if graph is not None:
+            return graph.expand(
+                names,
+                max(settings.GRAPH_RETRIEVE_HOPS, 1),
+                settings.GRAPH_DIGEST_TOP_K,
+                settings.GRAPH_DIGEST_MAX_CHUNKS,
+                settings.GRAPH_RETRIEVE_MAX_DIGESTS,
             )
-            return list(result)
+
+        digests, seen_ids, seen_names = [], set(), set()
+        for _ in range(max(settings.GRAPH_RETRIEVE_HOPS, 1)):
+            names = [n for n in dict.fromkeys(names) if n not in seen_names]
+            if not names:
+                break
+            seen_names.update(names)
+            found = self._lookup_digests(chat_id, names)
+
+            names = []
+            for digest in found:
+                if digest["entity_id"] in seen_ids:
+                    continue
+                seen_ids.add(digest["entity_id"])
+                digests.append(digest)
+                if len(digests) >= settings.GRAPH_RETRIEVE_MAX_DIGESTS:
+                    return digests
+                names.extend(normalize_name(f["name"]) for f in digest["facts"])
+        return digests
+
+    def _load_graph(self, chat_id) -> CSRGraph:
+        with NEO4J_QUERY_SECONDS.labels(operation="adjacency_export").time():
+            with self.client.driver.session() as session:
+                entities = [
+                    r.data()
+                    for r in session.run(
+                        read_query(ADJACENCY_ENTITIES_QUERY), chat_id=str(chat_id)
+                    )
+                ]
+                edges = [
+                    r.data()
+                    for r in session.run(
+                        read_query(ADJACENCY_EDGES_QUERY), chat_id=str(chat_id)
+                    )
+                ]
+        return CSRGraph(entities, edges)
+
+    def _lookup_digests(self, chat_id, names_normalized) -> list[dict]:
+        """
+        Stored digests by normalized name. Missing ones are built in memory and
+        written back in the background, so a chat read never waits on a write.
+        """
+        with NEO4J_QUERY_SECONDS.labels(operation="digest_lookup").time():
+            with self.client.driver.session() as session:
+                records = list(
+                    session.run(
+                        read_query(DIGEST_LOOKUP_QUERY),
+                        chat_id=str(chat_id),
+                        names=list(names_normalized),
+                    )
+                )
+
+        digests = []
+        missing = []
+        for record in records:
+            if record["neighbourhood"]:
+                digests.append(json.loads(record["neighbourhood"]))
+            else:
+                missing.append(record["entity_id"])
+        # Entities written before digests existed (or cleared by compaction)
+        if missing:
+            built = self.build_neighbourhoods(chat_id, missing)
+            self._write_back(chat_id, built)
+            digests.extend(built)
+        return digests
 
     def parse(self, question: str):
         raw = self.llm_service.generate(
-            EXTRACT_ENTITIES_PROMPT + "\n\nQuestion:\n" + question
+            EXTRACT_ENTITIES_PROMPT + "\n\nQuestion:\n" + question,
+            call_site="parse",
         )
-        data = json.loads(self._extract_json(raw))
+        data = json.loads(json_span(raw))
         return data
 
     def close(self):
         self.client.close()
+
+
+def _valid_items(model, items) -> list:
+    """Items that validate as `model`; anything malformed is dropped."""
+    valid = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            valid.append(model(**item))
+        except ValidationError:
+            continue
+    return valid
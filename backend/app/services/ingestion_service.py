@@ -1,5 +1,6 @@
 import asyncio
 import time
+from datetime import datetime
 from app.services.vector_service import VectorService
 from app.services.graph_service import GraphService
 from app.schemas.chunk import Chunk
@@ -8,17 +9,45 @@ from app.schemas.relationship import Relationship
 from app.db.session import SessionLocal
 from app.models.chat import Document as DocumentModel
 from sqlalchemy import select
-from app.core.utils import chunk_text_semantic
+from app.core import events
+from app.core.coordination import get_coordinator
+from app.core.entity_resolution import EntityResolver
+from app.core.extraction_gate import ExtractionGate
+from app.core.near_duplicates import NearDuplicateIndex, signature
+from app.core.config import settings
+from app.core.tokens import chunk_sizes
+from app.core.uploads import iter_text
+from app.core.utils import (
+    chunk_text_semantic,
+    iter_chunks_semantic,
+    iter_extraction_windows,
+    iter_paragraph_spans,
+    normalize_name,
+)
+from app.core.metrics import (
+    EXTRACTION_REQUESTS,
+    INGESTION_CHUNK_SECONDS,
+    INGESTION_CHUNKS,
+    INGESTION_DOCUMENTS_IN_PROGRESS,
+    INGESTION_QUEUE_DEPTH,
+)
+from app.core.tracing import instrument, traced
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+@instrument
 class IngestionService:
-    def __init__(self, max_workers=10):  # Increased from 3 to 10 for faster processing
+    def __init__(
+        self, max_workers=10, vector=None, graph=None, coordinator=None
+    ):  # Increased from 3 to 10 for faster processing
         self.max_workers = max_workers
-        self.vector = VectorService()
-        self.graph = GraphService()
+        self.coordinator = coordinator or get_coordinator()
+        self.embed_batch_size = settings.INGEST_EMBED_BATCH_SIZE
+        self.embed_workers = settings.INGEST_EMBED_WORKERS
+        self.vector = vector or VectorService()
+        self.graph = graph or GraphService()
         print(
             f"✓ IngestionService initialized with {self.max_workers} parallel workers"
         )
@@ -34,16 +63,98 @@ class IngestionService:
         file_name: str = "unknown",
         file_size: int = 0,
         timeout_seconds: float = 300.0,
+    ):
+        sizes = chunk_sizes()
+        chunks = await asyncio.to_thread(chunk_text_semantic, text, **sizes)
+        return await self._ingest_with_timeout(
+            chat_id,
+            document_id,
+            self._windows(chunks, sizes),
+            file_name,
+            file_size,
+            "",
+            timeout_seconds,
+        )
+
+    async def ingest_file(
+        self,
+        chat_id,
+        document_id,
+        path: str,
+        file_name: str = "unknown",
+        file_size: int = 0,
+        checksum: str = "",
+        timeout_seconds: float = 300.0,
+    ):
+        """Ingest a spooled upload, chunking it as it is read from disk."""
+        sizes = chunk_sizes()
+        chunks = self._stream_chunks(path, file_name, file_size, sizes)
+        return await self._ingest_with_timeout(
+            chat_id,
+            document_id,
+            self._windows(chunks, sizes),
+            file_name,
+            file_size,
+            checksum,
+            timeout_seconds,
+        )
+
+    @staticmethod
+    def _stream_chunks(path, file_name, file_size, sizes):
+        # The file size stands in for the text length in position_ratio
+        return iter_chunks_semantic(
+            iter_paragraph_spans(iter_text(path, file_name)),
+            total_chars=file_size,
+            **sizes,
+        )
+
+    def _windows(self, chunks, sizes):
+        """
+        Chunks grouped into extraction windows of EXTRACT_WINDOW_TOKENS, at
+        most one embedding batch each. The extraction gate marks chunks with
+        nothing worth extracting as embed-only, and each chunk gets the MinHash
+        signature near-duplicates are found by.
+        """
+        windows = iter_extraction_windows(
+            chunks,
+            settings.EXTRACT_WINDOW_TOKENS,
+            sizes["overlap"],
+            max_chunks=self.embed_batch_size,
+            gate=ExtractionGate(),
+        )
+        if settings.NEAR_DUPLICATE_THRESHOLD <= 0:
+            return windows
+        return self._signed(windows)
+
+    @staticmethod
+    def _signed(windows):
+        for window in windows:
+            for chunk in window["chunks"]:
+                chunk["metadata"]["minhash"] = signature(chunk["content"])
+            yield window
+
+    async def _ingest_with_timeout(
+        self,
+        chat_id,
+        document_id,
+        windows,
+        file_name,
+        file_size,
+        checksum,
+        timeout_seconds,
     ):
         start_time = time.time()
         logger.info(f"Starting parallel ingestion for document {document_id}")
 
         try:
             # Run async ingestion with timeout
-            result = await asyncio.wait_for(
-                self._ingest_async(chat_id, document_id, text, file_name, file_size),
-                timeout=timeout_seconds,
-            )
+            with INGESTION_DOCUMENTS_IN_PROGRESS.track_inprogress():
+                result = await asyncio.wait_for(
+                    self._ingest_owned(
+                        chat_id, document_id, windows, file_name, file_size, checksum
+                    ),
+                    timeout=timeout_seconds,
+                )
 
             end_time = time.time()
             logger.info(
@@ -54,83 +165,447 @@ class IngestionService:
         except asyncio.TimeoutError:
             logger.error(f"Ingestion timed out after {timeout_seconds} seconds")
             await self._update_status(document_id, "failed")
+            # Chunks that finished before the timeout already wrote to the graph
+            events.publish(events.GRAPH_CHANGED, chat_id=chat_id)
             raise Exception(f"Ingestion timed out after {timeout_seconds} seconds")
         except Exception as e:
             logger.error(f"Ingestion failed: {e}")
             await self._update_status(document_id, "failed")
+            events.publish(events.GRAPH_CHANGED, chat_id=chat_id)
             raise
 
-    async def _ingest_async(self, chat_id, document_id, text, file_name, file_size):
-        """Main async ingestion logic with parallel chunk processing."""
-        await self._save_document_metadata(document_id, chat_id, file_name, file_size)
+    async def _ingest_owned(
+        self, chat_id, document_id, windows, file_name, file_size, checksum
+    ):
+        """Ingest while owning the document, unless its content is already in the chat."""
+        async with self.coordinator.lock(
+            self._ownership_key(chat_id, document_id, checksum)
+        ):
+            if await self._skip_duplicate(
+                chat_id, document_id, file_name, file_size, checksum
+            ):
+                return True
+            return await self._ingest_async(
+                chat_id, document_id, windows, file_name, file_size, checksum
+            )
+
+    @staticmethod
+    def _ownership_key(chat_id, document_id, checksum) -> str:
+        # Uploads of the same file share the checksum, not the document id
+        return f"ingest:{chat_id}:{checksum or document_id}"
+
+    async def _skip_duplicate(
+        self, chat_id, document_id, file_name, file_size, checksum
+    ) -> bool:
+        """Record the document as a duplicate when another one already holds its content."""
+        if not checksum:
+            return False
+        original_id = await self._find_duplicate(chat_id, checksum, document_id)
+        if original_id is None:
+            return False
+        logger.info(
+            f"♻️ {file_name} is already ingested as document {original_id}; skipping"
+        )
+        await self._save_document_metadata(
+            document_id, chat_id, file_name, file_size, checksum
+        )
+        await self._update_status(document_id, "duplicate")
+        return True
+
+    @traced("IngestionService._ingest_async")
+    async def _ingest_async(
+        self, chat_id, document_id, windows, file_name, file_size, checksum=""
+    ):
+        """
+        Main async ingestion logic with parallel chunk processing.
+
+        `windows` is an iterator of extraction windows (see
+        iter_extraction_windows), pulled in a worker thread as slots free up,
+        so only a bounded read-ahead of chunks is held in memory.
+        """
+        await self._save_document_metadata(
+            document_id, chat_id, file_name, file_size, checksum
+        )
 
-        chunks_with_metadata = chunk_text_semantic(text)
-        total_chunks = len(chunks_with_metadata)
         logger.info("\n" + "=" * 60)
         logger.info(f"📄 Document: {file_name}")
-        logger.info(f"📊 Total chunks: {total_chunks}")
         logger.info(f"⚙️  Max workers: {self.max_workers}")
         logger.info("🚀 Starting parallel processing...")
         logger.info("=" * 60 + "\n")
 
         # Process chunks in parallel with concurrency limit
         semaphore = asyncio.Semaphore(self.max_workers)
-        self._total_chunks = chunks_with_metadata  # Store for progress tracking
-        tasks = [
-            self._process_chunk_async(semaphore, chat_id, document_id, chunk_data, i)
-            for i, chunk_data in enumerate(chunks_with_metadata)
-        ]
-
+        dedup = NearDuplicateIndex()
+        # Windows read ahead of a free worker are bounded
+        read_ahead = asyncio.Semaphore(self.max_workers * 2)
+        tasks = []
+        try:
+            while True:
+                await read_ahead.acquire()
+                window_data = await asyncio.to_thread(next, windows, None)
+                if window_data is None:
+                    break
+                task = asyncio.create_task(
+                    self._process_window_async(
+                        semaphore,
+                        chat_id,
+                        document_id,
+                        window_data,
+                        len(tasks),
+                        None,
+                        dedup,
+                    )
+                )
+                task.add_done_callback(lambda _: read_ahead.release())
+                tasks.append(task)
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        except BaseException:
+            # Timed out or failed while reading; stop the chunks in flight
+            for task in tasks:
+                task.cancel()
+            raise
+        total_chunks = sum(
+            r.get("chunks", 1) if isinstance(r, dict) else 0 for r in results
+        )
         logger.info(
-            f"⏳ Processing {total_chunks} chunks with up to {self.max_workers} parallel workers..."
+            f"✓ All {total_chunks} chunks processed in {len(tasks)} extraction windows!\n"
         )
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        logger.info("✓ All chunks processed!\n")
+        await self._link_aliases(chat_id, dedup)
 
-        # Collect all entities and build global entity map
         global_entity_map = {}
-        all_chunk_results = []
+        all_chunk_results = self._collect_results(
+            results, document_id, global_entity_map
+        )
+
+        logger.info("\n📈 RESULTS:")
+        logger.info(f"  • Total unique entities: {len(global_entity_map)}")
+        logger.info(
+            f"  • Successfully processed chunks: {len(all_chunk_results)}/{total_chunks}"
+        )
+        await self._write_graph(chat_id, global_entity_map, all_chunk_results)
+
+        await self._update_status(document_id, "completed")
+        events.publish(
+            events.DOCUMENT_INGESTED, chat_id=chat_id, document_id=document_id
+        )
+        logger.info("\n" + "=" * 60)
+        logger.info("✅ INGESTION COMPLETE!")
+        logger.info("=" * 60 + "\n")
+        return True
+
+    @traced("IngestionService.ingest_batch")
+    async def ingest_batch(self, chat_id, documents, progress):
+        """
+        Ingest many documents through one shared pipeline.
+
+        Chunking, embedding (in batches of INGEST_EMBED_BATCH_SIZE), extraction
+        (sharing max_workers slots) and graph writes overlap across documents.
+        Documents that finish while a graph write runs are merged into the next
+        one, so entities shared by them are upserted once. `progress` is a
+        BatchIngestionStatus updated in place.
+        """
+        semaphore = asyncio.Semaphore(self.max_workers)
+        # Each document in flight holds a lock connection until it is settled
+        in_flight = asyncio.Semaphore(settings.INGEST_BATCH_CONCURRENT_DOCUMENTS)
+        dedup = NearDuplicateIndex()
+        embed_queue = asyncio.Queue()
+        finished = asyncio.Queue()
+        INGESTION_DOCUMENTS_IN_PROGRESS.inc(len(documents))
+
+        # Documents hold their ownership lock until the graph writer settles them
+        settled = {}
+
+        def settle(document):
+            done = settled.pop(document.document_id, None)
+            if done is not None and not done.done():
+                done.set_result(None)
+
+        def fail(document, error):
+            progress.documents_failed += 1
+            progress.errors.append(f"{document.file_name}: {error}")
+            INGESTION_DOCUMENTS_IN_PROGRESS.dec()
+            settle(document)
+
+        async def embed_worker():
+            while True:
+                batch = [await embed_queue.get()]
+                while len(batch) < self.embed_batch_size and not embed_queue.empty():
+                    batch.append(embed_queue.get_nowait())
+                try:
+                    await asyncio.to_thread(
+                        self.vector.upsert_chunks, [chunk for chunk, _ in batch]
+                    )
+                    progress.chunks_embedded += len(batch)
+                except Exception as e:
+                    logger.warning(f"Vector upsert failed for {len(batch)} chunks: {e}")
+                for _, done in batch:
+                    done.set_result(None)
+
+        async def run_document(document):
+            key = self._ownership_key(chat_id, document.document_id, document.checksum)
+            try:
+                async with in_flight, self.coordinator.lock(key):
+                    await ingest_document(document)
+            except Exception as e:
+                logger.error(f"❌ Batch document {document.file_name} failed: {e}")
+                await self._update_status(document.document_id, "failed")
+                fail(document, e)
+
+        async def ingest_document(document):
+            if await self._skip_duplicate(
+                chat_id,
+                document.document_id,
+                document.file_name,
+                document.file_size,
+                document.checksum,
+            ):
+                progress.documents_completed += 1
+                INGESTION_DOCUMENTS_IN_PROGRESS.dec()
+                return
+            await self._save_document_metadata(
+                document.document_id,
+                chat_id,
+                document.file_name,
+                document.file_size,
+                document.checksum,
+            )
+            sizes = chunk_sizes()
+            if document.path:
+                chunks_data = await asyncio.to_thread(
+                    list,
+                    self._stream_chunks(
+                        document.path, document.file_name, document.file_size, sizes
+                    ),
+                )
+            else:
+                chunks_data = await asyncio.to_thread(
+                    chunk_text_semantic, document.text, **sizes
+                )
+            progress.chunks_total += len(chunks_data)
+            windows = [
+                (
+                    [
+                        self._build_chunk(chat_id, document.document_id, chunk_data)
+                        for chunk_data in window_data["chunks"]
+                    ],
+                    window_data["texts"],
+                )
+                for window_data in await asyncio.to_thread(
+                    list, self._windows(chunks_data, sizes)
+                )
+            ]
+            chunks = [chunk for window_chunks, _ in windows for chunk in window_chunks]
+            # One lookup for the whole document
+            aliased = await self._resolve_aliases(dedup, chat_id, chunks)
+            if aliased:
+                windows = [
+                    (window_chunks, self._alias_texts(window_chunks, texts, aliased))
+                    for window_chunks, texts in windows
+                ]
+                # Aliases reuse their original's vector
+                progress.chunks_embedded += len(aliased)
+            embedded = []
+            for chunk in chunks:
+                if chunk.id in aliased:
+                    continue
+                done = asyncio.get_running_loop().create_future()
+                embed_queue.put_nowait((chunk, done))
+                embedded.append(done)
+
+            async def extract(window_chunks, texts, index):
+                result = await self._run_in_worker(
+                    semaphore,
+                    self._extract_window(window_chunks, texts, index, len(windows)),
+                )
+                progress.chunks_extracted += len(window_chunks)
+                return result
+
+            results = await asyncio.gather(
+                *(
+                    extract(window_chunks, texts, i)
+                    for i, (window_chunks, texts) in enumerate(windows)
+                ),
+                return_exceptions=True,
+            )
+            await asyncio.gather(*embedded)
+            done = asyncio.get_running_loop().create_future()
+            settled[document.document_id] = done
+            await finished.put((document, results))
+            # Returns early if the writer itself died
+            await asyncio.wait([done, writer], return_when=asyncio.FIRST_COMPLETED)
+
+        async def graph_writer():
+            done = False
+            while not done:
+                group = [await finished.get()]
+                while not finished.empty():
+                    group.append(finished.get_nowait())
+                done = None in group
+                group = [item for item in group if item is not None]
+                if not group:
+                    continue
 
+                entity_map, chunk_results = {}, []
+                for document, results in group:
+                    chunk_results.extend(
+                        self._collect_results(results, document.document_id, entity_map)
+                    )
+                logger.info(
+                    f"\n🧱 Writing graph for {len(group)} documents "
+                    f"({len(entity_map)} unique entities)"
+                )
+                try:
+                    await self._write_graph(chat_id, entity_map, chunk_results)
+                except Exception as e:
+                    logger.error(f"❌ Batch graph write failed: {e}")
+                    for document, _ in group:
+                        await self._update_status(document.document_id, "failed")
+                        fail(document, e)
+                    events.publish(events.GRAPH_CHANGED, chat_id=chat_id)
+                    continue
+                for document, _ in group:
+                    await self._update_status(document.document_id, "completed")
+                    events.publish(
+                        events.DOCUMENT_INGESTED,
+                        chat_id=chat_id,
+                        document_id=document.document_id,
+                    )
+                    progress.documents_completed += 1
+                    INGESTION_DOCUMENTS_IN_PROGRESS.dec()
+                    settle(document)
+
+        embedders = [
+            asyncio.create_task(embed_worker()) for _ in range(self.embed_workers)
+        ]
+        writer = asyncio.create_task(graph_writer())
+        try:
+            await asyncio.gather(*(run_document(d) for d in documents))
+            await finished.put(None)
+            await writer
+            # Every original is embedded by now, whichever document it is in
+            await self._link_aliases(chat_id, dedup)
+        except Exception as e:
+            progress.errors.append(f"batch: {e}")
+            raise
+        finally:
+            for task in embedders + [writer]:
+                task.cancel()
+            finished_count = progress.documents_completed + progress.documents_failed
+            INGESTION_DOCUMENTS_IN_PROGRESS.dec(len(documents) - finished_count)
+            if finished_count < len(documents):
+                progress.status = "failed"
+            elif not progress.documents_failed:
+                progress.status = "completed"
+            elif progress.documents_completed:
+                progress.status = "partial"
+            else:
+                progress.status = "failed"
+            progress.finished_at = datetime.now()
+        logger.info(
+            f"✅ Batch complete: {progress.documents_completed}/{len(documents)} documents, "
+            f"{progress.chunks_total} chunks"
+        )
+        return progress
+
+    def _collect_results(self, results, document_id, entity_map) -> list[dict]:
+        """Successful chunk results; their entities are merged into entity_map."""
+        chunk_results = []
         for result in results:
             if isinstance(result, Exception):
                 logger.error(f"Chunk processing error: {result}")
                 continue
             if isinstance(result, dict) and result.get("status") == "success":
-                all_chunk_results.append(result)
+                chunk_results.append(result)
                 # Add entities to global map
                 for entity_data in result.get("entities", []):
                     if entity_data and entity_data.get("name"):
                         name_key = entity_data["name"].lower().strip()
-                        if name_key not in global_entity_map:
-                            global_entity_map[name_key] = entity_data
-
-        # Add all unique entities to graph
-        logger.info("\n📈 RESULTS:")
-        logger.info(f"  • Total unique entities: {len(global_entity_map)}")
-        logger.info(
-            f"  • Successfully processed chunks: {len(all_chunk_results)}/{total_chunks}"
-        )
-        logger.info("\n🔗 Adding entities to graph...")
-        for entity_data in global_entity_map.values():
-            try:
-                entity = Entity(
-                    chat_id=chat_id,
-                    document_id=document_id,
-                    name=entity_data["name"],
-                    type=entity_data.get("type", "Entity"),
-                    confidence=entity_data.get("confidence", 0.5),
-                    chunk_id=entity_data["chunk_id"],
+                        if name_key not in entity_map:
+                            entity_map[name_key] = dict(
+                                entity_data, document_id=document_id, chunk_ids=[]
+                            )
+                        # Provenance: every chunk that mentions the entity
+                        chunk_ids = entity_map[name_key]["chunk_ids"]
+                        if entity_data["chunk_id"] not in chunk_ids:
+                            chunk_ids.append(entity_data["chunk_id"])
+        return chunk_results
+
+    async def _resolve_entities(self, chat_id, entity_map) -> tuple[dict, dict]:
+        """
+        The entity map with name variants merged under canonical names, and
+        the canonical key for each key of the original map.
+        """
+        unresolved = entity_map, {key: key for key in entity_map}
+        if not settings.ENTITY_RESOLUTION_ENABLED or not entity_map:
+            return unresolved
+        try:
+            known = await asyncio.to_thread(self.graph.entity_names, chat_id)
+            embed = (
+                self.vector.llm_service.embed_texts
+                if settings.ENTITY_RESOLUTION_EMBEDDINGS
+                else None
+            )
+            canonical = await asyncio.to_thread(
+                EntityResolver(embed=embed).resolve, entity_map, known
+            )
+        except Exception as e:
+            logger.warning(f"Entity resolution skipped: {e}")
+            return unresolved
+
+        resolved, key_map = {}, {}
+        # Each cluster's entry starts from its canonical member's data
+        for key in sorted(entity_map, key=lambda k: canonical[k].lower().strip() != k):
+            entity_data = entity_map[key]
+            name = canonical[key]
+            key_map[key] = target = name.lower().strip()
+            merged = resolved.get(target)
+            if merged is None:
+                merged = resolved[target] = dict(
+                    entity_data, name=name, chunk_ids=[], aliases=[]
                 )
-                await asyncio.to_thread(self.graph.add_entity, entity)
-                entity_data["entity_obj"] = entity
-            except Exception as e:
-                logger.warning(f"Failed to add entity {entity_data['name']}: {e}")
+            merged["confidence"] = max(
+                merged.get("confidence") or 0.0, entity_data.get("confidence") or 0.0
+            )
+            for chunk_id in entity_data["chunk_ids"]:
+                if chunk_id not in merged["chunk_ids"]:
+                    merged["chunk_ids"].append(chunk_id)
+            alias = normalize_name(entity_data["name"])
+            if alias != normalize_name(name) and alias not in merged["aliases"]:
+                merged["aliases"].append(alias)
+        if len(resolved) < len(entity_map):
+            logger.info(
+                f"🪢 Resolved {len(entity_map)} entity names to {len(resolved)} entities"
+            )
+        return resolved, key_map
+
+    async def _write_graph(self, chat_id, global_entity_map, all_chunk_results):
+        """Resolve and upsert merged entities and relationships, then refresh their digests."""
+        # Resolution reads the chat's entities, so a concurrent write must not
+        # add a variant of one of them in between
+        async with self.coordinator.lock(f"graph:entities:{chat_id}"):
+            entities, key_map = await self._resolve_entities(chat_id, global_entity_map)
+            logger.info("\n🔗 Adding entities to graph...")
+            for entity_data in entities.values():
+                try:
+                    entity = Entity(
+                        chat_id=chat_id,
+                        document_id=entity_data["document_id"],
+                        name=entity_data["name"],
+                        type=entity_data.get("type", "Entity"),
+                        confidence=entity_data.get("confidence", 0.5),
+                        chunk_id=entity_data["chunk_id"],
+                        chunk_ids=entity_data["chunk_ids"],
+                        aliases=entity_data.get("aliases", []),
+                    )
+                    # Relationships must point at the id already stored for the name
+                    entity_data["entity_id"] = await asyncio.to_thread(
+                        self.graph.add_entity, entity
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to add entity {entity_data['name']}: {e}")
 
-        # Add relationships
-        total_relationships = sum(
-            len(chunk.get("relationships", [])) for chunk in all_chunk_results
-        )
-        logger.info(f"\n🔗 Adding {total_relationships} relationships to graph...")
+        # Merge relationships repeated across chunks into one write each
+        relationships = {}
         for chunk_result in all_chunk_results:
             for rel_data in chunk_result.get("relationships", []):
                 if (
@@ -142,124 +617,364 @@ class IngestionService:
 
                 source_key = rel_data["source"].lower().strip()
                 target_key = rel_data["target"].lower().strip()
+                if source_key not in key_map or target_key not in key_map:
+                    continue
+                # "OpenAI" -> "Open AI" says nothing once both are one entity
+                if (
+                    source_key != target_key
+                    and key_map[source_key] == key_map[target_key]
+                ):
+                    continue
+                source_key, target_key = key_map[source_key], key_map[target_key]
+
+                if source_key in entities and target_key in entities:
+                    source_id = entities[source_key].get("entity_id")
+                    target_id = entities[target_key].get("entity_id")
+
+                    if source_id and target_id:
+                        rel_type = rel_data.get("type", "RELATED_TO")
+                        merged = relationships.setdefault(
+                            (source_id, rel_type, target_id),
+                            {
+                                "confidence": rel_data.get("confidence", 0.5),
+                                "chunk_ids": [],
+                            },
+                        )
+                        merged["confidence"] = max(
+                            merged["confidence"] or 0.0,
+                            rel_data.get("confidence", 0.5) or 0.0,
+                        )
+                        if rel_data["chunk_id"] not in merged["chunk_ids"]:
+                            merged["chunk_ids"].append(rel_data["chunk_id"])
+
+        logger.info(f"\n🔗 Adding {len(relationships)} relationships to graph...")
+        touched_ids = set()
+        for (source_id, rel_type, target_id), merged in relationships.items():
+            try:
+                rel = Relationship(
+                    chat_id=chat_id,
+                    source_id=source_id,
+                    target_id=target_id,
+                    type=rel_type,
+                    confidence=merged["confidence"],
+                    chunk_id=merged["chunk_ids"][0],
+                    chunk_ids=merged["chunk_ids"],
+                )
+                await asyncio.to_thread(self.graph.add_relationship, rel)
+                touched_ids.update((source_id, target_id))
+            except Exception as e:
+                logger.warning(f"Failed to add relationship: {e}")
 
-                if source_key in global_entity_map and target_key in global_entity_map:
-                    source_entity = global_entity_map[source_key].get("entity_obj")
-                    target_entity = global_entity_map[target_key].get("entity_obj")
-
-                    if source_entity and target_entity:
-                        try:
-                            rel = Relationship(
-                                chat_id=chat_id,
-                                source_id=source_entity.id,
-                                target_id=target_entity.id,
-                                type=rel_data.get("type", "RELATED_TO"),
-                                confidence=rel_data.get("confidence", 0.5),
-                                chunk_id=rel_data["chunk_id"],
-                            )
-                            await asyncio.to_thread(self.graph.add_relationship, rel)
-                        except Exception as e:
-                            logger.warning(f"Failed to add relationship: {e}")
+        # Refresh neighbourhood digests of every entity this document touched
+        touched_ids.update(
+            e["entity_id"] for e in entities.values() if e.get("entity_id")
+        )
+        logger.info(f"\n🧭 Refreshing {len(touched_ids)} neighbourhood digests...")
+        try:
+            await asyncio.to_thread(
+                self.graph.refresh_neighbourhoods, chat_id, touched_ids
+            )
+        except Exception as e:
+            # Digests are rebuilt lazily at query time if this fails
+            logger.warning(f"Failed to refresh neighbourhood digests: {e}")
 
-        await self._update_status(document_id, "completed")
-        logger.info("\n" + "=" * 60)
-        logger.info("✅ INGESTION COMPLETE!")
-        logger.info("=" * 60 + "\n")
-        return True
+    async def _process_window_async(
+        self, semaphore, chat_id, document_id, window_data, index, total, dedup
+    ):
+        """Wait for a worker slot, then process the window."""
+        return await self._run_in_worker(
+            semaphore,
+            self._process_window(
+                chat_id, document_id, window_data, index, total, dedup
+            ),
+        )
 
-    async def _process_chunk_async(
-        self, semaphore, chat_id, document_id, chunk_data, index
+    async def _run_in_worker(self, semaphore, work):
+        with INGESTION_QUEUE_DEPTH.track_inprogress():
+            await semaphore.acquire()
+        try:
+            with INGESTION_CHUNK_SECONDS.time():
+                result = await work
+            INGESTION_CHUNKS.labels(status=result["status"]).inc(
+                result.get("chunks", 1)
+            )
+            return result
+        finally:
+            semaphore.release()
+
+    async def _process_window(
+        self, chat_id, document_id, window_data, index, total, dedup
     ):
-        """Process a single chunk: vector upsert + entity extraction in parallel."""
-        async with semaphore:
-            chunk_start = time.time()
-            try:
+        """
+        Process one window: vector upsert of its chunks + one extraction, in
+        parallel. Near-duplicates of chunks already stored are neither.
+        """
+        size = len(window_data["chunks"])
+        try:
+            chunks = [
+                self._build_chunk(chat_id, document_id, chunk_data)
+                for chunk_data in window_data["chunks"]
+            ]
+            aliased = await self._resolve_aliases(dedup, chat_id, chunks)
+        except Exception as e:
+            logger.error(f"❌ Window {index} processing failed: {e}")
+            return {
+                "chunk_id": None,
+                "status": "error",
+                "error": str(e),
+                "chunks": size,
+            }
+
+        # Run vector upsert and entity extraction in parallel
+        vector_result, result = await asyncio.gather(
+            asyncio.to_thread(
+                self.vector.upsert_chunks,
+                [chunk for chunk in chunks if chunk.id not in aliased],
+            ),
+            self._extract_window(
+                chunks,
+                self._alias_texts(chunks, window_data["texts"], aliased),
+                index,
+                total,
+            ),
+            return_exceptions=True,
+        )
+        if isinstance(vector_result, Exception):
+            logger.warning(f"Vector upsert failed for window {index}: {vector_result}")
+        if isinstance(result, Exception):
+            logger.error(f"❌ Window {index} processing failed: {result}")
+            return {
+                "chunk_id": None,
+                "status": "error",
+                "error": str(result),
+                "chunks": size,
+            }
+        return result
+
+    async def _resolve_aliases(self, dedup, chat_id, chunks) -> set:
+        """
+        Ids of the chunks that are near-duplicates of a stored chunk, or of
+        one stored earlier in this run, recorded in dedup as its aliases.
+        Aliases are neither embedded nor extracted.
+        """
+        if not dedup.enabled:
+            return set()
+        try:
+            found = await asyncio.to_thread(
+                self.vector.find_near_duplicates, chat_id, chunks, dedup.threshold
+            )
+        except Exception as e:
+            logger.warning(f"Near-duplicate lookup failed: {e}")
+            found = {}
+        return dedup.resolve(chunks, found)
+
+    @staticmethod
+    def _alias_texts(chunks, texts, aliased) -> list:
+        """Window texts with nothing left to extract for aliases."""
+        return ["" if chunk.id in aliased else t for chunk, t in zip(chunks, texts)]
+
+    async def _link_aliases(self, chat_id, dedup):
+        """Record this run's aliases on their originals, once those are all stored."""
+        wanted = sum(len(entries) for entries in dedup.aliases.values())
+        if not wanted:
+            return
+        try:
+            linked = await asyncio.to_thread(
+                self.vector.link_aliases, chat_id, dedup.aliases
+            )
+        except Exception as e:
+            logger.warning(f"Linking {wanted} near-duplicate chunks failed: {e}")
+            return
+        logger.info(
+            f"♻️ {wanted} near-duplicate chunks stored as aliases of {linked} chunks"
+        )
+        if linked < len(dedup.aliases):
+            logger.warning(
+                f"{len(dedup.aliases) - linked} originals of near-duplicate chunks "
+                "were not stored; their aliases are lost"
+            )
+
+    @staticmethod
+    def _build_chunk(chat_id, document_id, chunk_data) -> Chunk:
+        return Chunk(
+            chat_id=chat_id,
+            document_id=document_id,
+            content=chunk_data["content"],
+            index=chunk_data["metadata"]["chunk_index"],
+            char_start=chunk_data["metadata"]["char_start"],
+            char_end=chunk_data["metadata"]["char_end"],
+            position_ratio=chunk_data["metadata"]["position_ratio"],
+            content_type=chunk_data["metadata"]["content_type"],
+            headings=chunk_data["metadata"]["headings"],
+            metadata={
+                key: chunk_data["metadata"][key]
+                for key in ("embed_only", "minhash")
+                if chunk_data["metadata"].get(key)
+            }
+            or None,
+        )
+
+    async def _extract_window(self, chunks, texts, index, total) -> dict:
+        """
+        Entity and relationship extraction for one window of chunks.
+
+        In packed mode (EXTRACT_PACKED) the chunks go out as numbered sections
+        of one request and results come back per chunk; a chunk missing from
+        the reply gets a request of its own. Otherwise the window text is
+        extracted in one call and each result is attributed to the chunks that
+        mention it, or to the first chunk when none does verbatim. Chunks with
+        no text of their own (all overlap, or embed-only) are not sent.
+        """
+        window_start = time.time()
+        if total:
+            logger.info(
+                f"🔄 Worker processing window {index + 1}/{total} ({(index + 1) / total * 100:.1f}%, {len(chunks)} chunks)"
+            )
+        else:
+            logger.info(
+                f"🔄 Worker processing window {index + 1} ({len(chunks)} chunks)"
+            )
+
+        # (chunks the extraction came from, extraction or None)
+        parts = []
+        # Chunks that are all overlap or embed-only have nothing to extract
+        packed = [i for i, text in enumerate(texts) if text]
+        if len(packed) == 1:
+            chunk = chunks[packed[0]]
+            parts.append(([chunk], await self._extract_text(chunk.content, "single")))
+        elif packed and not settings.EXTRACT_PACKED:
+            text = "\n\n".join(texts[i] for i in packed)
+            parts.append(
+                (
+                    [chunks[i] for i in packed],
+                    await self._extract_text(text, "merged"),
+                )
+            )
+        elif packed:
+            extractions = await self._extract_packed([texts[i] for i in packed])
+            missing = []
+            for position, i in enumerate(packed):
+                if position in extractions:
+                    parts.append(([chunks[i]], extractions[position]))
+                else:
+                    missing.append(i)
+            if missing:
                 logger.info(
-                    f"🔄 Worker processing chunk {index + 1}/{len(self._total_chunks)} ({(index + 1) / len(self._total_chunks) * 100:.1f}%)"
+                    f"↩️ Window {index + 1}: {len(missing)}/{len(packed)} chunks missing "
+                    "from the packed reply; extracting them one by one"
                 )
-
-                chunk = Chunk(
-                    chat_id=chat_id,
-                    document_id=document_id,
-                    content=chunk_data["content"],
-                    index=chunk_data["metadata"]["chunk_index"],
-                    char_start=chunk_data["metadata"]["char_start"],
-                    char_end=chunk_data["metadata"]["char_end"],
-                    position_ratio=chunk_data["metadata"]["position_ratio"],
-                    content_type=chunk_data["metadata"]["content_type"],
-                    headings=chunk_data["metadata"]["headings"],
+                fallbacks = await asyncio.gather(
+                    *(
+                        self._extract_text(chunks[i].content, "fallback")
+                        for i in missing
+                    )
                 )
-
-                # Run vector upsert and entity extraction in parallel
-                vector_task = asyncio.to_thread(self.vector.upsert_chunk, chunk)
-                entity_task = asyncio.to_thread(
-                    self.graph.extract_entities_and_relationships, chunk.content
+                parts.extend(
+                    ([chunks[i]], extraction)
+                    for i, extraction in zip(missing, fallbacks)
                 )
 
-                # Wait for both to complete
-                vector_result, extraction = await asyncio.gather(
-                    vector_task, entity_task, return_exceptions=True
-                )
+        entities = []
+        relationships = []
+        for part_chunks, extraction in parts:
+            if extraction is None:
+                continue
+            contents = [chunk.content.lower() for chunk in part_chunks]
+
+            def mentioning(*names):
+                names = [name.lower() for name in names]
+                return [
+                    chunk.id
+                    for chunk, content in zip(part_chunks, contents)
+                    if all(name in content for name in names)
+                ]
+
+            if hasattr(extraction, "entities") and extraction.entities:
+                for e in extraction.entities:
+                    if e.name:
+                        for chunk_id in mentioning(e.name) or [part_chunks[0].id]:
+                            entities.append(
+                                {
+                                    "name": e.name,
+                                    "type": e.type or "Entity",
+                                    "confidence": e.confidence or 0.5,
+                                    "chunk_id": chunk_id,
+                                }
+                            )
 
-                if isinstance(vector_result, Exception):
-                    logger.warning(
-                        f"Vector upsert failed for chunk {index}: {vector_result}"
-                    )
+            if hasattr(extraction, "relationships") and extraction.relationships:
+                for r in extraction.relationships:
+                    if r.source and r.target:
+                        chunk_ids = (
+                            mentioning(r.source, r.target)
+                            or mentioning(r.source)[:1]
+                            or mentioning(r.target)[:1]
+                            or [part_chunks[0].id]
+                        )
+                        for chunk_id in chunk_ids:
+                            relationships.append(
+                                {
+                                    "source": r.source,
+                                    "target": r.target,
+                                    "type": r.type or "RELATED_TO",
+                                    "confidence": r.confidence or 0.5,
+                                    "chunk_id": chunk_id,
+                                }
+                            )
 
-                # Process extraction results
-                entities = []
-                relationships = []
-
-                if not isinstance(extraction, Exception):
-                    if hasattr(extraction, "entities") and extraction.entities:
-                        for e in extraction.entities:
-                            if e.name:
-                                entities.append(
-                                    {
-                                        "name": e.name,
-                                        "type": e.type or "Entity",
-                                        "confidence": e.confidence or 0.5,
-                                        "chunk_id": chunk.id,
-                                    }
-                                )
-
-                    if (
-                        hasattr(extraction, "relationships")
-                        and extraction.relationships
-                    ):
-                        for r in extraction.relationships:
-                            if r.source and r.target:
-                                relationships.append(
-                                    {
-                                        "source": r.source,
-                                        "target": r.target,
-                                        "type": r.type or "RELATED_TO",
-                                        "confidence": r.confidence or 0.5,
-                                        "chunk_id": chunk.id,
-                                    }
-                                )
-                else:
-                    logger.warning(
-                        f"Entity extraction failed for chunk {index}: {extraction}"
-                    )
+        window_time = time.time() - window_start
+        logger.info(
+            f"✓ Window {index + 1} completed in {window_time:.2f}s (Entities: {len(entities)}, Relationships: {len(relationships)})"
+        )
 
-                chunk_time = time.time() - chunk_start
-                logger.info(
-                    f"✓ Chunk {index + 1} completed in {chunk_time:.2f}s (Entities: {len(entities)}, Relationships: {len(relationships)})"
-                )
+        return {
+            "chunk_id": chunks[
+                0
+            ].id,  # Keep chunk_id for consistency in _ingest_async processing
+            "status": "success",
+            "entities": entities,
+            "relationships": relationships,
+            "chunks": len(chunks),
+        }
+
+    async def _extract_text(self, text, mode):
+        """One extraction request; None when it fails."""
+        EXTRACTION_REQUESTS.labels(mode=mode).inc()
+        try:
+            return await asyncio.to_thread(
+                self.graph.extract_entities_and_relationships, text
+            )
+        except Exception as e:
+            logger.warning(f"Entity extraction ({mode}) failed: {e}")
+            return None
 
-                return {
-                    "chunk_id": chunk.id,  # Keep chunk_id for consistency in _ingest_async processing
-                    "status": "success",
-                    "entities": entities,
-                    "relationships": relationships,
-                }
+    async def _extract_packed(self, texts) -> dict:
+        """Packed extraction by position in texts; {} when the request fails."""
+        EXTRACTION_REQUESTS.labels(mode="packed").inc()
+        try:
+            return await asyncio.to_thread(self.graph.extract_packed, texts)
+        except Exception as e:
+            logger.warning(f"Packed extraction of {len(texts)} chunks failed: {e}")
+            return {}
 
-            except Exception as e:
-                logger.error(f"❌ Chunk {index} processing failed: {e}")
-                return {"chunk_id": None, "status": "error", "error": str(e)}
+    async def _find_duplicate(self, chat_id, checksum, document_id):
+        """Id of a completed document in the chat with the same content, if any."""
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(DocumentModel.id)
+                .where(
+                    DocumentModel.chat_id == chat_id,
+                    DocumentModel.checksum == checksum,
+                    DocumentModel.status == "completed",
+                    DocumentModel.id != document_id,
+                )
+                .limit(1)
+            )
+            return result.scalar_one_or_none()
 
-    async def _save_document_metadata(self, document_id, chat_id, file_name, file_size):
+    async def _save_document_metadata(
+        self, document_id, chat_id, file_name, file_size, checksum=""
+    ):
         async with SessionLocal() as db:
             result = await db.execute(
                 select(DocumentModel).where(DocumentModel.id == document_id)
@@ -272,7 +987,7 @@ class IngestionService:
                     file_name=file_name,
                     file_size=file_size,
                     file_type="text",
-                    checksum="",
+                    checksum=checksum,
                     status="processing",
                 )
                 db.add(doc)
@@ -1,11 +1,33 @@
+import logging
 import threading
-from openai import OpenAI
+import time
 from app.core.config import settings
+from app.core.metrics import (
+    LLM_REQUEST_SECONDS,
+    LLM_TOKENS,
+    LLM_ERRORS,
+    LLM_CACHE_REQUESTS,
+    LLM_COALESCED_CALLS,
+    EMBEDDING_BATCH_SIZE,
+)
+from app.core.coordination import get_coordinator
+from app.core.llm_cache import cache_key, get_llm_cache
+from app.core.singleflight import SingleFlight
+from app.core.tokens import get_token_estimator
+from app.core.tracing import instrument
+
+logger = logging.getLogger(__name__)
 
 # Initialize OpenAI client at module level to avoid import deadlock
 _client_lock = threading.Lock()
 _shared_client = None
 
+# Shared by every LLMService so identical concurrent requests coalesce process-wide
+_single_flight = SingleFlight()
+
+# Models that rejected a response_format; they get plain requests from then on
+_structured_output_unsupported = set()
+
 
 def get_openai_client():
     """Get or create the shared OpenAI client (thread-safe)."""
@@ -13,14 +35,20 @@ def get_openai_client():
     if _shared_client is None:
         with _client_lock:
             if _shared_client is None:
-                _shared_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+                # The openai package is imported on first use; it is slow to import
+                from openai import OpenAI
+
+                _shared_client = OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    timeout=settings.OPENAI_TIMEOUT_SECONDS,
+                )
                 # Warm up the client to load all sub-modules before threading
                 # This prevents lazy import deadlocks
                 _warm_up_client(_shared_client)
     return _shared_client
 
 
-def _warm_up_client(client: OpenAI):
+def _warm_up_client(client):
     """Pre-load OpenAI sub-modules to prevent threading deadlocks."""
     try:
         # Access the sub-modules to trigger their imports
@@ -31,22 +59,163 @@ def _warm_up_client(client: OpenAI):
         pass
 
 
+def _record_usage(operation: str, response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    if getattr(usage, "prompt_tokens", None) is not None:
+        LLM_TOKENS.labels(operation=operation, kind="prompt").observe(
+            usage.prompt_tokens
+        )
+    if getattr(usage, "completion_tokens", None) is not None:
+        LLM_TOKENS.labels(operation=operation, kind="completion").observe(
+            usage.completion_tokens
+        )
+
+
+def _calibrate(model: str, chars: int, response):
+    """Tune the model's token estimator with the prompt tokens the API counted."""
+    prompt_tokens = getattr(getattr(response, "usage", None), "prompt_tokens", None)
+    if prompt_tokens:
+        get_token_estimator(model).calibrate(chars, prompt_tokens)
+
+
+def _rejects_response_format(error: Exception) -> bool:
+    """Whether a failed request was refused for its response_format, not its content."""
+    if getattr(error, "status_code", None) != 400:
+        return False
+    details = " ".join(
+        [str(error)]
+        + [str(getattr(error, attr, None) or "") for attr in ("code", "param", "body")]
+    ).lower()
+    return "response_format" in details or "json_schema" in details
+
+
+@instrument
 class LLMService:
-    def __init__(self):
-        self.client = get_openai_client()
+    def __init__(self, client=None, cache=None, single_flight=None, coordinator=None):
+        self.client = client or get_openai_client()
+        self.cache = cache if cache is not None else get_llm_cache()
+        self.single_flight = single_flight or _single_flight
+        self.coordinator = coordinator or get_coordinator()
         self.llm_model = settings.OPENAI_LLM_MODEL
         self.embed_model = settings.OPENAI_EMBED_MODEL
 
+    def _coalesce(self, operation: str, key: str, fn):
+        if not settings.LLM_SINGLE_FLIGHT_ENABLED:
+            return fn()
+        # Requests through different clients never share a result
+        result, shared = self.single_flight.do((id(self.client), operation, key), fn)
+        if shared:
+            LLM_COALESCED_CALLS.labels(operation=operation).inc()
+        return result
+
+    def _wait_for_budget(self):
+        """Take one request from the budget shared by every backend process."""
+        if settings.LLM_REQUESTS_PER_MINUTE > 0:
+            self.coordinator.acquire_sync(
+                "llm_requests",
+                settings.LLM_REQUESTS_PER_MINUTE,
+                settings.LLM_REQUEST_BURST,
+            )
+
     def embed_text(self, text: str) -> list[float]:
-        response = self.client.embeddings.create(
-            model=self.embed_model, input=text, encoding_format="float"
+        return self._coalesce(
+            "embed", cache_key(self.embed_model, [text]), lambda: self._embed(text)
+        )
+
+    def _embed(self, text: str) -> list[float]:
+        return self._embed_request(text)[0]
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed several texts in one request; vectors follow the input order."""
+        if not texts:
+            return []
+        return self._embed_request(list(texts))
+
+    def _embed_request(self, input) -> list[list[float]]:
+        EMBEDDING_BATCH_SIZE.observe(len(input) if isinstance(input, list) else 1)
+        self._wait_for_budget()
+        start = time.perf_counter()
+        try:
+            response = self.client.embeddings.create(
+                model=self.embed_model, input=input, encoding_format="float"
+            )
+        except Exception:
+            LLM_ERRORS.labels(operation="embed").inc()
+            raise
+        finally:
+            LLM_REQUEST_SECONDS.labels(
+                operation="embed", model=self.embed_model
+            ).observe(time.perf_counter() - start)
+        _record_usage("embed", response)
+        _calibrate(
+            self.embed_model,
+            sum(map(len, input)) if isinstance(input, list) else len(input),
+            response,
         )
-        return response.data[0].embedding
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
 
-    def generate(self, prompt: str) -> str:
-        response = self.client.chat.completions.create(
-            model=self.llm_model,
-            messages=[{"role": "user", "content": prompt}],
-            stream=False,
+    def generate(
+        self, prompt: str, call_site: str = "default", response_format: dict = None
+    ) -> str:
+        """
+        Completion for a single-message prompt. `response_format` asks for
+        schema-constrained JSON when LLM_STRUCTURED_OUTPUT is on and the model
+        accepts it; callers must still parse the reply defensively.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        if (
+            not settings.LLM_STRUCTURED_OUTPUT
+            or self.llm_model in _structured_output_unsupported
+        ):
+            response_format = None
+        params = {"response_format": response_format} if response_format else {}
+        key = cache_key(self.llm_model, messages, stream=False, **params)
+        cache = self.cache
+        if cache is not None and not cache.enabled_for(call_site):
+            cache = None
+        if cache is not None:
+            cached = cache.get(key)
+            LLM_CACHE_REQUESTS.labels(
+                call_site=call_site, result="miss" if cached is None else "hit"
+            ).inc()
+            if cached is not None:
+                return cached
+
+        content = self._coalesce(
+            "generate", key, lambda: self._complete(messages, response_format)
         )
+        if cache is not None and content is not None:
+            cache.set(key, content)
+        return content
+
+    def _complete(self, messages: list, response_format: dict = None) -> str:
+        self._wait_for_budget()
+        params = {"response_format": response_format} if response_format else {}
+        start = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(
+                model=self.llm_model,
+                messages=messages,
+                stream=False,
+                **params,
+            )
+        except Exception as e:
+            LLM_ERRORS.labels(operation="generate").inc()
+            if response_format and _rejects_response_format(e):
+                # The model or provider doesn't do structured output
+                logger.warning(
+                    f"⚠️ {self.llm_model} rejected response_format ({e}); "
+                    "sending plain requests"
+                )
+                _structured_output_unsupported.add(self.llm_model)
+                return self._complete(messages)
+            raise
+        finally:
+            LLM_REQUEST_SECONDS.labels(
+                operation="generate", model=self.llm_model
+            ).observe(time.perf_counter() - start)
+        _record_usage("generate", response)
+        _calibrate(self.llm_model, sum(len(m["content"]) for m in messages), response)
         return response.choices[0].message.content
@@ -1,36 +1,179 @@
+import asyncio
+import logging
 from app.services.graph_service import GraphService
 from app.services.vector_service import VectorService
-from app.db.utils.graph import build_context
+from app.db.utils.graph import build_context, supporting_chunk_ids
+from app.core.circuit_breaker import CircuitOpen, get_breaker
+from app.core.config import settings
+from app.core.deadlines import Deadline, run_stage
+from app.core.metrics import CHAT_SKIPPED_STAGES, CHAT_STAGE_SECONDS
+from app.core.tracing import instrument
 
+logger = logging.getLogger(__name__)
 
+
+def _entity_names(parsed) -> list[str]:
+    if isinstance(parsed, dict):
+        entity_names = [
+            e.get("name") for e in parsed.get("entities", []) if isinstance(e, dict)
+        ]
+    elif isinstance(parsed, list):
+        entity_names = [e.get("name") for e in parsed if isinstance(e, dict)]
+    else:
+        entity_names = []
+    return [n for n in entity_names if n]
+
+
+def _skip(skipped: list, stages: tuple, error: Exception):
+    if isinstance(error, TimeoutError):
+        reason = "timeout"
+    elif isinstance(error, CircuitOpen):
+        reason = "circuit_open"
+    else:
+        reason = "error"
+    for stage in stages:
+        skipped.append(stage)
+        CHAT_SKIPPED_STAGES.labels(stage=stage, reason=reason).inc()
+    logger.warning(f"⏱️ Skipping {', '.join(stages)} ({reason}): {error}")
+
+
+@instrument
 class RetrievalService:
-    def __init__(self):
-        self.graph = GraphService()
-        self.vector = VectorService()
+    def __init__(self, graph=None, vector=None, breakers=None):
+        self.graph = graph or GraphService()
+        self.vector = vector or VectorService()
+        # Circuit breakers by store; shared process-wide unless given
+        self.breakers = breakers or {
+            name: get_breaker(name) for name in ("neo4j", "qdrant")
+        }
+
+    def embed_question(self, question: str) -> list[float]:
+        return self.vector.embed_query(question)
 
-    def retrieve_context(self, chat_id, question: str) -> str:
+    def retrieve_context(self, chat_id, question: str, query_vector=None) -> str:
         # 1. Vector recall
-        chunks = self.vector.search_chunks(question, chat_id)
+        with CHAT_STAGE_SECONDS.labels(stage="vector_search").time():
+            chunks = self.vector.search_chunks(
+                question, chat_id, query_vector=query_vector
+            )
 
         # 2. Parse question entities
-        parsed = self.graph.parse(question)
-        if isinstance(parsed, dict):
-            entity_names = [
-                e.get("name") for e in parsed.get("entities", []) if isinstance(e, dict)
-            ]
-        elif isinstance(parsed, list):
-            entity_names = [e.get("name") for e in parsed if isinstance(e, dict)]
-        else:
-            entity_names = []
-        entity_names = [n for n in entity_names if n]
+        with CHAT_STAGE_SECONDS.labels(stage="graph_parse").time():
+            parsed = self.graph.parse(question)
+        entity_names = _entity_names(parsed)
 
         # 3. Graph reasoning
         graph_results = []
         if entity_names:
-            graph_results = self.graph.retrieve(chat_id, entity_names)
+            with CHAT_STAGE_SECONDS.labels(stage="graph_retrieve").time():
+                graph_results = self.graph.retrieve(chat_id, entity_names)
+
+        # 4. Supporting text for the graph hits, fetched by id
+        supporting = []
+        chunk_ids = supporting_chunk_ids(
+            graph_results,
+            exclude=[c.id for c in chunks],
+            limit=settings.GRAPH_CHUNK_FETCH_LIMIT,
+        )
+        if chunk_ids:
+            with CHAT_STAGE_SECONDS.labels(stage="chunk_fetch").time():
+                supporting = self.vector.fetch_chunks(chat_id, chunk_ids)
+
+        # 5. Build context
+        with CHAT_STAGE_SECONDS.labels(stage="build_context").time():
+            return build_context(chunks, graph_results, supporting)
+
+    async def retrieve_context_async(
+        self, chat_id, question: str, deadline: Deadline = None, query_vector=None
+    ) -> tuple[str, list[str]]:
+        """
+        Context for the question within the deadline, and the stages left out
+        of it. Vector recall and the graph stages run concurrently, each within
+        its budget; graph stages that run out of time or whose store is failing
+        are skipped, leaving vector-only context.
+        """
+        deadline = deadline or Deadline()
+        reserve = settings.CHAT_ANSWER_RESERVE_SECONDS
+        graph_deadline = deadline.child(settings.CHAT_GRAPH_BUDGET_SECONDS, reserve)
+        skipped = []
+
+        # 1. Vector recall, and 2-3. question entities and graph reasoning
+        chunks, graph_results = await asyncio.gather(
+            self._vector_stage(
+                chat_id,
+                question,
+                deadline.child(settings.CHAT_VECTOR_BUDGET_SECONDS, reserve),
+                query_vector,
+                skipped,
+            ),
+            self._graph_stage(chat_id, question, graph_deadline, skipped),
+        )
+
+        # 4. Supporting text for the graph hits, fetched by id
+        supporting = []
+        chunk_ids = supporting_chunk_ids(
+            graph_results,
+            exclude=[c.id for c in chunks],
+            limit=settings.GRAPH_CHUNK_FETCH_LIMIT,
+        )
+        if chunk_ids:
+            try:
+                with CHAT_STAGE_SECONDS.labels(stage="chunk_fetch").time():
+                    supporting = await run_stage(
+                        graph_deadline,
+                        self.vector.fetch_chunks,
+                        chat_id,
+                        chunk_ids,
+                        breaker=self.breakers["qdrant"],
+                    )
+            except Exception as e:
+                _skip(skipped, ("chunk_fetch",), e)
+
+        # 5. Build context
+        with CHAT_STAGE_SECONDS.labels(stage="build_context").time():
+            return build_context(chunks, graph_results, supporting), skipped
+
+    async def _vector_stage(self, chat_id, question, deadline, query_vector, skipped):
+        try:
+            with CHAT_STAGE_SECONDS.labels(stage="vector_search").time():
+                if query_vector is None:
+                    query_vector = await run_stage(
+                        deadline, self.embed_question, question
+                    )
+                return await run_stage(
+                    deadline,
+                    self.vector.search_chunks,
+                    question,
+                    chat_id,
+                    query_vector=query_vector,
+                    breaker=self.breakers["qdrant"],
+                )
+        except Exception as e:
+            _skip(skipped, ("vector_search",), e)
+            return []
 
-        # 4. Build context
-        return build_context(chunks, graph_results)
+    async def _graph_stage(self, chat_id, question, deadline, skipped):
+        try:
+            with CHAT_STAGE_SECONDS.labels(stage="graph_parse").time():
+                parsed = await run_stage(deadline, self.graph.parse, question)
+        except Exception as e:
+            _skip(skipped, ("graph_parse", "graph_retrieve"), e)
+            return []
+        entity_names = _entity_names(parsed)
+        if not entity_names:
+            return []
+        try:
+            with CHAT_STAGE_SECONDS.labels(stage="graph_retrieve").time():
+                return await run_stage(
+                    deadline,
+                    self.graph.retrieve,
+                    chat_id,
+                    entity_names,
+                    breaker=self.breakers["neo4j"],
+                )
+        except Exception as e:
+            _skip(skipped, ("graph_retrieve",), e)
+            return []
 
     def close(self):
         self.graph.close()
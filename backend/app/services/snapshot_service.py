@@ -0,0 +1,395 @@
+import asyncio
+import json
+import struct
+import tempfile
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+from uuid import UUID, uuid4
+import numpy as np
+from app.db.neo4j import Neo4jClient
+from app.db.qdrant import QdrantDBClient
+from app.db.session import SessionLocal
+from app.db.queries.graph import (
+    EXPORT_ENTITIES_QUERY,
+    EXPORT_RELATIONSHIPS_QUERY,
+    IMPORT_ENTITIES_QUERY,
+    IMPORT_RELATIONSHIPS_QUERY,
+)
+from app.models.chat import (
+    Chat as ChatModel,
+    Document as DocumentModel,
+    Message as MessageModel,
+)
+from app.core.constants import ChatStatus
+from app.core.tracing import instrument
+from app.services.vector_service import VectorService
+from sqlalchemy import select
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+VECTORS_MEMBER = "vectors.f32"
+BATCH_SIZE = 512
+
+
+def open_vectors(archive_path: str) -> np.memmap:
+    """Memory-map the float32 vector block of a snapshot without extracting it."""
+    with zipfile.ZipFile(archive_path) as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+        info = zf.getinfo(VECTORS_MEMBER)
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError("Snapshot vector block is compressed and cannot be mapped")
+
+    count, dim = manifest["counts"]["chunks"], manifest["vector_size"]
+    if count == 0:
+        return np.zeros((0, dim), dtype=np.float32)
+
+    # The member data starts after its local file header, whose name and extra
+    # field lengths may differ from the central directory entry
+    with open(archive_path, "rb") as f:
+        f.seek(info.header_offset)
+        header = f.read(30)
+        name_len, extra_len = struct.unpack("<HH", header[26:30])
+    offset = info.header_offset + 30 + name_len + extra_len
+
+    return np.memmap(
+        archive_path, dtype=np.float32, mode="r", offset=offset, shape=(count, dim)
+    )
+
+
+def _row(model, columns) -> dict:
+    row = {}
+    for column in columns:
+        value = getattr(model, column)
+        if isinstance(value, UUID):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        row[column] = value
+    return row
+
+
+@instrument
+class SnapshotService:
+    """Exports a chat's knowledge base to a versioned archive and restores it without the LLM."""
+
+    def __init__(self, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+        self.qdrant = QdrantDBClient()
+        self.neo4j = Neo4jClient()
+
+    def _get_collection_name(self, chat_id) -> str:
+        return f"chat_{chat_id}"
+
+    async def export_chat(self, chat_id, path: str) -> dict:
+        async with SessionLocal() as db:
+            chat = (
+                await db.execute(select(ChatModel).where(ChatModel.id == chat_id))
+            ).scalar_one_or_none()
+            if not chat:
+                raise ValueError(f"Chat {chat_id} not found")
+            documents = (
+                (
+                    await db.execute(
+                        select(DocumentModel).where(DocumentModel.chat_id == chat_id)
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            messages = (
+                (
+                    await db.execute(
+                        select(MessageModel)
+                        .where(MessageModel.chat_id == chat_id)
+                        .order_by(MessageModel.created_at)
+                    )
+                )
+                .scalars()
+                .all()
+            )
+
+            chat_row = _row(chat, ["id", "title", "status", "created_at", "updated_at"])
+            document_rows = [
+                _row(
+                    d,
+                    [
+                        "id",
+                        "file_name",
+                        "file_size",
+                        "file_type",
+                        "checksum",
+                        "status",
+                        "created_at",
+                        "updated_at",
+                    ],
+                )
+                for d in documents
+            ]
+            message_rows = [
+                _row(m, ["id", "role", "content", "created_at"]) for m in messages
+            ]
+
+        return await asyncio.to_thread(
+            self._write_archive, chat_id, path, chat_row, document_rows, message_rows
+        )
+
+    def _write_archive(self, chat_id, path, chat_row, document_rows, message_rows):
+        collection_name = self._get_collection_name(chat_id)
+        chunk_rows = []
+        vector_size = 0
+
+        with tempfile.TemporaryFile() as vectors_file:
+            if self.qdrant.client.collection_exists(collection_name):
+                info = self.qdrant.client.get_collection(collection_name)
+                vector_size = info.config.params.vectors.size
+                offset = None
+                while True:
+                    points, offset = self.qdrant.client.scroll(
+                        collection_name=collection_name,
+                        limit=self.batch_size,
+                        offset=offset,
+                        with_payload=True,
+                        with_vectors=True,
+                    )
+                    if points:
+                        vectors_file.write(
+                            np.asarray(
+                                [p.vector for p in points], dtype=np.float32
+                            ).tobytes()
+                        )
+                        chunk_rows.extend(
+                            {"id": str(p.id), "payload": p.payload} for p in points
+                        )
+                    if offset is None:
+                        break
+
+            with self.neo4j.driver.session() as session:
+                entity_rows = [
+                    r["props"]
+                    for r in session.run(EXPORT_ENTITIES_QUERY, chat_id=str(chat_id))
+                ]
+                relationship_rows = [
+                    r.data()
+                    for r in session.run(
+                        EXPORT_RELATIONSHIPS_QUERY, chat_id=str(chat_id)
+                    )
+                ]
+
+            manifest = {
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "exported_at": datetime.utcnow().isoformat(),
+                "chat": chat_row,
+                "vector_size": vector_size,
+                "counts": {
+                    "chunks": len(chunk_rows),
+                    "entities": len(entity_rows),
+                    "relationships": len(relationship_rows),
+                    "documents": len(document_rows),
+                    "messages": len(message_rows),
+                },
+            }
+
+            with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr("manifest.json", json.dumps(manifest))
+                # Stored uncompressed so import can mmap it straight from the archive
+                vectors_file.seek(0)
+                with zf.open(
+                    zipfile.ZipInfo(VECTORS_MEMBER), "w", force_zip64=True
+                ) as member:
+                    while block := vectors_file.read(1 << 20):
+                        member.write(block)
+                self._write_jsonl(zf, "chunks.jsonl", chunk_rows)
+                self._write_jsonl(zf, "entities.jsonl", entity_rows)
+                self._write_jsonl(zf, "relationships.jsonl", relationship_rows)
+                self._write_jsonl(zf, "documents.jsonl", document_rows)
+                self._write_jsonl(zf, "messages.jsonl", message_rows)
+
+        logger.info(f"📦 Exported chat {chat_id} to {path}: {manifest['counts']}")
+        return manifest
+
+    def _write_jsonl(self, zf: zipfile.ZipFile, name: str, rows):
+        with zf.open(name, "w") as member:
+            for row in rows:
+                member.write(json.dumps(row).encode("utf-8") + b"\n")
+
+    def _read_jsonl(self, zf: zipfile.ZipFile, name: str) -> list:
+        with zf.open(name) as member:
+            return [json.loads(line) for line in member if line.strip()]
+
+    def _read_archive(self, path: str):
+        with zipfile.ZipFile(path) as zf:
+            manifest = json.loads(zf.read("manifest.json"))
+            if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported snapshot format version: {manifest.get('format_version')}"
+                )
+            return (
+                manifest,
+                self._read_jsonl(zf, "chunks.jsonl"),
+                self._read_jsonl(zf, "entities.jsonl"),
+                self._read_jsonl(zf, "relationships.jsonl"),
+                self._read_jsonl(zf, "documents.jsonl"),
+                self._read_jsonl(zf, "messages.jsonl"),
+            )
+
+    async def import_chat(self, path: str, title: str = None) -> ChatModel:
+        """Restore a snapshot into a new chat; ids are re-issued so it never collides."""
+        (
+            manifest,
+            chunk_rows,
+            entity_rows,
+            relationship_rows,
+            document_rows,
+            message_rows,
+        ) = await asyncio.to_thread(self._read_archive, path)
+
+        chat_id = uuid4()
+        document_ids = {row["id"]: uuid4() for row in document_rows}
+
+        async with SessionLocal() as db:
+            chat = ChatModel(
+                id=chat_id,
+                title=title or manifest["chat"]["title"],
+                status=ChatStatus.ACTIVE,
+            )
+            db.add(chat)
+            await db.flush()
+            for row in document_rows:
+                db.add(
+                    DocumentModel(
+                        id=document_ids[row["id"]],
+                        chat_id=chat_id,
+                        file_name=row["file_name"],
+                        file_size=row["file_size"],
+                        file_type=row["file_type"],
+                        checksum=row["checksum"],
+                        status=row["status"],
+                        created_at=datetime.fromisoformat(row["created_at"]),
+                    )
+                )
+            for row in message_rows:
+                db.add(
+                    MessageModel(
+                        chat_id=chat_id,
+                        role=row["role"],
+                        content=row["content"],
+                        created_at=datetime.fromisoformat(row["created_at"]),
+                    )
+                )
+            await db.commit()
+            await db.refresh(chat)
+
+        try:
+            await asyncio.to_thread(
+                self._load_vectors, path, manifest, chat_id, chunk_rows, document_ids
+            )
+            await asyncio.to_thread(
+                self._load_graph, chat_id, entity_rows, relationship_rows
+            )
+        except Exception:
+            # Leave the half-restored chat for compaction to reclaim
+            await self._mark_deleted(chat_id)
+            raise
+
+        logger.info(
+            f"📥 Imported snapshot {path} as chat {chat_id}: {manifest['counts']}"
+        )
+        return chat
+
+    def _load_vectors(self, path, manifest, chat_id, chunk_rows, document_ids):
+        if not chunk_rows:
+            return
+
+        # qdrant_client is imported where used; it takes over a second
+        from qdrant_client.models import Batch
+
+        # Same path as ingestion, so the collection gets its payload indexes
+        collection_name = self._get_collection_name(chat_id)
+        VectorService(client_wrapper=self.qdrant)._ensure_collection_exists(
+            str(chat_id), vector_size=manifest["vector_size"]
+        )
+
+        vectors = open_vectors(path)
+        for start in range(0, len(chunk_rows), self.batch_size):
+            rows = chunk_rows[start : start + self.batch_size]
+            payloads = []
+            for row in rows:
+                payload = dict(row["payload"])
+                payload["chat_id"] = str(chat_id)
+                if payload.get("document_id") in document_ids:
+                    payload["document_id"] = str(document_ids[payload["document_id"]])
+                if payload.get("aliases"):
+                    payload["aliases"] = [
+                        dict(
+                            alias,
+                            document_id=str(
+                                document_ids.get(
+                                    alias["document_id"], alias["document_id"]
+                                )
+                            ),
+                        )
+                        for alias in payload["aliases"]
+                    ]
+                payloads.append(payload)
+
+            self.qdrant.client.upsert(
+                collection_name=collection_name,
+                points=Batch(
+                    ids=[row["id"] for row in rows],
+                    vectors=vectors[start : start + len(rows)].tolist(),
+                    payloads=payloads,
+                ),
+            )
+
+    def _load_graph(self, chat_id, entity_rows, relationship_rows):
+        self.neo4j.ensure_schema()
+
+        relationships_by_type = defaultdict(list)
+        for row in relationship_rows:
+            props = dict(row["props"])
+            props.pop("chat_id", None)
+            relationships_by_type[row["type"]].append(
+                {
+                    "source_id": row["source_id"],
+                    "target_id": row["target_id"],
+                    "props": props,
+                }
+            )
+
+        with self.neo4j.driver.session() as session:
+            for start in range(0, len(entity_rows), self.batch_size):
+                rows = [
+                    {k: v for k, v in row.items() if k != "chat_id"}
+                    for row in entity_rows[start : start + self.batch_size]
+                ]
+                session.execute_write(
+                    lambda tx: tx.run(
+                        IMPORT_ENTITIES_QUERY, rows=rows, chat_id=str(chat_id)
+                    ).consume()
+                )
+
+            for rel_type, rows in relationships_by_type.items():
+                query = IMPORT_RELATIONSHIPS_QUERY.format(f"`{rel_type}`")
+                for start in range(0, len(rows), self.batch_size):
+                    batch = rows[start : start + self.batch_size]
+                    session.execute_write(
+                        lambda tx: tx.run(
+                            query, rows=batch, chat_id=str(chat_id)
+                        ).consume()
+                    )
+
+    async def _mark_deleted(self, chat_id):
+        async with SessionLocal() as db:
+            chat = (
+                await db.execute(select(ChatModel).where(ChatModel.id == chat_id))
+            ).scalar_one_or_none()
+            if chat:
+                chat.status = ChatStatus.DELETED
+                await db.commit()
+
+    def close(self):
+        self.qdrant.close()
+        self.neo4j.close()
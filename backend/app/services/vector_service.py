@@ -1,23 +1,30 @@
-from qdrant_client.models import PointStruct, VectorParams, Distance
 from app.db.qdrant import QdrantDBClient
 from app.services.llm_service import LLMService
+from app.core.config import settings
+from app.core.coordination import get_coordinator
+from app.core.metrics import QDRANT_QUERY_SECONDS
+from app.core.near_duplicates import bands, closest, collapse
+from app.core.tracing import instrument
 import threading
 
 
+@instrument
 class VectorService:
     _collection_locks = {}  # Class-level lock dictionary
     _locks_lock = threading.Lock()  # Lock for the locks dictionary
+    _indexed_collections = set()  # Collections known to have their payload indexes
 
-    def __init__(self):
-        self.client_wrapper = QdrantDBClient()
+    def __init__(self, client_wrapper=None, llm_service=None, coordinator=None):
+        self.client_wrapper = client_wrapper or QdrantDBClient()
         self.client = self.client_wrapper.client
-        self.llm_service = LLMService()
+        self.llm_service = llm_service or LLMService()
+        self.coordinator = coordinator or get_coordinator()
 
     def _get_collection_name(self, chat_id: str) -> str:
         """Get collection name for a specific chat."""
         return f"chat_{chat_id}"
 
-    def _ensure_collection_exists(self, chat_id: str):
+    def _ensure_collection_exists(self, chat_id: str, vector_size: int = 1536):
         """Ensure collection exists for the chat (thread-safe)."""
         collection_name = self._get_collection_name(chat_id)
 
@@ -29,11 +36,53 @@ class VectorService:
 
         # Use the collection-specific lock to prevent race conditions
         with collection_lock:
-            if not self.client.collection_exists(collection_name):
-                self.client.create_collection(
-                    collection_name=collection_name,
-                    vectors_config=VectorParams(size=1536, distance=Distance.COSINE),
-                )
+            with QDRANT_QUERY_SECONDS.labels(operation="collection_exists").time():
+                exists = self.client.collection_exists(collection_name)
+            if exists:
+                self._ensure_payload_indexes(collection_name)
+                return
+            # Other workers may be creating the same collection
+            with self.coordinator.lock_sync(f"qdrant:collection:{collection_name}"):
+                with QDRANT_QUERY_SECONDS.labels(operation="collection_exists").time():
+                    exists = self.client.collection_exists(collection_name)
+                if not exists:
+                    # qdrant_client is imported where used; it takes over a second
+                    from qdrant_client.models import (
+                        Distance,
+                        PayloadSchemaType,
+                        VectorParams,
+                    )
+
+                    self.client.create_collection(
+                        collection_name=collection_name,
+                        vectors_config=VectorParams(
+                            size=vector_size, distance=Distance.COSINE
+                        ),
+                    )
+                    # Near-duplicate lookups filter on signature bands
+                    self.client.create_payload_index(
+                        collection_name=collection_name,
+                        field_name="minhash_bands",
+                        field_schema=PayloadSchemaType.KEYWORD,
+                    )
+                    self._indexed_collections.add(collection_name)
+
+    def _ensure_payload_indexes(self, collection_name: str):
+        """Add payload indexes missing from a collection created before they were."""
+        if collection_name in self._indexed_collections:
+            return
+        from qdrant_client.models import PayloadSchemaType
+
+        with QDRANT_QUERY_SECONDS.labels(operation="get_collection").time():
+            schema = self.client.get_collection(collection_name).payload_schema or {}
+        if "minhash_bands" not in schema:
+            # Creating an index that exists is a no-op, so racing workers are fine
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name="minhash_bands",
+                field_schema=PayloadSchemaType.KEYWORD,
+            )
+        self._indexed_collections.add(collection_name)
 
     def upsert_chunk(self, chunk):
         # Ensure collection exists for this chat
@@ -41,38 +90,171 @@ class VectorService:
 
         vector = self.llm_service.embed_text(chunk.content)
 
-        point = PointStruct(
-            id=str(chunk.id),
-            vector=vector,
-            payload={
-                "chat_id": str(chunk.chat_id),
-                "document_id": str(chunk.document_id),
-                "chunk_id": str(chunk.id),
-                "text": chunk.content,
-            },
-        )
-
         collection_name = self._get_collection_name(str(chunk.chat_id))
-        self.client.upsert(collection_name=collection_name, points=[point])
+        with QDRANT_QUERY_SECONDS.labels(operation="upsert").time():
+            self.client.upsert(
+                collection_name=collection_name, points=[self._point(chunk, vector)]
+            )
+
+    def upsert_chunks(self, chunks):
+        """Embed and upsert chunks of one chat with a single request each."""
+        if not chunks:
+            return
+        chat_id = str(chunks[0].chat_id)
+        self._ensure_collection_exists(chat_id)
+
+        vectors = self.llm_service.embed_texts([c.content for c in chunks])
+        points = [self._point(c, v) for c, v in zip(chunks, vectors)]
 
-    def search_chunks(self, query: str, chat_id: str, limit: int = 5):
+        collection_name = self._get_collection_name(chat_id)
+        with QDRANT_QUERY_SECONDS.labels(operation="upsert").time():
+            self.client.upsert(collection_name=collection_name, points=points)
+
+    @staticmethod
+    def _point(chunk, vector):
+        from qdrant_client.models import PointStruct
+
+        payload = {
+            "chat_id": str(chunk.chat_id),
+            "document_id": str(chunk.document_id),
+            "chunk_id": str(chunk.id),
+            "text": chunk.content,
+        }
+        minhash = (chunk.metadata or {}).get("minhash")
+        if minhash:
+            payload["minhash"] = minhash
+            payload["minhash_bands"] = bands(minhash)
+        return PointStruct(id=str(chunk.id), vector=vector, payload=payload)
+
+    def find_near_duplicates(self, chat_id, chunks, threshold: float) -> dict:
+        """
+        Stored point id of each chunk's closest near-duplicate, by chunk id,
+        from one scroll over the points sharing a signature band with any of
+        the chunks.
+        """
+        signatures = {
+            c.id: c.metadata["minhash"]
+            for c in chunks
+            if c.metadata and c.metadata.get("minhash")
+        }
+        if not signatures:
+            return {}
+        collection_name = self._get_collection_name(str(chat_id))
+        with QDRANT_QUERY_SECONDS.labels(operation="collection_exists").time():
+            exists = self.client.collection_exists(collection_name)
+        if not exists:
+            return {}
+
+        from qdrant_client.models import FieldCondition, Filter, MatchAny
+
+        band_keys = sorted({b for sig in signatures.values() for b in bands(sig)})
+        with QDRANT_QUERY_SECONDS.labels(operation="scroll").time():
+            points, _ = self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=Filter(
+                    must=[
+                        FieldCondition(
+                            key="minhash_bands", match=MatchAny(any=band_keys)
+                        )
+                    ]
+                ),
+                # Bounds the lookup when many chunks share bands by chance
+                limit=8 * len(signatures),
+                with_payload=["minhash"],
+                with_vectors=False,
+            )
+        candidates = [(str(p.id), p.payload.get("minhash")) for p in points]
+        found = {}
+        for chunk_id, sig in signatures.items():
+            original = closest(sig, candidates, threshold)
+            if original is not None:
+                found[chunk_id] = original
+        return found
+
+    def link_aliases(self, chat_id, aliases: dict):
+        """
+        Append alias entries ({original point id: [entry]}) to the original
+        points; returns how many of them still exist.
+        """
+        if not aliases:
+            return 0
+        collection_name = self._get_collection_name(str(chat_id))
+        # Read-modify-write of the alias lists; other workers may link the same points
+        with self.coordinator.lock_sync(f"qdrant:aliases:{collection_name}"):
+            with QDRANT_QUERY_SECONDS.labels(operation="retrieve").time():
+                points = self.client.retrieve(
+                    collection_name=collection_name,
+                    ids=list(aliases),
+                    with_payload=["aliases"],
+                    with_vectors=False,
+                )
+            for point in points:
+                entries = (point.payload.get("aliases") or []) + aliases[str(point.id)]
+                with QDRANT_QUERY_SECONDS.labels(operation="set_payload").time():
+                    self.client.set_payload(
+                        collection_name=collection_name,
+                        payload={"aliases": entries},
+                        points=[point.id],
+                    )
+        return len(points)
+
+    def embed_query(self, query: str) -> list[float]:
+        return self.llm_service.embed_text(query)
+
+    def search_chunks(
+        self, query: str, chat_id: str, limit: int = 5, query_vector=None
+    ):
         collection_name = self._get_collection_name(str(chat_id))
 
         # Check if collection exists
-        if not self.client.collection_exists(collection_name):
+        with QDRANT_QUERY_SECONDS.labels(operation="collection_exists").time():
+            exists = self.client.collection_exists(collection_name)
+        if not exists:
+            return []
+
+        if query_vector is None:
+            query_vector = self.embed_query(query)
+
+        from qdrant_client.models import FieldCondition, Filter, MatchValue
+
+        with QDRANT_QUERY_SECONDS.labels(operation="query_points").time():
+            results = self.client.query_points(
+                collection_name=collection_name,
+                query=query_vector,
+                # Room for near-duplicates that collapse into a better hit
+                limit=limit * 2 if settings.NEAR_DUPLICATE_THRESHOLD > 0 else limit,
+                query_filter=Filter(
+                    must=[
+                        FieldCondition(
+                            key="chat_id", match=MatchValue(value=str(chat_id))
+                        )
+                    ]
+                ),
+            )
+        return collapse(results.points)[:limit]
+
+    def fetch_chunks(self, chat_id: str, chunk_ids) -> list:
+        """Chunk points by id in one multi-get; ids that no longer exist are skipped."""
+        chunk_ids = [str(c) for c in chunk_ids]
+        if not chunk_ids:
+            return []
+        collection_name = self._get_collection_name(str(chat_id))
+
+        with QDRANT_QUERY_SECONDS.labels(operation="collection_exists").time():
+            exists = self.client.collection_exists(collection_name)
+        if not exists:
             return []
 
-        query_vector = self.llm_service.embed_text(query)
-
-        results = self.client.query_points(
-            collection_name=collection_name,
-            query=query_vector,
-            limit=limit,
-            query_filter={
-                "must": [{"key": "chat_id", "match": {"value": str(chat_id)}}]
-            },
-        )
-        return results.points
+        with QDRANT_QUERY_SECONDS.labels(operation="retrieve").time():
+            points = self.client.retrieve(
+                collection_name=collection_name,
+                ids=chunk_ids,
+                with_payload=True,
+                with_vectors=False,
+            )
+        # Keep the caller's ranking; retrieve returns storage order
+        by_id = {str(p.id): p for p in points}
+        return [by_id[c] for c in chunk_ids if c in by_id]
 
     def close(self):
         self.client_wrapper.close()
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from app.core.admission import AdmissionController, QueueFull
+
+
+def test_admits_up_to_max_active_then_queues_in_order():
+    async def scenario():
+        controller = AdmissionController(max_active=2, max_pending=2)
+        assert [controller.admit(job) for job in "abcd"] == [0, 0, 1, 2]
+        assert controller.position("c") == 1 and controller.position("d") == 2
+        with pytest.raises(QueueFull) as exc:
+            controller.admit("e")
+        assert exc.value.retry_after >= 1
+
+    asyncio.run(scenario())
+
+
+def test_pending_job_runs_when_a_slot_frees():
+    async def scenario():
+        controller = AdmissionController(max_active=1, max_pending=5)
+        controller.admit("a")
+        controller.admit("b")
+        order = []
+
+        async def job(name):
+            async with controller.run(name):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(job("b"), job("a"))
+        assert order == ["a", "b"]
+        assert controller.active == 0 and controller.pending == 0
+        assert controller.position("a") is None
+
+    asyncio.run(scenario())
+
+
+def test_new_jobs_wait_behind_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_active=1, max_pending=5)
+        controller.admit("a")
+        controller.admit("b")
+        async with controller.run("a"):
+            pass
+        # "b" was promoted into the only slot, so a newcomer queues
+        assert controller.position("b") == 0
+        assert controller.admit("c") == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        controller = AdmissionController(max_active=1, max_pending=5)
+        controller.admit("a")
+        controller.admit("b")
+        controller.admit("c")
+
+        async def wait(name):
+            async with controller.run(name):
+                pass
+
+        waiter = asyncio.create_task(wait("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.position("b") is None
+        assert controller.position("c") == 1
+
+    asyncio.run(scenario())
+
+
+def test_waiter_cancelled_after_promotion_frees_the_slot():
+    async def scenario():
+        controller = AdmissionController(max_active=1, max_pending=5)
+        controller.admit("a")
+        controller.admit("b")
+
+        async def wait(name):
+            async with controller.run(name):
+                pass
+
+        waiter = asyncio.create_task(wait("b"))
+        await asyncio.sleep(0)
+        async with controller.run("a"):
+            pass
+        # Promoted, but cancelled before it got to run
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.active == 0 and controller.pending == 0
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_scales_with_the_queue():
+    controller = AdmissionController(
+        max_active=2, max_pending=10, default_job_seconds=30
+    )
+    assert controller.retry_after() == 15
+    controller._pending.update({str(i): None for i in range(3)})
+    assert controller.retry_after() == 60
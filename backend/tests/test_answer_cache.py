@@ -0,0 +1,60 @@
+from app.core import answer_cache
+from app.core.answer_cache import SemanticAnswerCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def _cache(monkeypatch, **kwargs):
+    clock = _Clock()
+    monkeypatch.setattr(answer_cache, "time", clock)
+    return SemanticAnswerCache(threshold=0.9, **kwargs), clock
+
+
+def test_returns_the_closest_answer_above_threshold(monkeypatch):
+    cache, _ = _cache(monkeypatch)
+    cache.store("chat", [1, 0], 1, "q1", "a1")
+    cache.store("chat", [0, 1], 1, "q2", "a2")
+    assert cache.lookup("chat", [0.1, 1], 1)["answer"] == "a2"
+    assert cache.lookup("chat", [1, 1], 1) is None
+
+
+def test_version_change_drops_the_chat(monkeypatch):
+    cache, _ = _cache(monkeypatch)
+    cache.store("chat", [1, 0], 1, "q", "a")
+    assert cache.lookup("chat", [1, 0], 2) is None
+    assert cache.lookup("chat", [1, 0], 1) is None
+
+
+def test_expired_best_match_does_not_hide_a_fresh_one(monkeypatch):
+    cache, clock = _cache(monkeypatch, ttl_seconds=60)
+    cache.store("chat", [1, 0], 1, "old", "stale")
+    clock.now += 50
+    cache.store("chat", [0.95, 0.05], 1, "new", "fresh")
+    clock.now += 20
+
+    hit = cache.lookup("chat", [1, 0], 1)
+    assert hit["answer"] == "fresh"
+    assert cache._chats["chat"].questions == ["new"]
+
+
+def test_everything_expired_misses(monkeypatch):
+    cache, clock = _cache(monkeypatch, ttl_seconds=60)
+    cache.store("chat", [1, 0], 1, "q", "a")
+    clock.now += 61
+    assert cache.lookup("chat", [1, 0], 1) is None
+    assert len(cache._chats["chat"].vectors) == 0
+
+
+def test_overflow_drops_the_oldest(monkeypatch):
+    cache, _ = _cache(monkeypatch, max_entries_per_chat=2)
+    for i in range(3):
+        cache.store("chat", [1, i], 1, f"q{i}", f"a{i}")
+    entries = cache._chats["chat"]
+    assert entries.questions == ["q1", "q2"]
+    assert entries.vectors.shape == (2, 2)
@@ -0,0 +1,68 @@
+import re
+from app.core.utils import (
+    chunk_text_semantic,
+    iter_chunks_semantic,
+    iter_paragraph_spans,
+)
+
+
+def _collapse(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+TEXT = "\n\n".join(
+    " ".join(
+        f"Sentence {p}.{s} mentions Acme Corporation and Globex Inc.   "
+        for s in range(12)
+    )
+    for p in range(8)
+)
+
+
+def test_offsets_point_at_the_chunk_text():
+    chunks = chunk_text_semantic(
+        "\n \n" + TEXT, target_chunk_size=400, max_chunk_size=600, overlap=80
+    )
+    assert len(chunks) > 5
+    source = "\n \n" + TEXT
+    for chunk in chunks:
+        meta = chunk["metadata"]
+        # Overlap may begin inside the previous chunk's separator
+        assert _collapse(source[meta["char_start"] : meta["char_end"]]) == _collapse(
+            chunk["content"]
+        )
+
+
+def test_overlap_starts_inside_the_previous_chunk():
+    chunks = chunk_text_semantic(
+        TEXT, target_chunk_size=900, max_chunk_size=600, overlap=80
+    )
+    overlapping = [
+        (previous, chunk)
+        for previous, chunk in zip(chunks, chunks[1:])
+        if chunk["content"].startswith(previous["content"][-80:])
+    ]
+    assert overlapping
+    for previous, chunk in overlapping:
+        assert chunk["metadata"]["char_start"] == previous["metadata"]["char_end"] - 80
+
+
+def test_streamed_pieces_give_the_same_offsets():
+    whole = chunk_text_semantic(TEXT, target_chunk_size=400, max_chunk_size=600)
+    pieces = [TEXT[i : i + 97] for i in range(0, len(TEXT), 97)]
+    streamed = list(
+        iter_chunks_semantic(
+            iter_paragraph_spans(pieces),
+            total_chars=len(TEXT),
+            target_chunk_size=400,
+            max_chunk_size=600,
+        )
+    )
+    assert streamed == whole
+
+
+def test_paragraph_spans_are_offsets_into_the_stream():
+    text = "one\n\ntwo\n  \nthree"
+    spans = list(iter_paragraph_spans([text[:6], text[6:]]))
+    assert [p for _, p in spans] == ["one", "two", "three"]
+    assert all(text[o : o + len(p)] == p for o, p in spans)
@@ -0,0 +1,114 @@
+import pytest
+from app.core import circuit_breaker
+from app.core.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpen,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+def _open_breaker(threshold=2, reset=10.0):
+    breaker = CircuitBreaker("store", failure_threshold=threshold, reset_seconds=reset)
+    for _ in range(threshold):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("store", failure_threshold=3, reset_seconds=10)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_open_breaker_fails_fast_until_the_reset(clock):
+    breaker = _open_breaker()
+    clock.now += 4
+    with pytest.raises(CircuitOpen) as exc:
+        breaker.before_call()
+    assert exc.value.retry_after == pytest.approx(6)
+
+
+def test_one_trial_after_the_reset(clock):
+    breaker = _open_breaker()
+    clock.now += 10
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_trial_success_closes(clock):
+    breaker = _open_breaker()
+    clock.now += 10
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_trial_failure_reopens_for_another_period(clock):
+    breaker = _open_breaker()
+    clock.now += 10
+    breaker.before_call()
+    clock.now += 1
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now += 9
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    clock.now += 1
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_released_trial_lets_the_next_call_try(clock):
+    breaker = _open_breaker()
+    clock.now += 10
+    breaker.before_call()
+    breaker.release_trial()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_trial_that_never_reports_is_replaced(clock):
+    breaker = _open_breaker()
+    clock.now += 10
+    breaker.before_call()
+    clock.now += 9
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    clock.now += 1
+    breaker.before_call()
+
+
+def test_zero_threshold_disables_the_breaker(clock):
+    breaker = CircuitBreaker("store", failure_threshold=0, reset_seconds=10)
+    for _ in range(5):
+        breaker.record_failure()
+        breaker.before_call()
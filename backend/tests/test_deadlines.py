@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.core.deadlines import Deadline, run_stage
+
+
+def _breaker(threshold=1):
+    return CircuitBreaker("store", failure_threshold=threshold, reset_seconds=60)
+
+
+def _wait_for(predicate, timeout=2.0):
+    ends = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < ends
+        time.sleep(0.01)
+
+
+def test_deadline_without_seconds_never_expires():
+    deadline = Deadline()
+    assert deadline.remaining() is None and not deadline.expired
+    assert Deadline(0).remaining() is None
+
+
+def test_child_takes_the_earlier_of_budget_and_reserve():
+    parent = Deadline(10)
+    assert parent.child(2).remaining() == pytest.approx(2, abs=0.05)
+    assert parent.child(None, reserve=3).remaining() == pytest.approx(7, abs=0.05)
+    assert parent.child(9, reserve=3).remaining() == pytest.approx(7, abs=0.05)
+    assert Deadline().child(None).remaining() is None
+
+
+def test_reserve_takes_at_most_half_the_time_left():
+    parent = Deadline(2)
+    assert parent.child(None, reserve=5).remaining() == pytest.approx(1, abs=0.05)
+
+
+def test_run_stage_returns_and_records_success():
+    breaker = _breaker(threshold=2)
+    breaker.record_failure()
+    result = asyncio.run(run_stage(Deadline(1), lambda x: x * 2, 21, breaker=breaker))
+    assert result == 42
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_store_errors_count_as_failures():
+    breaker = _breaker()
+
+    def fail():
+        raise ConnectionError("store down")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run_stage(Deadline(1), fail, breaker=breaker))
+    assert breaker.state == OPEN
+
+
+def test_expired_deadline_skips_the_call():
+    calls = []
+    with pytest.raises(TimeoutError):
+        asyncio.run(run_stage(Deadline(expires_at=0), calls.append, 1))
+    assert calls == []
+
+
+def test_timeout_is_not_a_store_failure_but_the_late_outcome_is():
+    breaker = _breaker()
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        raise ConnectionError("store down")
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(run_stage(Deadline(0.05), slow, breaker=breaker))
+    assert breaker.state == CLOSED
+
+    release.set()
+    _wait_for(lambda: breaker.state == OPEN)
+
+
+def test_abandoned_trial_is_released():
+    breaker = _breaker()
+    breaker.record_failure()
+    breaker.reset_seconds = 0
+    release = threading.Event()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(run_stage(Deadline(0.05), release.wait, 5, breaker=breaker))
+    assert breaker.state == HALF_OPEN
+    breaker.reset_seconds = 60
+    # The next call makes the trial instead of failing fast
+    assert asyncio.run(run_stage(Deadline(1), lambda: "ok", breaker=breaker)) == "ok"
+    assert breaker.state == CLOSED
+    release.set()
+
+
+def test_cancelled_caller_abandons_the_call():
+    breaker = _breaker()
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        raise ConnectionError("store down")
+
+    async def scenario():
+        task = asyncio.create_task(run_stage(Deadline(5), slow, breaker=breaker))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert breaker.state == CLOSED
+    release.set()
+    _wait_for(lambda: breaker.state == OPEN)
@@ -0,0 +1,118 @@
+import pytest
+from app.core.entity_resolution import AliasIndex, EntityResolver, pair_score
+
+THRESHOLD = 0.92
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("OpenAI Inc.", "Open AI"),
+        ("Acme Corp", "ACME Corporation"),
+        ("Smith, John", "John Smith"),
+        ("Python 3", "Python3"),
+    ],
+)
+def test_same_words_score_one(a, b):
+    assert pair_score(a, b) == 1.0
+
+
+def test_acronym_matches_its_expansion():
+    assert pair_score("IBM", "International Business Machines") == 0.95
+    assert pair_score("IBM", "International Business") < THRESHOLD
+
+
+def test_misspelled_long_word_scores_above_threshold():
+    assert pair_score("Edsger Dijkstra", "Edsger Djikstra") >= THRESHOLD
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("Carol Smith", "Carl Smith"),
+        ("Alice Johnson", "Alice Johnston"),
+        ("Jon Smith", "John Smith"),
+        ("Python", "Pythons"),
+        ("Android", "Androids"),
+        ("Windows Server 2019", "Windows Server 2016"),
+        ("Chapter 11", "Chapter 12 Bankruptcy"),
+        ("iPhone15", "iPhone16"),
+    ],
+)
+def test_distinct_names_score_below_threshold(a, b):
+    assert pair_score(a, b) < THRESHOLD
+
+
+def _items(*names, type="Organization"):
+    return [{"names": [name], "type": type} for name in names]
+
+
+def test_cluster_merges_variants_and_keeps_distinct_names_apart():
+    items = _items("Stark Industries", "Stark Industries Inc", "Stark Industires")
+    items += _items("Carol Smith", "Carl Smith", "Alice Johnson", "Alice Johnston")
+    roots = EntityResolver(THRESHOLD).cluster(items, known_from=len(items))
+    assert roots[0] == roots[1] == roots[2]
+    assert len(set(roots[3:])) == 4
+
+
+def test_cluster_needs_embeddings_for_people():
+    items = _items("Edsger Dijkstra", "Edsger Djikstra", type="Person")
+    assert len(set(EntityResolver(THRESHOLD).cluster(items, known_from=2))) == 2
+
+    def embed(texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    roots = EntityResolver(THRESHOLD, embed=embed).cluster(items, known_from=2)
+    assert roots[0] == roots[1]
+
+
+def test_cluster_needs_compatible_types():
+    items = [
+        {"names": ["Stark Industries"], "type": "Organization"},
+        {"names": ["Stark Industires"], "type": "Location"},
+    ]
+    assert len(set(EntityResolver(THRESHOLD).cluster(items, known_from=2))) == 2
+
+
+def test_known_entities_stay_roots_and_never_merge_together():
+    items = _items("Acme Corp", "Acme Corporation", "ACME Corporation Inc")
+    roots = EntityResolver(THRESHOLD).cluster(items, known_from=1)
+    # Both stored entities match the new name; it joins one, they stay apart
+    assert roots[1:] == [1, 2]
+    assert roots[0] in (1, 2)
+
+
+def test_resolve_prefers_known_names_then_most_mentioned():
+    entities = {
+        "acme corp": {"name": "Acme Corp", "type": "Organization", "chunk_ids": ["1"]},
+        "globex inc": {
+            "name": "Globex Inc",
+            "type": "Organization",
+            "chunk_ids": ["1"],
+        },
+        "globex": {"name": "Globex", "type": "Organization", "chunk_ids": ["1", "2"]},
+        "carl smith": {"name": "Carl Smith", "type": "Person", "chunk_ids": ["3"]},
+    }
+    known = [{"name": "Acme Corporation", "type": "Organization", "aliases": []}]
+    canonical = EntityResolver(THRESHOLD).resolve(entities, known)
+    assert canonical == {
+        "acme corp": "Acme Corporation",
+        "globex inc": "Globex",
+        "globex": "Globex",
+        "carl smith": "Carl Smith",
+    }
+
+
+def test_alias_index_maps_variants_to_canonical_names():
+    index = AliasIndex(
+        [
+            {
+                "name": "OpenAI",
+                "name_normalized": "openai",
+                "aliases": ["Open AI", "OpenAI Inc."],
+            }
+        ]
+    )
+    assert index.canonical("open ai") == "openai"
+    assert index.canonical("OpenAI, Inc") == "openai"
+    assert index.canonical("Anthropic") == "anthropic"
@@ -0,0 +1,70 @@
+import pytest
+from app.core.extraction_gate import ExtractionGate, proper_nouns
+
+NARRATIVE = (
+    "the committee met on a rainy afternoon to review the budget and agreed "
+    "that the figures needed another pass before anything was approved."
+)
+
+
+def _gate(policy="conservative", **kwargs):
+    kwargs.setdefault("min_chars", 40)
+    kwargs.setdefault("min_proper_noun_density", 0.02)
+    kwargs.setdefault("boilerplate_repeats", 2)
+    return ExtractionGate(policy=policy, **kwargs)
+
+
+def test_proper_nouns_skip_sentence_and_line_starts():
+    assert proper_nouns("Then Ada met Charles Babbage in London.") == 4
+    assert proper_nouns("Apples are red.\nBananas are yellow.\n- Cherries") == 0
+    assert proper_nouns("We met The team") == 0
+
+
+def test_off_extracts_everything():
+    gate = _gate("off")
+    assert gate("", "narrative") is None
+    assert gate("1 2 3 4 5 6 7 8 9 10", "table") is None
+
+
+def test_short_chunks_are_skipped_unless_they_name_something():
+    gate = _gate()
+    assert gate("--- Page 3 ---\nok.", "narrative") == "too_short"
+    assert gate("Ada Lovelace", "narrative") is None
+
+
+def test_repeated_lines_become_boilerplate():
+    gate = _gate(min_chars=20)
+    footer = "confidential draft, page {} of 12"
+    for page in (1, 2):
+        assert gate(footer.format(page) + "\n" + NARRATIVE, "narrative") is None
+    # Digits are normalised, so the third page's footer is the same line
+    assert gate(footer.format(3) + "\nsee above.", "narrative") == "boilerplate"
+
+
+def test_numeric_chunks_are_skipped():
+    gate = _gate()
+    assert gate("2019 2020 2021\n1200 1350 1420\n88.5 91.2 93.0", "table") == (
+        "numeric"
+    )
+
+
+def test_code_and_tables_need_proper_nouns():
+    gate = _gate()
+    code = "def total(items):\n    return sum(item.price for item in items)\n"
+    assert gate(code, "code") == "code"
+    table = "name | role\nsomeone | engineer\nanyone | manager\nno one | analyst"
+    assert gate(table, "table") == "table"
+    named = "name | role\nAda Lovelace | mathematician\nCharles Babbage | inventor"
+    assert gate(named, "table") is None
+
+
+def test_narrative_without_names_depends_on_policy():
+    assert _gate("conservative")(NARRATIVE, "narrative") is None
+    assert _gate("aggressive")(NARRATIVE, "narrative") == "no_proper_nouns"
+    named = NARRATIVE.replace("the committee", "the Hartley committee")
+    assert _gate("aggressive")(named, "narrative") is None
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ExtractionGate(policy="sometimes")
@@ -0,0 +1,81 @@
+from app.core.graph_cache import CSRGraph, GraphCache
+
+
+def _graph(*names):
+    entities = [
+        {
+            "entity_id": f"e{i}",
+            "name": name,
+            "name_normalized": name.lower(),
+            "type": "Concept",
+            "chunk_ids": [f"c{i}"],
+        }
+        for i, name in enumerate(names)
+    ]
+    edges = [
+        {
+            "source_id": f"e{i}",
+            "target_id": f"e{i + 1}",
+            "type": "RELATED_TO",
+            "confidence": 0.5 + i / 10,
+            "chunk_ids": [f"r{i}"],
+        }
+        for i in range(len(names) - 1)
+    ]
+    return CSRGraph(entities, edges)
+
+
+def test_loads_once_the_chat_is_hot():
+    cache = GraphCache(min_hits=2)
+    assert cache.get("chat", lambda: _graph("a")) is None
+    graph = cache.get("chat", lambda: _graph("a"))
+    assert graph is not None and "chat" in cache
+    assert cache.get("chat", lambda: _graph("b")) is graph
+
+
+def test_graph_invalidated_while_loading_is_not_cached():
+    cache = GraphCache(min_hits=1)
+
+    def loader():
+        # A graph write lands while the export is running
+        cache.invalidate("chat")
+        return _graph("stale")
+
+    assert cache.get("chat", loader).names == ["stale"]
+    assert "chat" not in cache
+    assert cache.get("chat", lambda: _graph("fresh")).names == ["fresh"]
+    assert "chat" in cache
+
+
+def test_tracked_chats_are_bounded():
+    cache = GraphCache(min_hits=3, max_tracked_chats=10)
+    for i in range(100):
+        cache.get(f"chat-{i}", lambda: _graph("a"))
+    assert len(cache._chats) == 10
+
+
+def test_byte_budget_evicts_least_recently_used():
+    graph = _graph("a", "b", "c")
+    cache = GraphCache(max_bytes=graph.nbytes * 2, min_hits=1)
+    cache.put("one", graph)
+    cache.put("two", _graph("a", "b", "c"))
+    cache.get("one", lambda: graph)
+    cache.put("three", _graph("a", "b", "c"))
+    assert "one" in cache and "three" in cache and "two" not in cache
+
+
+def test_expand_walks_hops_and_caps_digests():
+    graph = _graph("a", "b", "c", "d")
+    assert [d["name"] for d in graph.expand(["a"], 1, 5, 5, 10)] == ["a"]
+    assert [d["name"] for d in graph.expand(["a"], 3, 5, 5, 10)] == ["a", "b", "c"]
+    assert [d["name"] for d in graph.expand(["b"], 2, 5, 5, 2)] == ["b", "c"]
+    assert graph.expand(["missing"], 2, 5, 5, 10) == []
+
+
+def test_digest_ranks_facts_by_confidence():
+    digest = _graph("a", "b", "c").digests(["b"], 5, 5)[0]
+    assert [(f["name"], f["direction"]) for f in digest["facts"]] == [
+        ("c", "out"),
+        ("a", "in"),
+    ]
+    assert digest["chunk_ids"][0] == "r1"
@@ -0,0 +1,94 @@
+from uuid import uuid4
+import pytest
+from app.benchmarks.fakes import InMemoryNeo4jClient
+from app.schemas.entity import Entity
+from app.schemas.relationship import Relationship
+from app.services import graph_service
+from app.services.graph_service import GraphService
+
+
+class _QueuedWriter:
+    """Holds write-backs until the test runs them."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        self.jobs.append((fn, args))
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for fn, args in jobs:
+            fn(*args)
+
+
+@pytest.fixture(autouse=True)
+def _no_pending_write_backs():
+    yield
+    graph_service._write_back_pending.clear()
+
+
+def _service(monkeypatch):
+    writer = _QueuedWriter()
+    monkeypatch.setattr(graph_service, "_digest_writer", lambda: writer)
+    client = InMemoryNeo4jClient()
+    service = GraphService(
+        client=client, llm_service=object(), graph_cache=False, alias_cache=False
+    )
+    chat_id, document_id, chunk_id = uuid4(), uuid4(), uuid4()
+    ids = [
+        service.add_entity(
+            Entity(
+                document_id=document_id,
+                chat_id=chat_id,
+                type="Person",
+                name=name,
+                confidence=0.9,
+                chunk_id=chunk_id,
+            )
+        )
+        for name in ("Ada Lovelace", "Charles Babbage")
+    ]
+    service.add_relationship(
+        Relationship(
+            chat_id=chat_id,
+            source_id=ids[0],
+            target_id=ids[1],
+            type="WORKED_WITH",
+            confidence=0.8,
+            chunk_id=chunk_id,
+        )
+    )
+    return service, client.graph, writer, chat_id
+
+
+def test_missing_digests_are_built_without_writing(monkeypatch):
+    service, graph, writer, chat_id = _service(monkeypatch)
+
+    digests = service.retrieve(chat_id, ["Ada Lovelace"])
+
+    assert [d["name"] for d in digests] == ["Ada Lovelace"]
+    assert digests[0]["facts"][0]["name"] == "Charles Babbage"
+    assert graph.queries["set_neighbourhood"] == 0
+    assert len(writer.jobs) == 1
+
+
+def test_write_back_stores_digests_for_later_lookups(monkeypatch):
+    service, graph, writer, chat_id = _service(monkeypatch)
+    first = service.retrieve(chat_id, ["Ada Lovelace"])
+    writer.run()
+    built = graph.queries["neighbourhood"]
+
+    assert service.retrieve(chat_id, ["Ada Lovelace"]) == first
+    assert graph.queries["neighbourhood"] == built
+    assert not graph_service._write_back_pending
+
+
+def test_queued_digests_are_not_queued_again(monkeypatch):
+    service, graph, writer, chat_id = _service(monkeypatch)
+    service.retrieve(chat_id, ["Ada Lovelace"])
+    service.retrieve(chat_id, ["Ada Lovelace"])
+
+    assert len(writer.jobs) == 1
+    writer.run()
+    assert graph.queries["set_neighbourhood"] == 1
@@ -0,0 +1,61 @@
+from app.core.json_recovery import iter_array_items, json_span, parse_json_object
+
+KEYS = ("entities", "relationships")
+
+
+def test_json_span_strips_surrounding_prose():
+    assert json_span('Sure! {"a": [1]} Hope this helps.') == '{"a": [1]}'
+    assert json_span("Here: [1, 2] done") == "[1, 2]"
+    assert json_span("no json here") == "no json here"
+
+
+def test_complete_reply_parses():
+    data, result = parse_json_object('{"entities": [], "relationships": []}', KEYS)
+    assert result == "ok" and data == {"entities": [], "relationships": []}
+
+
+def test_fenced_reply_parses_from_its_span():
+    text = '```json\n{"entities": [{"name": "Ada"}]}\n```'
+    data, result = parse_json_object(text, KEYS)
+    assert result == "ok" and data["entities"] == [{"name": "Ada"}]
+
+
+def test_truncated_array_keeps_the_complete_items():
+    text = (
+        '{"entities": [{"name": "Ada", "type": "Person"}, '
+        '{"name": "Charles", "type": "Person"}, {"name": "Anal'
+    )
+    data, result = parse_json_object(text, KEYS)
+    assert result == "recovered"
+    assert [e["name"] for e in data["entities"]] == ["Ada", "Charles"]
+    assert data["relationships"] == []
+
+
+def test_truncation_in_a_later_array_keeps_both():
+    text = (
+        '{"entities": [{"name": "Ada"}], '
+        '"relationships": [{"source": "Ada", "target": "Charles"}, {"sour'
+    )
+    data, result = parse_json_object(text, KEYS)
+    assert result == "recovered"
+    assert data["entities"] == [{"name": "Ada"}]
+    assert data["relationships"] == [{"source": "Ada", "target": "Charles"}]
+
+
+def test_truncated_nested_item_is_dropped():
+    text = '{"entities": [{"name": "Ada"}, {"name": "Bob", "tags": ["x", "y"'
+    assert list(iter_array_items(text, "entities")) == [{"name": "Ada"}]
+
+
+def test_array_ending_early_stops_cleanly():
+    text = '{"entities": [{"name": "Ada"}, ], "extra": }'
+    assert list(iter_array_items(text, "entities")) == [{"name": "Ada"}]
+
+
+def test_unrecoverable_replies_fail():
+    assert parse_json_object(None, KEYS) == (None, "failed")
+    assert parse_json_object("", KEYS) == (None, "failed")
+    assert parse_json_object("I cannot help with that.", KEYS) == (None, "failed")
+    assert parse_json_object('{"entities": [{"na', KEYS) == (None, "failed")
+    # A top-level array is not the object the caller asked for
+    assert parse_json_object("[1, 2]", KEYS) == (None, "failed")
@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+from uuid import uuid4
+from app.core.near_duplicates import (
+    BANDS,
+    NUM_PERMUTATIONS,
+    NearDuplicateIndex,
+    bands,
+    closest,
+    collapse,
+    signature,
+    similarity,
+)
+
+TEXT = (
+    "The quarterly report shows revenue grew in every region, with the "
+    "strongest gains in the northern offices and a modest decline in exports."
+)
+
+
+def _sig(agree: int) -> list:
+    """A signature agreeing with _sig(NUM_PERMUTATIONS) on its first `agree` slots."""
+    return [i if i < agree else -1 - i for i in range(NUM_PERMUTATIONS)]
+
+
+def test_signature_needs_a_shingle():
+    assert signature("two words") is None
+    assert len(signature("three whole words")) == NUM_PERMUTATIONS
+
+
+def test_identical_and_reformatted_text_match():
+    assert signature(TEXT) == signature(TEXT.upper().replace(" ", "  "))
+    assert similarity(signature(TEXT), signature(TEXT)) == 1.0
+
+
+def test_small_edit_stays_similar_and_other_text_does_not():
+    edited = TEXT.replace("modest", "slight")
+    other = "Unrelated notes about gardening, soil acidity and spring planting."
+    assert similarity(signature(TEXT), signature(edited)) > 0.6
+    assert similarity(signature(TEXT), signature(other)) < 0.2
+
+
+def test_similarity_of_mismatched_signatures_is_zero():
+    assert similarity(None, _sig(64)) == 0.0
+    assert similarity(_sig(64)[:32], _sig(64)) == 0.0
+
+
+def test_closest_includes_the_threshold_itself():
+    sig = _sig(NUM_PERMUTATIONS)
+    at = _sig(48)  # 48 / 64 = 0.75
+    below = _sig(47)
+    assert closest(sig, [("at", at)], 0.75) == "at"
+    assert closest(sig, [("below", below)], 0.75) is None
+    assert closest(sig, [("below", below), ("at", at)], 0.75) == "at"
+
+
+def test_closest_prefers_the_most_similar():
+    sig = _sig(NUM_PERMUTATIONS)
+    candidates = [("a", _sig(50)), ("b", _sig(60)), ("c", _sig(55))]
+    assert closest(sig, candidates, 0.5) == "b"
+
+
+def test_bands_split_the_signature():
+    keys = bands(_sig(NUM_PERMUTATIONS))
+    assert len(keys) == BANDS
+    rows = NUM_PERMUTATIONS // BANDS
+    # Agreeing on the first band's rows only shares that band
+    shared = set(keys) & set(bands(_sig(rows)))
+    assert [key.split(":")[0] for key in shared] == ["0"]
+
+
+def _point(point_id, sig):
+    return SimpleNamespace(id=point_id, payload={"minhash": sig})
+
+
+def test_collapse_drops_near_duplicates_of_better_hits():
+    hits = [
+        _point("a", _sig(64)),
+        _point("b", _sig(60)),
+        _point("c", _sig(0)),
+    ]
+    assert [p.id for p in collapse(hits, threshold=0.9)] == ["a", "c"]
+    assert [p.id for p in collapse(hits, threshold=0.95)] == ["a", "b", "c"]
+    assert [p.id for p in collapse(hits, threshold=0)] == ["a", "b", "c"]
+
+
+def _chunk(sig, index=0):
+    return SimpleNamespace(
+        id=uuid4(), document_id=uuid4(), index=index, metadata={"minhash": sig}
+    )
+
+
+def test_index_aliases_repeats_within_a_run():
+    index = NearDuplicateIndex(threshold=0.9)
+    first, repeat, other = _chunk(_sig(64)), _chunk(_sig(62), 1), _chunk(_sig(0))
+
+    assert index.resolve([first, repeat, other], stored={}) == {repeat.id}
+    assert index.aliases[str(first.id)] == [
+        {"document_id": str(repeat.document_id), "chunk_id": str(repeat.id), "index": 1}
+    ]
+
+
+def test_index_uses_stored_matches_first():
+    index = NearDuplicateIndex(threshold=0.9)
+    chunk = _chunk(_sig(64))
+    assert index.resolve([chunk], stored={chunk.id: "stored-point"}) == {chunk.id}
+    assert list(index.aliases) == ["stored-point"]
+    assert not NearDuplicateIndex(threshold=0).enabled
@@ -0,0 +1,47 @@
+import pytest
+from app.core.segmenter import RuleSegmenter, get_segmenter
+
+
+@pytest.fixture
+def segmenter():
+    return RuleSegmenter()
+
+
+def test_spans_are_exact_slices_without_surrounding_space(segmenter):
+    text = "  First one.  Second one!\nThird one?  "
+    spans = segmenter.spans(text)
+    assert [text[s:e] for s, e in spans] == ["First one.", "Second one!", "Third one?"]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Dr. Smith met Mr. Jones at 10 a.m. on Monday.",
+        "J. R. R. Tolkien wrote it.",
+        "It costs 3.50 dollars, e.g. coffee.",
+        "He left... and then came back.",
+        "See the U.S. Army report.",
+    ],
+)
+def test_no_split_inside_a_sentence(segmenter, text):
+    assert segmenter.split(text) == [text]
+
+
+def test_splits_after_quotes_and_brackets(segmenter):
+    text = 'She said "Stop." Then she left. (It was late.) Everyone slept.'
+    assert segmenter.split(text) == [
+        'She said "Stop."',
+        "Then she left.",
+        "(It was late.)",
+        "Everyone slept.",
+    ]
+
+
+def test_text_without_final_punctuation_is_one_sentence(segmenter):
+    assert segmenter.split("no punctuation here") == ["no punctuation here"]
+    assert segmenter.split("   ") == []
+
+
+def test_unknown_segmenter_is_rejected():
+    with pytest.raises(ValueError):
+        get_segmenter("nope")
@@ -0,0 +1,56 @@
+import pytest
+from app.core import tokens
+from app.core.config import settings
+from app.core.tokens import MIN_CALIBRATION_TOKENS, TokenEstimator
+
+
+def test_count_and_chars_use_the_ratio():
+    estimator = TokenEstimator(chars_per_token=4.0)
+    assert estimator.count("") == 1
+    assert estimator.count("x" * 40) == 11
+    assert estimator.chars(100) == 400
+
+
+def test_calibration_moves_towards_the_observed_ratio():
+    estimator = TokenEstimator(chars_per_token=4.0, smoothing=0.5)
+    estimator.calibrate(chars=300, tokens=100)
+    assert estimator.chars_per_token == pytest.approx(3.5)
+    estimator.calibrate(chars=300, tokens=100)
+    assert estimator.chars_per_token == pytest.approx(3.25)
+
+
+def test_short_prompts_do_not_calibrate():
+    estimator = TokenEstimator(chars_per_token=4.0, smoothing=1.0)
+    estimator.calibrate(chars=10, tokens=MIN_CALIBRATION_TOKENS - 1)
+    assert estimator.chars_per_token == 4.0
+
+
+def test_calibration_stays_within_bounds():
+    estimator = TokenEstimator(smoothing=1.0, bounds=(1.5, 8.0))
+    estimator.calibrate(chars=10_000, tokens=100)
+    assert estimator.chars_per_token == 8.0
+    estimator.calibrate(chars=100, tokens=100)
+    assert estimator.chars_per_token == 1.5
+
+
+def test_estimators_are_shared_per_model(monkeypatch):
+    monkeypatch.setattr(tokens, "_estimators", {})
+    assert tokens.get_token_estimator("a") is tokens.get_token_estimator("a")
+    assert tokens.get_token_estimator("a") is not tokens.get_token_estimator("b")
+    assert tokens.get_token_estimator() is tokens.get_token_estimator(
+        settings.OPENAI_LLM_MODEL
+    )
+
+
+def test_chunk_sizes_follow_the_embedding_estimator(monkeypatch):
+    monkeypatch.setattr(tokens, "_estimators", {})
+    monkeypatch.setattr(settings, "CHUNK_TARGET_TOKENS", 100)
+    monkeypatch.setattr(settings, "CHUNK_MAX_TOKENS", 200)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP_TOKENS", 10)
+    tokens.get_token_estimator(settings.OPENAI_EMBED_MODEL).chars_per_token = 3.0
+    assert tokens.chunk_sizes() == {
+        "target_chunk_size": 300,
+        "min_chunk_size": 150,
+        "max_chunk_size": 600,
+        "overlap": 30,
+    }
@@ -324,6 +324,7 @@ function App() {
                             {doc.status === 'processing' && 'Processing...'}
                             {doc.status === 'completed' && 'Ready'}
                             {doc.status === 'failed' && 'Failed'}
+                            {doc.status === 'duplicate' && 'Already uploaded'}
                           </span>
                         </div>
                         {doc.status === 'processing' && (